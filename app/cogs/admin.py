@@ -4,6 +4,7 @@ from app.core import handlers
 from app.core.ai_config import (
     get_active_provider,
     get_available_providers,
+    llm_scheduler,
     next_provider,
     set_active_provider,
 )
@@ -11,6 +12,8 @@ from app.core.bot import DisBot
 from app.core.checks import admin_or_owner
 from app.core.scheduler import send_birthday_congratulations, send_holiday_congratulations
 from app.data.request import save_holiday
+from app.services.request_coalescer import request_coalescer
+from app.services.response_cache import response_cache
 from app.tools.utils import parse_holiday_command
 
 
@@ -110,6 +113,24 @@ class Admin(commands.Cog):
         set_active_provider(name)
         await ctx.send(f"✅ Провайдер переключён на **{name}**")
 
+    @commands.command(name="ai_stats")
+    @admin_or_owner()
+    async def ai_stats_command(self, ctx: commands.Context) -> None:
+        """Показать статистику объединения запросов, кеша ответов и очереди к AI."""
+        sections = {
+            "Объединение запросов": request_coalescer.stats(),
+            "Кеш ответов": response_cache.stats(),
+            **{
+                f"Очередь ({priority})": counters
+                for priority, counters in llm_scheduler.stats().items()
+            },
+        }
+        lines = [
+            f"**{title}**: " + ", ".join(f"{name}={value}" for name, value in counters.items())
+            for title, counters in sections.items()
+        ]
+        await ctx.send("📊 " + "\n".join(lines))
+
 
 async def setup(bot: DisBot) -> None:
     """Загрузка Cog в бота."""
@@ -1,15 +1,15 @@
 """Глобальный обработчик ошибок команд."""
 
 import asyncio
-import time
-from collections import defaultdict
+import math
 
 from discord.ext import commands
 
 from app.core import handlers
 from app.core.bot import DisBot
-
-AI_COOLDOWN_SECONDS = 5.0
+from app.services.rate_limiter import ai_rate_limiter
+from app.services.request_coalescer import request_coalescer
+from app.services.response_cache import normalize_prompt
 
 
 class ErrorHandler(commands.Cog):
@@ -18,7 +18,29 @@ class ErrorHandler(commands.Cog):
     def __init__(self, bot: DisBot) -> None:
         """Инициализация Cog."""
         self.bot = bot
-        self._ai_cooldowns: dict[int, float] = defaultdict(float)
+
+    async def _shared_response(self, content: str, server_id: int | None) -> str:
+        """Проверяет намерения инструментов и генерирует ответ, не привязанный к автору."""
+        async with ai_rate_limiter.slot():
+            weather_task = (
+                handlers.check_weather_intent(content)
+                if self.bot.weather_enabled
+                else asyncio.sleep(0)
+            )
+            search_task = (
+                handlers.check_search_intent(content)
+                if self.bot.search_enabled
+                else asyncio.sleep(0)
+            )
+            tool_weather, tool_search = await asyncio.gather(weather_task, search_task)
+            return await handlers.ai_generate(
+                content,
+                server_id,
+                None,
+                tool_weather,
+                tool_search,
+                limit=self.bot.context_limit,
+            )
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx: commands.Context, error: commands.CommandError) -> None:
@@ -26,40 +48,23 @@ class ErrorHandler(commands.Cog):
         original_error = getattr(error, "original", error)
 
         if isinstance(error, commands.CommandNotFound):
-            now = time.monotonic()
-            last_use = self._ai_cooldowns[ctx.author.id]
-            if now - last_use < AI_COOLDOWN_SECONDS:
-                remaining = AI_COOLDOWN_SECONDS - (now - last_use)
+            server_id = ctx.guild.id if ctx.guild else None
+
+            retry_after = ai_rate_limiter.check(ctx.author.id, server_id)
+            if retry_after:
                 await ctx.send(
-                    f"⏳ {ctx.author.mention}, подождите {remaining:.0f} сек. "
+                    f"⏳ {ctx.author.mention}, подождите {math.ceil(retry_after)} сек. "
                     "перед следующим сообщением."
                 )
                 return
-            self._ai_cooldowns[ctx.author.id] = now
-
-            server_id = ctx.guild.id if ctx.guild else None
 
+            # Ответ не зависит от автора, поэтому одинаковые вопросы, заданные
+            # одновременно, получают одну генерацию; автор указывается упоминанием
+            content = ctx.message.content
+            key = (server_id, normalize_prompt(content))
             async with ctx.typing():
-                weather_task = (
-                    handlers.check_weather_intent(ctx.message.content)
-                    if self.bot.weather_enabled
-                    else asyncio.sleep(0)
-                )
-                search_task = (
-                    handlers.check_search_intent(ctx.message.content)
-                    if self.bot.search_enabled
-                    else asyncio.sleep(0)
-                )
-
-                tool_weather, tool_search = await asyncio.gather(weather_task, search_task)
-
-                response = await handlers.ai_generate(
-                    ctx.message.content,
-                    server_id,
-                    ctx.author,
-                    tool_weather,
-                    tool_search,
-                    limit=self.bot.context_limit,
+                response = await request_coalescer.run(
+                    key, lambda: self._shared_response(content, server_id)
                 )
                 await ctx.send(f"{ctx.author.mention} {response}")
         elif isinstance(error, commands.CommandOnCooldown):
@@ -80,7 +85,7 @@ class ErrorHandler(commands.Cog):
             await ctx.send("❌ Проблема с сетью. Попробуйте позже.")
             from app.services.telegram_notifier import telegram_notifier
 
-            await telegram_notifier.send_message(
+            telegram_notifier.alert(
                 f"⚠️ <b>Сетевая ошибка</b>\nОшибка в команде `{ctx.command.name}`: {original_error}"
             )
         else:
@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 
 import app.core.embeds as em
+from app.core.bot import DisBot
 from app.data.request import update_message_count
 from app.tools.utils import get_rank_description
 
@@ -9,7 +10,7 @@ from app.tools.utils import get_rank_description
 class Ranks(commands.Cog):
     """Ког для системы рангов."""
 
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: DisBot):
         """Инициализация кога."""
         self.bot = bot
 
@@ -20,7 +21,7 @@ class Ranks(commands.Cog):
             return
 
         # Игнорируем команды
-        if message.content.startswith(self.bot.command_prefix):
+        if self.bot.classify(message).is_command:
             return
 
         if not message.guild:
@@ -56,6 +57,6 @@ class Ranks(commands.Cog):
             print(f"Произошла ошибка при обновлении статистики: {e}")
 
 
-async def setup(bot: commands.Bot) -> None:
+async def setup(bot: DisBot) -> None:
     """Загрузка кога."""
     await bot.add_cog(Ranks(bot))
@@ -3,10 +3,10 @@
 from discord.ext import commands
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
-from app.core.ai_config import get_client, get_model
+from app.core.ai_config import Priority, get_model, llm_scheduler
 from app.core.bot import DisBot
-from app.tools.prompt import ROAST_PERSONAS, ROAST_PROMPT, USER_DESCRIPTIONS
-from app.tools.utils import clean_text, replace_emojis
+from app.tools.postprocess import postprocessor
+from app.tools.prompt_registry import prompt_registry
 
 
 class Toxic(commands.Cog):
@@ -40,18 +40,18 @@ class Toxic(commands.Cog):
                     persona = arg
 
             if persona == "list":
-                keys = ", ".join(f"`{k}`" for k in ROAST_PERSONAS.keys())
+                keys = ", ".join(f"`{k}`" for k in prompt_registry.roast_personas)
                 await ctx.send(f"🎭 **Доступные режимы:** {keys}")
                 return
 
             messages = []
-            history_limit = limit * 2
+            history = await self.bot.channel_history.recent(ctx.channel, limit * 2)
 
-            async for msg in ctx.channel.history(limit=history_limit):
+            for msg in history:
                 if len(messages) >= limit:
                     break
 
-                if msg.author == self.bot.user:
+                if msg.author_id == self.bot.user.id:
                     continue
 
                 content = msg.content
@@ -62,9 +62,9 @@ class Toxic(commands.Cog):
                     continue
 
                 if not content:
-                    if msg.attachments:
+                    if msg.has_attachments:
                         content = "[Пользователь скинул картинку/файл]"
-                    elif msg.stickers:
+                    elif msg.has_stickers:
                         content = "[Пользователь отправил стикер]"
                     else:
                         continue
@@ -72,7 +72,7 @@ class Toxic(commands.Cog):
                 if content.startswith("http"):
                     content = "[Пользователь отправил ссылку]"
 
-                messages.append(f"[{msg.author.name}]: {content}")
+                messages.append(f"[{msg.author_name}]: {content}")
 
             if not messages:
                 await ctx.send("Тут слишком тихо, некого прожаривать. 🦗")
@@ -81,15 +81,9 @@ class Toxic(commands.Cog):
             messages.reverse()
             history_text = "\n".join(messages)
 
-            user_info_text = "\n".join([f"- {k}: {v}" for k, v in USER_DESCRIPTIONS.items()])
-
-            system_content = ROAST_PROMPT.format(user_info=user_info_text)
-
-            if persona and persona in ROAST_PERSONAS:
-                selected_persona = ROAST_PERSONAS[persona]
-                system_content += f"\n\nВАЖНОЕ ДОПОЛНЕНИЕ К РОЛИ:\n{selected_persona}"
-            elif persona:
-                keys = ", ".join(f"`{k}`" for k in ROAST_PERSONAS.keys())
+            system_content = prompt_registry.roast_prompt(persona)
+            if system_content is None:
+                keys = ", ".join(f"`{k}`" for k in prompt_registry.roast_personas)
                 await ctx.send(f"❌ Нет такого режима `{persona}`. Доступные: {keys}")
                 return
 
@@ -101,16 +95,15 @@ class Toxic(commands.Cog):
             ]
 
             async with ctx.typing():
-                completion = await get_client().chat.completions.create(
+                completion = await llm_scheduler.create(
+                    Priority.INTERACTIVE,
                     model=get_model(),
                     messages=msgs,
                     temperature=0.9,
                     max_tokens=600,
                 )
                 response = completion.choices[0].message.content or ""
-                cleaned_response_text = clean_text(response)
-                emoji_response_text = replace_emojis(cleaned_response_text)
-                await ctx.send(emoji_response_text)
+                await ctx.send(postprocessor.render(response))
 
         except Exception as e:
             await ctx.send(f"❌ Не удалось прожарить: {e}")
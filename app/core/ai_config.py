@@ -1,6 +1,15 @@
+import asyncio
+import math
 import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any
 
 from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
 
 PROVIDERS: dict[str, dict[str, str]] = {
     "proxyapi": {
@@ -19,6 +28,12 @@ PROVIDERS: dict[str, dict[str, str]] = {
 
 _active_provider: str = os.getenv("AI_PROVIDER", "aitunnel")
 _active_model: str = os.getenv("AI_MODEL", "gemini-3-flash-preview")
+# Модель эмбеддингов для семантических кешей (дешевле, чем модель индекса RAG)
+EMBED_MODEL = "text-embedding-3-small"
+# Сколько запросов к чат-модели выполняется одновременно
+MAX_CONCURRENT_LLM = 8
+# Ожидание в очереди дольше этого (секунды) пишется в лог
+SLOW_QUEUE_SECONDS = 1.0
 _cached_client: AsyncOpenAI | None = None
 _cached_provider_name: str | None = None
 
@@ -98,6 +113,129 @@ def get_mini_model() -> str:
     return os.getenv("AI_MODEL_MINI", "gpt-4o-mini")
 
 
+async def get_embedding(text: str) -> list[float]:
+    """Возвращает нормированный эмбеддинг текста для сравнения по косинусному сходству."""
+    response = await get_client().embeddings.create(model=EMBED_MODEL, input=text)
+    vector = response.data[0].embedding
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class Priority(IntEnum):
+    """Класс запроса к модели; меньшее значение обслуживается раньше."""
+
+    INTERACTIVE = 0  # ответы пользователям
+    TOOL_ROUTING = 1  # выбор MCP-инструмента
+    BATCH = 2  # отчеты и поздравления
+
+
+# Предел одновременных запросов каждого класса: пачка отчетов не может
+# занять все места и задержать ответы пользователям
+PRIORITY_LIMITS: dict[Priority, int] = {
+    Priority.INTERACTIVE: 6,
+    Priority.TOOL_ROUTING: 4,
+    Priority.BATCH: 2,
+}
+
+
+class LLMScheduler:
+    """Планировщик исходящих запросов к чат-модели с приоритетами.
+
+    Одновременно выполняется не больше max_concurrent запросов и не больше
+    лимита класса. Освободившееся место получает самый приоритетный из
+    ожидающих запросов, чей класс не уперся в свой лимит. Для каждого класса
+    собирается время ожидания в очереди.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_LLM,
+        limits: dict[Priority, int] | None = None,
+    ) -> None:
+        """Инициализирует планировщик без активных запросов."""
+        self.max_concurrent = max_concurrent
+        self.limits = dict(limits or PRIORITY_LIMITS)
+        self.running = 0
+        self.active = dict.fromkeys(Priority, 0)
+        self.waiters: dict[Priority, deque[asyncio.Future]] = {p: deque() for p in Priority}
+        self.requests = dict.fromkeys(Priority, 0)
+        self.wait_total = dict.fromkeys(Priority, 0.0)
+        self.wait_max = dict.fromkeys(Priority, 0.0)
+
+    def _has_room(self, priority: Priority) -> bool:
+        return self.running < self.max_concurrent and self.active[priority] < self.limits[priority]
+
+    def _take(self, priority: Priority) -> None:
+        self.running += 1
+        self.active[priority] += 1
+
+    def _release(self, priority: Priority) -> None:
+        self.running -= 1
+        self.active[priority] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Отдает свободные места ожидающим в порядке приоритета."""
+        for priority in Priority:
+            queue = self.waiters[priority]
+            while queue and self._has_room(priority):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self._take(priority)
+                    waiter.set_result(None)
+
+    async def _acquire(self, priority: Priority) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(waiter)
+        self._wake()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Место уже выдано, но ожидающий отменен: возвращаем его
+                self._release(priority)
+            elif waiter in self.waiters[priority]:
+                self.waiters[priority].remove(waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        """Ждет места для запроса класса priority и держит его до выхода из блока."""
+        started = time.monotonic()
+        await self._acquire(priority)
+        waited = time.monotonic() - started
+        self.requests[priority] += 1
+        self.wait_total[priority] += waited
+        self.wait_max[priority] = max(self.wait_max[priority], waited)
+        if waited >= SLOW_QUEUE_SECONDS:
+            print(f"Запрос {priority.name} ждал в очереди к модели {waited:.1f} с")
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    async def create(self, priority: Priority, **kwargs: Any) -> ChatCompletion:
+        """Выполняет chat.completions.create активного провайдера через очередь."""
+        async with self.slot(priority):
+            return await get_client().chat.completions.create(**kwargs)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Возвращает по каждому классу число запросов, очередь и время ожидания."""
+        return {
+            priority.name.lower(): {
+                "requests": self.requests[priority],
+                "active": self.active[priority],
+                "queued": len(self.waiters[priority]),
+                "avg_wait": round(self.wait_total[priority] / (self.requests[priority] or 1), 3),
+                "max_wait": round(self.wait_max[priority], 3),
+            }
+            for priority in Priority
+        }
+
+
+llm_scheduler = LLMScheduler()
+
+
 def next_provider() -> str:
     """Переключает на следующего провайдера по кругу и возвращает его имя."""
     providers_list = list(PROVIDERS.keys())
@@ -1,13 +1,54 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+
 import discord
 from discord.ext import commands
 
+from app.core import handlers
+from app.core.embeds import get_rank_fonts
 from app.core.scheduler import start_scheduler
 from app.data.models import init_models
+from app.services.channel_history import ChannelHistory
 from app.services.daily_report import ReportGenerator
 from app.services.telegram_notifier import telegram_notifier
 from app.services.youtube_notifier import YouTubeNotifier
+from app.services.youtube_websub import YouTubeWebSub
 from app.tools.utils import contains_only_urls
 
+MAX_MESSAGE_LENGTH = 1000
+CLASSIFICATION_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class MessageInfo:
+    """Результат предварительной классификации сообщения.
+
+    Вычисляется один раз на сообщение и используется всеми обработчиками.
+    only_urls вычисляется только для непустых сообщений, не являющихся командами.
+    """
+
+    is_command: bool
+    is_empty: bool
+    only_urls: bool
+    too_long: bool
+    has_attachments: bool
+    length: int
+
+
+def classify_message(content: str, prefix: str, has_attachments: bool = False) -> MessageInfo:
+    """Классифицирует текст сообщения по признакам, нужным обработчикам."""
+    is_command = content.startswith(prefix)
+    is_empty = not content.strip()
+    return MessageInfo(
+        is_command=is_command,
+        is_empty=is_empty,
+        only_urls=not is_command and not is_empty and contains_only_urls(content),
+        too_long=len(content) > MAX_MESSAGE_LENGTH,
+        has_attachments=has_attachments,
+        length=len(content),
+    )
+
 
 class DisBot(commands.Bot):
     """Кастомный класс бота Discord."""
@@ -22,18 +63,28 @@ class DisBot(commands.Bot):
         context_limit: int = 50,
         report_msg_limit: int = 15,
         report_time_limit: int = 60,
+        warm_up_enabled: bool = True,
+        response_cache_enabled: bool = False,
         help_command: commands.HelpCommand | None = None,
     ):
         """Инициализация бота."""
         super().__init__(command_prefix=command_prefix, intents=intents, help_command=help_command)
         self.report_generator: ReportGenerator | None = None
+        self.channel_history: ChannelHistory = ChannelHistory()
         self.youtube_notifier: YouTubeNotifier = YouTubeNotifier(self)
+        self.youtube_websub: YouTubeWebSub = YouTubeWebSub(self.youtube_notifier.handle_push)
+        if self.youtube_websub.enabled:
+            self.youtube_notifier.websub = self.youtube_websub
         self.telegram_enabled: bool = telegram_enabled
         self.weather_enabled: bool = weather_enabled
         self.search_enabled: bool = search_enabled
         self.context_limit: int = context_limit
         self.report_msg_limit: int = report_msg_limit
         self.report_time_limit: int = report_time_limit
+        self.warm_up_enabled: bool = warm_up_enabled
+        handlers.response_cache.enabled = response_cache_enabled
+        self._warm_up_task: asyncio.Task | None = None
+        self._classified: OrderedDict[int, MessageInfo] = OrderedDict()
 
     async def setup_hook(self) -> None:
         """Загрузка расширений (Cogs) при старте бота."""
@@ -44,50 +95,105 @@ class DisBot(commands.Bot):
         await self.load_extension("app.cogs.error_handler")
         await self.load_extension("app.cogs.ranks")
 
+        if self.youtube_websub.enabled:
+            await self.youtube_websub.start()
+
     async def on_ready(self) -> None:
         """Инициализация при подключении бота к Discord."""
         await init_models()
-        self.report_generator = ReportGenerator(self)
+        # on_ready повторяется после переподключений — состояние отчетов не пересоздаем
+        if self.report_generator is None:
+            self.report_generator = ReportGenerator(self)
+            await self.report_generator.recover()
         start_scheduler(self, self.youtube_notifier)
 
+        if self.warm_up_enabled and self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self.warm_up())
+
         telegram_notifier.enabled = telegram_notifier.enabled and self.telegram_enabled
         if not self.telegram_enabled:
             print("Telegram уведомления отключены в настройках бота.")
 
         print("Бот успешно подключился к Discord")
 
+    async def warm_up(self) -> None:
+        """Фоновая инициализация тяжелых подсистем после подключения к Discord.
+
+        Без прогрева подсистемы создаются при первом использовании.
+        """
+        await handlers.warm_up()
+        await asyncio.to_thread(get_rank_fonts)
+        print("Подсистемы бота прогреты")
+
+    async def close(self) -> None:
+        """Останавливает фоновые службы, отправляет накопленные уведомления и закрывается."""
+        await self.youtube_websub.stop()
+        await handlers.close_mcp_servers()
+        if self.report_generator is not None:
+            await self.report_generator.deadlines.close()
+        await telegram_notifier.close()
+        await super().close()
+
     async def on_disconnect(self) -> None:
         """Обработка отключения от Discord."""
         print("Бот отключился от Discord")
-        await telegram_notifier.send_message(
-            "⚠️ <b>Discord бот отключился</b>\nСоединение с Discord потеряно"
-        )
+        telegram_notifier.alert("⚠️ <b>Discord бот отключился</b>\nСоединение с Discord потеряно")
 
     async def on_resumed(self) -> None:
         """Обработка восстановления соединения с Discord."""
         print("Соединение с Discord восстановлено")
-        await telegram_notifier.send_message(
-            "✅ <b>Discord бот восстановил соединение</b>\nРабота продолжается"
-        )
+        telegram_notifier.alert("✅ <b>Discord бот восстановил соединение</b>\nРабота продолжается")
+
+    def classify(self, message: discord.Message) -> MessageInfo:
+        """Возвращает классификацию сообщения, вычисляя её один раз на message.id.
+
+        Кеш ограничен CLASSIFICATION_CACHE_SIZE последними сообщениями,
+        его разделяют on_message бота и слушатели в Cogs.
+        """
+        info = self._classified.get(message.id)
+        if info is None:
+            info = classify_message(
+                message.content, str(self.command_prefix), bool(message.attachments)
+            )
+            self._classified[message.id] = info
+            if len(self._classified) > CLASSIFICATION_CACHE_SIZE:
+                self._classified.popitem(last=False)
+        return info
+
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        """Удаляет сообщение из буфера последних сообщений канала."""
+        self.channel_history.remove(payload.channel_id, payload.message_id)
+
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        """Удаляет из буфера сообщения, удаленные массово (например, модерацией)."""
+        for message_id in payload.message_ids:
+            self.channel_history.remove(payload.channel_id, message_id)
+
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        """Обновляет текст сообщения в буфере последних сообщений канала."""
+        if "content" in payload.data:
+            self.channel_history.edit(
+                payload.channel_id, payload.message_id, payload.data["content"]
+            )
 
     async def on_message(self, message: discord.Message) -> None:
         """Обработка входящих сообщений."""
+        self.channel_history.add(message)
         if message.author.bot:
             return
 
-        if len(message.content) > 1000:
-            if message.content.startswith(self.command_prefix):
+        info = self.classify(message)
+
+        if info.too_long:
+            if info.is_command:
                 await message.channel.send(
-                    f"Сообщение слишком длинное: {len(message.content)} символов! "
-                    "Максимальная длина - 1000 символов."
+                    f"Сообщение слишком длинное: {info.length} символов! "
+                    f"Максимальная длина - {MAX_MESSAGE_LENGTH} символов."
                 )
             return
 
-        if not message.content.startswith(self.command_prefix):
-            if not message.content.strip():
-                return
-
-            if contains_only_urls(message.content):
+        if not info.is_command:
+            if info.is_empty or info.only_urls:
                 return
 
             if self.report_generator is not None:
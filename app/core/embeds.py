@@ -1,5 +1,6 @@
 import asyncio
 import io
+import threading
 from typing import Any
 
 import aiohttp
@@ -11,6 +12,27 @@ from app.data.request import get_user_rank
 from app.tools.prompt import RANK_CONFIG
 from app.tools.utils import darken_color, get_rank_description
 
+FONT_PATH = "./app/resource/montserrat.ttf"
+FONT_SIZES = (40, 50, 60, 70)
+
+_rank_fonts: dict[int, Any] | None = None
+# Шрифты FreeType не потокобезопасны, поэтому общие шрифты используются под блокировкой
+_render_lock = threading.Lock()
+
+
+def get_rank_fonts() -> dict[int, Any]:
+    """Возвращает шрифты карточки ранга по размеру, загружая их при первом вызове."""
+    global _rank_fonts  # noqa: PLW0603
+
+    with _render_lock:
+        if _rank_fonts is None:
+            try:
+                _rank_fonts = {size: ImageFont.truetype(FONT_PATH, size) for size in FONT_SIZES}
+            except Exception:
+                default_font = ImageFont.load_default()
+                _rank_fonts = dict.fromkeys(FONT_SIZES, default_font)
+        return _rank_fonts
+
 
 def create_help_embed() -> discord.Embed:
     """Создает embed для команды !help."""
@@ -55,6 +77,7 @@ def create_help_embed() -> discord.Embed:
         value=(
             "`!reset` - очистка истории чата\n"
             "`!ai` - переключить/выбрать AI-провайдера\n"
+            "`!ai_stats` - статистика кешей и очереди запросов к AI\n"
             "`!holiday [DD.MM] [Название]` - добавить праздник\n"
             "`!check_holiday` - принудительная проверка праздников\n"
             "`!check_birthday` - принудительная проверка дней рождения\n"
@@ -181,6 +204,34 @@ def create_image_with_text(
     avatar_img: Image.Image | None = None,  # Уже загруженное изображение
 ) -> io.BytesIO:
     """Создает изображение с текстом и аватаром пользователя."""
+    fonts = get_rank_fonts()
+    with _render_lock:
+        return _draw_rank_card(
+            fonts,
+            display_name,
+            rang_description,
+            progress_bar,
+            exp_title,
+            server_rank,
+            rank_level,
+            text_color,
+            bg_filename,
+            avatar_img,
+        )
+
+
+def _draw_rank_card(
+    fonts: dict[int, Any],
+    display_name: str,
+    rang_description: str,
+    progress_bar: str,
+    exp_title: str,
+    server_rank: int,
+    rank_level: int,
+    text_color: tuple[int, int, int] = (44, 255, 109),
+    bg_filename: str = "rang0.jpg",
+    avatar_img: Image.Image | None = None,
+) -> io.BytesIO:
     background = Image.open(f"./app/resource/{bg_filename}").convert("RGBA")
     background = background.resize((1920, 480))
 
@@ -243,16 +294,10 @@ def create_image_with_text(
             avatar_img = None
 
     # --- Шрифты ---
-    try:
-        main_font = ImageFont.truetype("./app/resource/montserrat.ttf", 70)
-        aux_font = ImageFont.truetype("./app/resource/montserrat.ttf", 40)
-        aux_value_font = ImageFont.truetype("./app/resource/montserrat.ttf", 40)
-        server_rank_font = ImageFont.truetype("./app/resource/montserrat.ttf", 50)
-        main_font_small = ImageFont.truetype("./app/resource/montserrat.ttf", 60)
-    except Exception:
-        main_font = aux_font = aux_value_font = server_rank_font = main_font_small = (
-            ImageFont.load_default()
-        )
+    main_font = fonts[70]
+    aux_font = aux_value_font = fonts[40]
+    server_rank_font = fonts[50]
+    main_font_small = fonts[60]
 
     def draw_centered_text_block(
         texts_fonts_colors: list[tuple[str, Any, tuple[int, int, int]]],
@@ -1,29 +1,53 @@
+import asyncio
+import importlib
 import json
+from datetime import timedelta
+from typing import TYPE_CHECKING
 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
-from app.core.ai_config import get_client, get_mini_model, get_model
+from app.core.ai_config import Priority, get_mini_model, get_model, llm_scheduler
 from app.services.llama_integration import LlamaIndexManager
-from app.tools.prompt import SEARCH_PROMPT, SYSTEM_BIRTHDAY_PROMPT, USER_DESCRIPTIONS, WEATHER_PROMPT
+from app.services.response_cache import response_cache
+from app.tools.postprocess import postprocessor
+from app.tools.prompt_registry import prompt_registry
+from app.tools.tokens import prompt_cache_stats, token_counter
 from app.tools.utils import (
     clean_text,
     convert_mcp_tools_to_openai,
-    count_tokens,
+    current_user_prompt,
     enrich_users_context,
-    replace_emojis,
-    user_prompt,
+    format_search_context,
 )
 
+if TYPE_CHECKING:
+    from mcp import ClientSession
+
 llama_manager = LlamaIndexManager()
 
+# Ограничение ожидания ответа MCP-сервера, чтобы зависший процесс не блокировал запросы
+MCP_TIMEOUT = timedelta(seconds=60)
+# Служебные инструменты MCP-серверов: доступны через сессию, но не передаются
+# модели, чтобы их вывод не попадал в ответ пользователю
+DIAGNOSTIC_TOOLS = frozenset({"get_weather_cache_stats", "get_search_cache_stats"})
+
+
+async def warm_up() -> None:
+    """Прогревает тяжелые подсистемы в фоне: RAG, клиент MCP и кодировку tiktoken."""
+    try:
+        await llama_manager.warm_up()
+        await asyncio.to_thread(importlib.import_module, "mcp.client.stdio")
+        await asyncio.to_thread(lambda: token_counter.encoding)
+    except Exception as e:
+        print(f"Ошибка прогрева подсистем: {e}")
+
 
 async def clear_server_history(server_id: int) -> str | None:
     """Очищает историю сообщений сервера в индексе LlamaIndex.
 
     Оставляет только документы типа 'server_users'.
     """
+    response_cache.clear(server_id)
     try:
         collection = llama_manager.get_server_collection(server_id)
         results = collection.get()
@@ -50,42 +74,68 @@ async def clear_server_history(server_id: int) -> str | None:
         return f"Произошла ошибка при очистке индекса: {e}"
 
 
+def build_chat_messages(
+    name: str | None,
+    text: str,
+    relevant_contexts: list[str],
+    tool_weather: str | None,
+    tool_search: str | None,
+) -> list[dict[str, str]]:
+    """Собирает сообщения запроса к модели: сначала неизменный префикс, затем переменные части.
+
+    Первое системное сообщение одинаково для всех запросов, поэтому провайдер
+    может кешировать его. Сведения о собеседнике, контекст RAG и данные
+    инструментов идут одним системным сообщением после него. Если name
+    не передан, запрос не привязан к автору и ответ можно отдать любому.
+    """
+    variable_parts = [current_user_prompt(name)] if name is not None else []
+    if relevant_contexts:
+        variable_parts.append(
+            "Релевантный контекст из истории сервера:\n" + "\n".join(relevant_contexts)
+        )
+    for tool_result in (tool_weather, tool_search):
+        if tool_result is not None:
+            variable_parts.append(f"Дополнительная информация от инструментов: {tool_result}")
+
+    messages = [{"role": "system", "content": prompt_registry.stable_system_prompt()}]
+    if variable_parts:
+        messages.append({"role": "system", "content": "\n\n".join(variable_parts)})
+    messages.append({"role": "user", "content": user_message(name, text)})
+    return messages
+
+
+def user_message(name: str | None, text: str) -> str:
+    """Форматирует сообщение пользователя для модели и индекса истории."""
+    return f"[Пользователь: {name}] {text}" if name is not None else text
+
+
 async def ai_generate(
     text: str,
     server_id: int,
-    name: str,
+    name: str | None,
     tool_weather: str | None,
     tool_search: str | None,
     limit: int = 15,
 ) -> str:
-    """Генерирует ответ от AI на основе контекста сервера и текущего сообщения пользователя."""
-    messages = [{"role": "system", "content": user_prompt(f"{name}")}]
+    """Генерирует ответ от AI на основе контекста сервера и текущего сообщения пользователя.
+
+    С name=None ответ генерируется без сведений об авторе (см. build_chat_messages).
+    """
     relevant_contexts = await llama_manager.query_relevant_context(server_id, text, limit=limit)
-    relevant_contexts = enrich_users_context(relevant_contexts, USER_DESCRIPTIONS)
+    relevant_contexts = enrich_users_context(
+        relevant_contexts, prompt_registry.prompts().USER_DESCRIPTIONS
+    )
 
-    if relevant_contexts:
-        context_message = {
-            "role": "system",
-            "content": "Релевантный контекст из истории сервера:\n" + "\n".join(relevant_contexts),
-        }
-        messages.append(context_message)
-
-    if tool_weather is not None:
-        tool_message = {
-            "role": "system",
-            "content": f"Дополнительная информация от инструментов: {tool_weather}",
-        }
-        messages.append(tool_message)
-
-    if tool_search is not None:
-        tool_message = {
-            "role": "system",
-            "content": f"Дополнительная информация от инструментов: {tool_search}",
-        }
-        messages.append(tool_message)
-
-    user_msg = {"role": "user", "content": f"[Пользователь: {name}] {text}"}
-    messages.append(user_msg)
+    # Ответы с данными погоды и поиска зависят от времени и в кеш не попадают
+    use_cache = response_cache.enabled and tool_weather is None and tool_search is None
+    author = str(name) if name is not None else ""
+    if use_cache:
+        cached = await response_cache.get(server_id, author, text, relevant_contexts)
+        if cached is not None:
+            print(f"Ответ из кеша: {cached}")
+            return cached
+
+    messages = build_chat_messages(name, text, relevant_contexts, tool_weather, tool_search)
 
     try:
         openai_messages = []
@@ -99,7 +149,8 @@ async def ai_generate(
                     ChatCompletionUserMessageParam(role="user", content=msg["content"])
                 )
 
-        completion = await get_client().chat.completions.create(
+        completion = await llm_scheduler.create(
+            Priority.INTERACTIVE,
             model=get_model(),
             messages=openai_messages,
             temperature=0.8,
@@ -109,19 +160,24 @@ async def ai_generate(
             max_tokens=4500,
         )
 
+        prompt_tokens, cached_tokens = prompt_cache_stats.record(completion.usage)
+        print(f"Токены промпта: {prompt_tokens}, из кеша провайдера: {cached_tokens}")
+
         response_text = completion.choices[0].message.content
-        cleaned_response_text = clean_text(response_text)
-        emoji_response_text = replace_emojis(cleaned_response_text)
+        cleaned_response_text = postprocessor.clean(response_text)
+        emoji_response_text = postprocessor.replace_emojis(cleaned_response_text)
 
         messages_to_index = [
-            {"role": "user", "content": f"[Пользователь: {name}] {text}"},
+            {"role": "user", "content": user_message(name, text)},
             {"role": "assistant", "content": cleaned_response_text},
         ]
         await llama_manager.index_messages(server_id, messages_to_index)
+        if use_cache:
+            await response_cache.put(server_id, author, text, relevant_contexts, emoji_response_text)
         print(f"Релевантный {relevant_contexts}")
-        print(count_tokens(relevant_contexts))
+        print(sum(token_counter.count_many(relevant_contexts)))
         print(f"Сообщения {messages}")
-        print(count_tokens(messages))
+        print(token_counter.count_messages(messages))
         print(f"Ответ: {emoji_response_text}")
         return emoji_response_text
     except Exception as e:
@@ -131,15 +187,19 @@ async def ai_generate(
 
 async def ai_generate_birthday_congrats(name: str) -> str:
     """Генерирует креативное поздравление с днём рождения для пользователя."""
+    prompts = prompt_registry.prompts()
     prompt = [
-        ChatCompletionSystemMessageParam(role="system", content=SYSTEM_BIRTHDAY_PROMPT.strip()),
+        ChatCompletionSystemMessageParam(
+            role="system", content=prompts.SYSTEM_BIRTHDAY_PROMPT.strip()
+        ),
         ChatCompletionUserMessageParam(
             role="user", content=f"Сгенерируй креативное поздравление с днем рождения для {name}."
         ),
     ]
 
     try:
-        completion = await get_client().chat.completions.create(
+        completion = await llm_scheduler.create(
+            Priority.BATCH,
             model=get_model(),
             messages=prompt,
             temperature=0.8,  # Оптимальный баланс креативности/когерентности
@@ -156,47 +216,135 @@ async def ai_generate_birthday_congrats(name: str) -> str:
         return "Поздравляем с днём рождения! 🎉"
 
 
-async def check_tool_intent(text: str, server_script: str, prompt: str) -> str | None:
-    """Проверяет наличие намерения использовать MCP-инструмент и обрабатывает его.
+class MCPServer:
+    """Долгоживущее stdio-подключение к MCP-серверу.
 
-    Универсальная функция для проверки намерений (погода, поиск и т.д.).
+    Процесс сервера запускается при первом обращении и переиспользуется
+    между запросами, поэтому кеши внутри сервера живут дольше одного вызова.
+    Если подключение оборвалось, следующий запрос запускает сервер заново.
     """
-    server_params = StdioServerParameters(command="python", args=[server_script], env=None)
 
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            tools_list = await session.list_tools()
+    def __init__(self, module: str) -> None:
+        """Инициализирует подключение к серверу из модуля module без запуска процесса."""
+        self.module = module
+        self.session: ClientSession | None = None
+        self.tools: list = []
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Возвращает True, если процесс сервера запущен и сессия открыта."""
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def connect(self) -> "ClientSession":
+        """Возвращает сессию, при необходимости запуская сервер."""
+        async with self._lock:
+            if self.running:
+                return self.session
+
+            ready = asyncio.get_running_loop().create_future()
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._serve(ready))
+            return await ready
+
+    async def _serve(self, ready: asyncio.Future) -> None:
+        """Держит контексты stdio-клиента открытыми в одной задаче до вызова close()."""
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
+        # Сервер запускается как модуль, чтобы ему был доступен пакет app
+        server_params = StdioServerParameters(command="python", args=["-m", self.module], env=None)
+        try:
+            async with stdio_client(server_params) as (read, write):
+                async with ClientSession(read, write, MCP_TIMEOUT) as session:
+                    await session.initialize()
+                    tools_list = await session.list_tools()
+                    self.tools = convert_mcp_tools_to_openai(
+                        [tool for tool in tools_list.tools if tool.name not in DIAGNOSTIC_TOOLS]
+                    )
+                    self.session = session
+                    ready.set_result(session)
+                    await self._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"MCP-сервер {self.module} остановлен с ошибкой: {e}")
+        finally:
+            self.session = None
+
+    async def close(self) -> None:
+        """Останавливает процесс сервера."""
+        self._stop.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+weather_server = MCPServer("app.mcp.server_weather")
+search_server = MCPServer("app.mcp.server_search")
 
-            openai_tools = convert_mcp_tools_to_openai(tools_list.tools)
 
-            messages = [
-                ChatCompletionSystemMessageParam(role="system", content=prompt.strip()),
-                ChatCompletionUserMessageParam(role="user", content=text),
-            ]
+def is_mcp_transport_error(error: Exception) -> bool:
+    """Проверяет, что ошибка вызвана обрывом подключения к MCP-серверу, а не моделью."""
+    import anyio
+    from mcp.shared.exceptions import McpError
+
+    return isinstance(
+        error, (McpError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+    )
+
 
-            final_response = await process_mcp_conversation(messages, openai_tools, session)
+async def close_mcp_servers() -> None:
+    """Останавливает процессы MCP-серверов."""
+    await asyncio.gather(weather_server.close(), search_server.close())
+
+
+async def check_tool_intent(text: str, server: MCPServer, prompt: str) -> str | None:
+    """Проверяет наличие намерения использовать MCP-инструмент и обрабатывает его.
+
+    Универсальная функция для проверки намерений (погода, поиск и т.д.).
+    """
+    session = await server.connect()
+
+    messages = [
+        ChatCompletionSystemMessageParam(role="system", content=prompt.strip()),
+        ChatCompletionUserMessageParam(role="user", content=text),
+    ]
+
+    try:
+        final_response = await process_mcp_conversation(messages, server.tools, session)
+    except Exception as e:
+        # Сервер перезапускается только при обрыве подключения: ошибки модели
+        # (лимиты, таймауты провайдера) не должны сбрасывать его кеши и
+        # прерывать вызовы инструментов других пользователей
+        if is_mcp_transport_error(e) or not server.running:
+            await server.close()
+        raise
 
-            if final_response[1] is True:
-                return final_response[0]
-            return None
+    if final_response[1] is True:
+        return final_response[0]
+    return None
 
 
 async def check_weather_intent(text: str) -> str | None:
     """Проверяет наличие намерения запросить информацию о погоде."""
-    return await check_tool_intent(text, "app/mcp/server_weather.py", WEATHER_PROMPT)
+    return await check_tool_intent(text, weather_server, prompt_registry.prompts().WEATHER_PROMPT)
 
 
 async def check_search_intent(text: str) -> str | None:
     """Проверяет наличие намерения запросить информацию через поиск."""
-    return await check_tool_intent(text, "app/mcp/server_search.py", SEARCH_PROMPT)
+    return await check_tool_intent(text, search_server, prompt_registry.prompts().SEARCH_PROMPT)
 
 
 async def process_mcp_conversation(
-    messages: list, tools: list, session: ClientSession
+    messages: list, tools: list, session: "ClientSession"
 ) -> tuple[str, bool]:
     """Обрабатывает разговор с возможными вызовами MCP-инструментов."""
-    response = await get_client().chat.completions.create(
+    response = await llm_scheduler.create(
+        Priority.TOOL_ROUTING,
         model=get_mini_model(),
         messages=messages,
         tools=tools,
@@ -215,7 +363,11 @@ async def process_mcp_conversation(
         try:
             result = await session.call_tool(function_name, function_args)
 
-            if result.content:
+            # Структурированный результат поиска сжимается в блок, готовый для промпта
+            structured = result.structuredContent
+            if structured and "sources" in structured:
+                tool_result = format_search_context(structured)
+            elif result.content:
                 tool_result = result.content[0].text if result.content else "Нет результата"
             else:
                 tool_result = "Инструмент выполнен, но результат пуст"
@@ -223,6 +375,8 @@ async def process_mcp_conversation(
             return tool_result, True
 
         except Exception as e:
+            if is_mcp_transport_error(e):
+                raise
             print(f"Ошибка при вызове инструмента: {str(e)}")
 
     return "", False
@@ -10,7 +10,11 @@ from app.core.handlers import ai_generate_birthday_congrats
 from app.data.models import Birthday, async_session
 from app.data.request import check_holiday
 from app.services.holiday import ai_generate_holiday_congrats
-from app.services.youtube_notifier import YouTubeNotifier
+from app.services.youtube_notifier import (
+    MIN_POLL_INTERVAL,
+    RECONCILE_INTERVAL,
+    YouTubeNotifier,
+)
 from app.tools.utils import chunk_message
 
 DB_TIMEOUT = 10
@@ -110,5 +114,16 @@ def start_scheduler(bot: discord.Client, youtube_notifier: YouTubeNotifier) -> N
         id="holiday_greeting",
     )
 
-    scheduler.add_job(youtube_notifier.check_new_videos, "interval", minutes=5, id="youtube_check")
+    # Каналы опрашиваются по собственным интервалам; задача лишь выбирает тех, чья очередь подошла.
+    # При push-уведомлениях WebSub опрос остается редкой сверкой на случай пропусков.
+    push_enabled = youtube_notifier.websub is not None
+    scheduler.add_job(
+        youtube_notifier.check_new_videos,
+        "interval",
+        seconds=RECONCILE_INTERVAL if push_enabled else MIN_POLL_INTERVAL,
+        id="youtube_check",
+        max_instances=1,
+        # Первая проверка сразу после старта, в том числе чтобы оформить подписки WebSub
+        next_run_time=datetime.now(pytz.timezone("Europe/Moscow")),
+    )
     scheduler.start()
@@ -8,7 +8,7 @@ from sqlalchemy import and_, delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.data.models import Birthday, ChannelMessage, Holiday, UserMessageStats, async_session
-from app.tools.utils import get_rank_description
+from app.tools.utils import crosses_rank_threshold, find_rank
 
 DB_TIMEOUT = 10
 
@@ -60,6 +60,26 @@ async def get_channel_messages(session: AsyncSession, channel_id: int) -> list[C
     return result.scalars().all()
 
 
+@db_operation("подсчете сообщений канала")
+async def count_channel_messages(session: AsyncSession, channel_id: int) -> int:
+    """Возвращает количество сохраненных сообщений канала."""
+    query = select(func.count(ChannelMessage.id)).where(ChannelMessage.channel_id == channel_id)
+    result = await session.execute(query)
+    return result.scalar_one()
+
+
+@db_operation("получении статистики сообщений каналов")
+async def get_channel_message_stats(session: AsyncSession) -> list[tuple[int, int, datetime]]:
+    """Возвращает (channel_id, количество, время последнего сообщения) по всем каналам."""
+    query = select(
+        ChannelMessage.channel_id,
+        func.count(ChannelMessage.id),
+        func.max(ChannelMessage.timestamp),
+    ).group_by(ChannelMessage.channel_id)
+    result = await session.execute(query)
+    return list(result.tuples().all())
+
+
 @db_operation("удалении сообщений канала")
 async def delete_channel_messages(session: AsyncSession, channel_id: int) -> None:
     """Удаляет сообщения канала из базы данных."""
@@ -101,9 +121,7 @@ async def update_message_count(
 
     if user_stats:
         old_count = user_stats.message_count
-        old_rank = get_rank_description(old_count)
         new_count = old_count + 1
-        new_rank = get_rank_description(new_count)
 
         stmt = (
             update(UserMessageStats)
@@ -111,26 +129,25 @@ async def update_message_count(
             .values(message_count=new_count, last_updated=func.now())
         )
         await session.execute(stmt)
-
-        rank_up = new_rank["rank_level"] > old_rank["rank_level"]
     else:
-        old_rank = get_rank_description(0)
+        old_count = 0
         new_count = 1
-        new_rank = get_rank_description(new_count)
 
         new_stat = UserMessageStats(
             user_id=user_id, name=name, guild_id=guild_id, message_count=new_count
         )
         session.add(new_stat)
 
-        rank_up = new_rank["rank_level"] > old_rank["rank_level"]
-
     await session.commit()
 
+    rank_up = crosses_rank_threshold(new_count)
+    new_rank = find_rank(new_count).level
+    old_rank = find_rank(old_count).level if rank_up else new_rank
+
     return {
         "rank_up": rank_up,
-        "old_rank": old_rank["rank_level"],
-        "new_rank": new_rank["rank_level"],
+        "old_rank": old_rank,
+        "new_rank": new_rank,
         "message_count": new_count,
     }
 
@@ -1,11 +1,19 @@
+import asyncio
 import logging
 import os
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from typing import Any
 
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 from tavily import AsyncTavilyClient
 
+from app.tools.tokens import estimate_tokens
+
 # Загружаем переменные окружения из файла .env
 load_dotenv()
 
@@ -28,23 +36,250 @@ if not SEARCH_API:
 else:
     logger.info("SEARCH_API найден в переменных окружения (длина: %d)", len(SEARCH_API))
 
-client = AsyncTavilyClient(SEARCH_API)
+# Без ключа клиент не создается: make_search_request проверяет ключ до обращения к API
+client = AsyncTavilyClient(SEARCH_API) if SEARCH_API else None
+
+# Профили глубины поиска: быстрый для простых и новостных запросов, полный для сложных.
+# ttl — сколько секунд ответ профиля хранится в кеше
+SEARCH_PROFILES: dict[str, dict[str, Any]] = {
+    "news": {"search_depth": "basic", "include_answer": "basic", "topic": "news", "ttl": 15 * 60},
+    "fast": {"search_depth": "basic", "include_answer": "basic", "ttl": 6 * 60 * 60},
+    "advanced": {"search_depth": "advanced", "include_answer": "advanced", "ttl": 60 * 60},
+}
+# auto — профиль выбирается по запросу; иначе всегда используется указанный профиль
+SEARCH_DEPTH = os.getenv("SEARCH_DEPTH", "auto")
+NEWS_PATTERN = re.compile(
+    r"\b(сегодня|сейчас|вчера|новост\w*|последн\w*|курс\w*|цен\w*|сч[её]т|матч\w*|"
+    r"today|now|latest|news|price)\b",
+    re.IGNORECASE,
+)
+ADVANCED_PATTERN = re.compile(
+    r"\b(почему|сравни\w*|разниц\w*|отлич\w*|объясни\w*|обзор\w*|плюсы|минусы|"
+    r"why|compare|versus|vs)\b",
+    re.IGNORECASE,
+)
+# Запрос длиннее этого числа слов считается сложным
+ADVANCED_MIN_WORDS = 12
+
+# Полный текст страниц (include_raw_content) нужен редко и весит мегабайты,
+# поэтому по умолчанию запрашиваются только сниппеты
+SEARCH_RAW_CONTENT = os.getenv("SEARCH_RAW_CONTENT", "0") == "1"
+# Сколько лучших источников и токенов результата передается модели
+SEARCH_TOP_K = 3
+SEARCH_TOKEN_BUDGET = 800
+
+SEARCH_CACHE_SIZE = 256
+# Минимальное косинусное сходство, при котором перефразированный запрос считается тем же
+SIMILARITY_THRESHOLD = 0.93
+
+
+@dataclass
+class SearchSource:
+    """Источник в сжатом результате поиска."""
+
+    title: str
+    url: str
+    snippet: str
+
+
+@dataclass
+class SearchResult:
+    """Структурированный результат поиска для промпта основной модели."""
+
+    query: str
+    answer: str
+    sources: list[SearchSource]
+
 
+def _trim_to_tokens(text: str, budget: int) -> str:
+    """Обрезает текст по границе предложения или слова, чтобы уложиться в бюджет."""
+    if estimate_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    # estimate_tokens считает байты UTF-8; три байта оставляем под многоточие
+    text = text.encode("utf-8")[: budget * 4 - 3].decode("utf-8", errors="ignore")
+    cut = max(text.rfind(". "), text.rfind("! "), text.rfind("? "))
+    if cut < len(text) // 2:
+        cut = text.rfind(" ")
+    return text[: cut + 1].rstrip() + "…" if cut > 0 else ""
 
-async def make_search_request(endpoint: str) -> dict[str, Any] | None:
-    """Выполняет поисковый запрос к Tavily API."""
+
+def condense_results(
+    query: str, data: dict[str, Any], top_k: int = SEARCH_TOP_K, budget: int = SEARCH_TOKEN_BUDGET
+) -> SearchResult:
+    """Оставляет ответ и top_k лучших сниппетов, укладываясь в бюджет токенов."""
+    answer = _trim_to_tokens((data.get("answer") or "").strip(), budget)
+    remaining = budget - estimate_tokens(answer)
+
+    sources: list[SearchSource] = []
+    seen: set[str] = set()
+    ranked = sorted(data.get("results") or [], key=lambda r: r.get("score") or 0, reverse=True)
+    for item in ranked:
+        url = item.get("url") or ""
+        if len(sources) >= top_k or remaining <= 0:
+            break
+        if url in seen:
+            continue
+        seen.add(url)
+
+        title = (item.get("title") or "").strip()
+        text = " ".join((item.get("content") or item.get("raw_content") or "").split())
+        snippet = _trim_to_tokens(text, remaining - estimate_tokens(title + url))
+        if not snippet:
+            continue
+        remaining -= estimate_tokens(title + url + snippet)
+        sources.append(SearchSource(title=title, url=url, snippet=snippet))
+
+    return SearchResult(query=query, answer=answer, sources=sources)
+
+
+def normalize_query(query: str) -> str:
+    """Приводит запрос к виду для точного сравнения: регистр, пробелы, знаки в конце."""
+    return " ".join(query.casefold().split()).rstrip("?!. ")
+
+
+def choose_profile(query: str) -> str:
+    """Выбирает профиль глубины поиска по типу запроса."""
+    if SEARCH_DEPTH in SEARCH_PROFILES:
+        return SEARCH_DEPTH
+    if NEWS_PATTERN.search(query):
+        return "news"
+    if ADVANCED_PATTERN.search(query) or len(query.split()) >= ADVANCED_MIN_WORDS:
+        return "advanced"
+    return "fast"
+
+
+async def embed_query(query: str) -> list[float] | None:
+    """Возвращает нормированный эмбеддинг запроса или None при ошибке."""
+    # Импорт после load_dotenv: ai_config читает провайдера из окружения при импорте
+    from app.core.ai_config import get_embedding
+
+    try:
+        return await get_embedding(query)
+    except Exception as e:
+        logger.error(f"Ошибка получения эмбеддинга: {str(e)}")
+        return None
+
+
+@dataclass(slots=True)
+class SearchEntry:
+    """Закешированный ответ поиска."""
+
+    data: dict[str, Any]
+    profile: str
+    embedding: list[float] | None
+    expires: float
+
+
+class SearchCache:
+    """Кеш результатов поиска с точным и семантическим поиском по запросу.
+
+    Сначала ищется точное совпадение нормализованного запроса, затем запрос
+    с тем же профилем, эмбеддинг которого близок к эмбеддингу нового запроса
+    (перефразированный вопрос). Записи живут TTL своего профиля.
+    Одновременные одинаковые запросы выполняются одним обращением к API.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, str], Awaitable[dict[str, Any] | None]],
+        embed: Callable[[str], Awaitable[list[float] | None]] = embed_query,
+        maxsize: int = SEARCH_CACHE_SIZE,
+        threshold: float = SIMILARITY_THRESHOLD,
+    ) -> None:
+        """Инициализирует кеш с функциями запроса к API и получения эмбеддингов."""
+        self.fetch = fetch
+        self.embed = embed
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.entries: OrderedDict[str, SearchEntry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    async def get(self, query: str) -> dict[str, Any] | None:
+        """Возвращает результат поиска из кеша или выполняет запрос."""
+        key = normalize_query(query)
+        profile = choose_profile(query)
+        self._expire()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.data
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, query, profile))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, query: str, profile: str) -> dict[str, Any] | None:
+        embedding = await self.embed(query)
+        if embedding is not None:
+            similar = self._most_similar(embedding, profile)
+            if similar is not None:
+                self.semantic_hits += 1
+                logger.info(f"Семантическое попадание в кеш поиска: {query}")
+                return similar.data
+
+        self.misses += 1
+        data = await self.fetch(query, profile)
+        if data is None:
+            return None
+
+        ttl = SEARCH_PROFILES[profile]["ttl"]
+        self.entries[key] = SearchEntry(data, profile, embedding, time.monotonic() + ttl)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return data
+
+    def _most_similar(self, embedding: list[float], profile: str) -> SearchEntry | None:
+        best: SearchEntry | None = None
+        best_score = self.threshold
+        for entry in self.entries.values():
+            if entry.embedding is None or entry.profile != profile:
+                continue
+            score = sum(a * b for a, b in zip(embedding, entry.embedding, strict=True))
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, entry in self.entries.items() if entry.expires <= now]:
+            del self.entries[key]
+
+    def stats(self) -> dict[str, int]:
+        """Возвращает счетчики попаданий и промахов."""
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "size": len(self.entries),
+        }
+
+
+async def make_search_request(endpoint: str, profile: str = "advanced") -> dict[str, Any] | None:
+    """Выполняет поисковый запрос к Tavily API с параметрами профиля глубины."""
     # Проверяем наличие API ключа
     if not SEARCH_API:
         logger.error("SEARCH_API не найден в переменных окружения")
         return None
 
+    options = {name: value for name, value in SEARCH_PROFILES[profile].items() if name != "ttl"}
     try:
+        logger.info(f"Запрос к API (профиль {profile}): {endpoint}")
         response = await client.search(
             query=endpoint,
-            include_answer="advanced",
-            include_raw_content="text",
+            include_raw_content="text" if SEARCH_RAW_CONTENT else False,
             country="russia",
             include_favicon=False,
+            **options,
         )
         return response
     except Exception as e:
@@ -52,29 +287,30 @@ async def make_search_request(endpoint: str) -> dict[str, Any] | None:
         return None
 
 
+search_cache = SearchCache(make_search_request)
+
+
 @mcp.tool()
-async def get_current_search(text: str) -> str:
-    """Получить описание поискового запроса."""
+async def get_current_search(text: str) -> SearchResult:
+    """Найти актуальную информацию в интернете: краткий ответ и лучшие источники."""
     logger.info(f"Поиск: {text}")
 
-    # Выполняем запрос к API
-    data = await make_search_request(text)
+    # Выполняем запрос к API через кеш
+    data = await search_cache.get(text)
 
     # Обработка ошибок
     if not data:
-        return f"❌ Поиск для '{text}' не удался."
+        return SearchResult(query=text, answer=f"❌ Поиск для '{text}' не удался.", sources=[])
 
-    # Извлекаем данные из ответа
-    try:
-        # Основная информация
-        result = data["answer"]
+    result = condense_results(text, data)
+    logger.info(f"Успешно выполнен поиск по {text}: источников {len(result.sources)}")
+    return result
 
-        logger.info(f"Успешно выполнен поиск по {text}")
-        return result
 
-    except KeyError as e:
-        logger.error(f"Ошибка при обработке данных: {e}")
-        return f"❌ Ошибка при обработке данных о поиске: {str(e)}"
+@mcp.tool()
+async def get_search_cache_stats() -> str:
+    """Служебный инструмент: статистика кеша поиска (попадания, промахи, размер)."""
+    return ", ".join(f"{name}={value}" for name, value in search_cache.stats().items())
 
 
 # Запуск сервера
@@ -1,5 +1,10 @@
+import asyncio
 import logging
 import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from typing import Any
 
 import httpx
@@ -30,6 +35,132 @@ else:
 
 OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5"
 
+# Время жизни кеша (секунды): текущая погода меняется быстрее прогноза
+CURRENT_TTL = 10 * 60
+FORECAST_TTL = 60 * 60
+# Сколько после истечения TTL можно отдавать устаревший ответ, обновляя его в фоне
+STALE_TTL = 30 * 60
+# Время жизни отрицательного ответа «город не найден»
+NOT_FOUND_TTL = 60 * 60
+CACHE_SIZE = 256
+# Прогноз запрашивается на максимум дней, чтобы одна запись кеша подходила для любого days
+FORECAST_MAX_DAYS = 5
+
+
+class CityNotFoundError(Exception):
+    """OpenWeatherMap не знает такого города (HTTP 404)."""
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """Ответ API в кеше; data=None означает, что город не найден."""
+
+    data: dict[str, Any] | None
+    expires: float
+    stale_until: float
+
+
+class WeatherCache:
+    """TTL-кеш ответов OpenWeatherMap по нормализованному (endpoint, город, единицы).
+
+    Свежая запись отдается сразу. Устаревшая, но не старше STALE_TTL, тоже
+    отдается сразу, а в фоне запускается обновление (stale-while-revalidate).
+    Неизвестные города кешируются отрицательно; временные ошибки не кешируются.
+    Одновременные запросы одного ключа выполняются одним обращением к API.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, dict[str, Any]], Awaitable[dict[str, Any] | None]],
+        maxsize: int = CACHE_SIZE,
+    ) -> None:
+        """Инициализирует кеш с функцией запроса к API."""
+        self.fetch = fetch
+        self.maxsize = maxsize
+        self.entries: OrderedDict[tuple[str, str, str], CacheEntry] = OrderedDict()
+        self._inflight: dict[tuple[str, str, str], asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(endpoint: str, city: str, units: str) -> tuple[str, str, str]:
+        """Нормализует ключ: регистр и лишние пробелы в названии города не важны."""
+        return endpoint, " ".join(city.split()).casefold(), units.strip().lower()
+
+    async def get(
+        self, endpoint: str, city: str, units: str, ttl: float, **params: Any
+    ) -> dict[str, Any] | None:
+        """Возвращает ответ API из кеша или запрашивает его."""
+        key = self.key(endpoint, city, units)
+        now = time.monotonic()
+        entry = self.entries.get(key)
+
+        if entry is not None and now < entry.stale_until:
+            self.entries.move_to_end(key)
+            if entry.data is None:
+                self.negative_hits += 1
+            elif now < entry.expires:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start(key, ttl, params)
+            return entry.data
+
+        self.misses += 1
+        task = self._inflight.get(key) or self._start(key, ttl, params)
+        return await asyncio.shield(task)
+
+    def _start(self, key: tuple[str, str, str], ttl: float, params: dict[str, Any]) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, ttl, params))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _load(
+        self, key: tuple[str, str, str], ttl: float, params: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        endpoint, city, units = key
+        try:
+            data = await self.fetch(endpoint, {"q": city, "units": units, **params})
+        except CityNotFoundError:
+            expires = time.monotonic() + NOT_FOUND_TTL
+            self._store(key, CacheEntry(None, expires, expires))
+            return None
+
+        if data is None:
+            # Временная ошибка: устаревшая запись, если есть, остается в кеше
+            self.errors += 1
+            entry = self.entries.get(key)
+            return entry.data if entry is not None else None
+
+        now = time.monotonic()
+        self._store(key, CacheEntry(data, now + ttl, now + ttl + STALE_TTL))
+        return data
+
+    def _store(self, key: tuple[str, str, str], entry: CacheEntry) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """Возвращает счетчики попаданий и промахов."""
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "size": len(self.entries),
+        }
+
 
 async def make_weather_request(endpoint: str, params: dict[str, Any]) -> dict[str, Any] | None:
     """Выполняет запрос к OpenWeatherMap API."""
@@ -54,6 +185,9 @@ async def make_weather_request(endpoint: str, params: dict[str, Any]) -> dict[st
             response.raise_for_status()  # Вызовет исключение при ошибке HTTP
             return response.json()
     except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            logger.info(f"Город не найден: {params.get('q')}")
+            raise CityNotFoundError(params.get("q")) from e
         logger.error(f"HTTP ошибка: {e.response.status_code} - {e.response.text}")
         return None
     except Exception as e:
@@ -61,16 +195,16 @@ async def make_weather_request(endpoint: str, params: dict[str, Any]) -> dict[st
         return None
 
 
+weather_cache = WeatherCache(make_weather_request)
+
+
 @mcp.tool()
 async def get_current_weather(city: str, units: str = "metric") -> str:
     """Получить текущую погоду для указанного города."""
     logger.info(f"Запрос погоды для города: {city}")
 
-    # Формируем параметры запроса
-    params = {"q": city, "units": units}
-
-    # Выполняем запрос к API
-    data = await make_weather_request("weather", params)
+    # Выполняем запрос к API через кеш
+    data = await weather_cache.get("weather", city, units, CURRENT_TTL)
 
     # Обработка ошибок
     if not data:
@@ -118,17 +252,10 @@ async def get_forecast(city: str, days: int = 3, units: str = "metric") -> str:
     logger.info(f"Запрос прогноза для города: {city} на {days} дней")
 
     # Ограничиваем количество дней
-    days = min(max(days, 1), 5)
+    days = min(max(days, 1), FORECAST_MAX_DAYS)
 
-    # Формируем параметры запроса
-    params = {
-        "q": city,
-        "units": units,
-        "cnt": days * 8,  # API возвращает данные каждые 3 часа, 8 записей = 1 день
-    }
-
-    # Выполняем запрос к API
-    data = await make_weather_request("forecast", params)
+    # Выполняем запрос к API через кеш; API возвращает данные каждые 3 часа, 8 записей = 1 день
+    data = await weather_cache.get("forecast", city, units, FORECAST_TTL, cnt=FORECAST_MAX_DAYS * 8)
 
     # Обработка ошибок
     if not data:
@@ -179,6 +306,12 @@ async def get_forecast(city: str, days: int = 3, units: str = "metric") -> str:
         return f"❌ Ошибка при обработке данных прогноза: {str(e)}"
 
 
+@mcp.tool()
+async def get_weather_cache_stats() -> str:
+    """Служебный инструмент: статистика кеша погоды (попадания, промахи, размер)."""
+    return ", ".join(f"{name}={value}" for name, value in weather_cache.stats().items())
+
+
 def format_day_forecast(day_data: list, temp_unit: str) -> str:
     """Форматирует прогноз на один день."""
     # Берем первую запись для даты
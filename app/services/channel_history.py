@@ -0,0 +1,116 @@
+"""Кольцевой буфер последних сообщений каналов, заполняемый событиями gateway."""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, replace
+
+import discord
+
+# Сколько последних сообщений хранится на канал
+HISTORY_SIZE = 200
+# Сколько каналов держится в памяти; давно неактивные вытесняются
+MAX_CHANNELS = 500
+# Текст сообщения в буфере обрезается до этой длины
+CONTENT_LIMIT = 500
+
+
+@dataclass(frozen=True, slots=True)
+class RecentMessage:
+    """Краткая запись о сообщении канала."""
+
+    message_id: int
+    author_id: int
+    author_name: str
+    content: str
+    has_attachments: bool
+    has_stickers: bool
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> "RecentMessage":
+        """Создает запись из сообщения Discord."""
+        return cls(
+            message_id=message.id,
+            author_id=message.author.id,
+            author_name=message.author.name,
+            content=(message.content or "")[:CONTENT_LIMIT],
+            has_attachments=bool(message.attachments),
+            has_stickers=bool(message.stickers),
+        )
+
+
+class ChannelHistory:
+    """Последние сообщения каналов без обращений к REST API.
+
+    Буфер канала пополняется из on_message. Пока канал «холодный» (бот
+    видел в нем меньше сообщений, чем запрошено, и история еще не
+    подгружалась), недостающее один раз подгружается через channel.history,
+    дальше канал обслуживается только из памяти.
+    """
+
+    def __init__(self, maxlen: int = HISTORY_SIZE, max_channels: int = MAX_CHANNELS) -> None:
+        """Инициализирует пустой буфер."""
+        self.maxlen = maxlen
+        self.max_channels = max_channels
+        self.channels: OrderedDict[int, deque[RecentMessage]] = OrderedDict()
+        # Каналы, чей буфер содержит непрерывную историю (подгружен через REST)
+        self.complete: set[int] = set()
+
+    def _buffer(self, channel_id: int) -> deque[RecentMessage]:
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            buffer = self.channels[channel_id] = deque(maxlen=self.maxlen)
+            if len(self.channels) > self.max_channels:
+                evicted, _ = self.channels.popitem(last=False)
+                self.complete.discard(evicted)
+        else:
+            self.channels.move_to_end(channel_id)
+        return buffer
+
+    def add(self, message: discord.Message) -> None:
+        """Добавляет сообщение из события gateway."""
+        self._buffer(message.channel.id).append(RecentMessage.from_message(message))
+
+    def remove(self, channel_id: int, message_id: int) -> None:
+        """Удаляет сообщение из буфера."""
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            return
+        for entry in buffer:
+            if entry.message_id == message_id:
+                buffer.remove(entry)
+                return
+
+    def edit(self, channel_id: int, message_id: int, content: str) -> None:
+        """Обновляет текст отредактированного сообщения."""
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            return
+        for i, entry in enumerate(buffer):
+            if entry.message_id == message_id:
+                buffer[i] = replace(entry, content=content[:CONTENT_LIMIT])
+                return
+
+    async def recent(self, channel: discord.abc.Messageable, limit: int) -> list[RecentMessage]:
+        """Возвращает до limit последних сообщений канала от новых к старым."""
+        buffer = self.channels.get(channel.id)
+        if channel.id not in self.complete and (buffer is None or len(buffer) < limit):
+            await self.backfill(channel)
+            buffer = self.channels[channel.id]
+
+        result = []
+        for entry in reversed(buffer):
+            if len(result) >= limit:
+                break
+            result.append(entry)
+        return result
+
+    async def backfill(self, channel: discord.abc.Messageable) -> None:
+        """Подгружает историю канала через REST и объединяет её с буфером."""
+        fetched = [RecentMessage.from_message(m) async for m in channel.history(limit=self.maxlen)]
+        buffer = self._buffer(channel.id)
+        merged = {entry.message_id: entry for entry in fetched}
+        # Сообщения из gateway новее или равны загруженным: их версия приоритетнее
+        merged.update((entry.message_id, entry) for entry in buffer)
+
+        buffer.clear()
+        buffer.extend(merged[message_id] for message_id in sorted(merged)[-self.maxlen :])
+        self.complete.add(channel.id)
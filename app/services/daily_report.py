@@ -1,13 +1,145 @@
 import asyncio
+import heapq
+import re
+import time
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Any
 
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
-from app.core.ai_config import get_client, get_mini_model
-from app.data.request import delete_channel_messages, get_channel_messages, save_channel_message
-from app.tools.prompt import UPDATED_REPORT_PROMPT
+from app.core.ai_config import Priority, get_mini_model, llm_scheduler
+from app.data.request import (
+    count_channel_messages,
+    delete_channel_messages,
+    get_channel_message_stats,
+    get_channel_messages,
+    save_channel_message,
+)
+from app.tools.prompt_registry import prompt_registry
+from app.tools.utils import chunk_message, count_tokens
+
+# Бюджет токенов на один фрагмент переписки для промежуточной сводки
+REPORT_CHUNK_TOKENS = 3000
+# Бюджет токенов на сводки, объединяемые за один запрос
+REPORT_MERGE_TOKENS = 6000
+# Сколько отчетов может генерироваться одновременно (например, после перезапуска)
+MAX_CONCURRENT_REPORTS = 3
+# Ссылка на сообщение в тексте отчета, которую модель оставляет в виде [ID:123]
+REPORT_ID_PATTERN = re.compile(r"\[ID:(\d+)\]")
+
+
+def link_message_ids(report: str, links: dict[str, str]) -> str:
+    """Заменяет метки [ID:...] ссылками на сообщения за один проход по тексту.
+
+    Метки с неизвестными идентификаторами остаются без изменений.
+    """
+
+    def replace(match: re.Match[str]) -> str:
+        link = links.get(match.group(1))
+        return f"[ссылка]({link})" if link else match.group(0)
+
+    return REPORT_ID_PATTERN.sub(replace, report)
+
+
+def format_report_line(message_id: int, author: str, content: str) -> str:
+    """Форматирует сообщение канала для промпта отчета."""
+    return f"[ID:{message_id}] {author}: {content}"
+
+
+def split_by_tokens(lines: list[str], budget: int) -> list[list[str]]:
+    """Делит строки на последовательные фрагменты не больше budget токенов.
+
+    Строка длиннее бюджета образует отдельный фрагмент.
+    """
+    chunks: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+    for line in lines:
+        tokens = count_tokens(line)
+        if current and current_tokens + tokens > budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class DeadlineScheduler:
+    """Дедлайны по ключам, обслуживаемые одной фоновой задачей.
+
+    Дедлайны хранятся в куче с ленивым удалением: перенос дедлайна добавляет
+    новую запись, а устаревшие отбрасываются при извлечении. Когда устаревших
+    записей становится слишком много, куча перестраивается.
+    """
+
+    def __init__(self, callback: Callable[[int], Awaitable[None]]) -> None:
+        """Инициализирует планировщик с обработчиком наступивших дедлайнов."""
+        self.callback = callback
+        self.deadlines: dict[int, float] = {}
+        self._heap: list[tuple[float, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    def schedule(self, key: int, delay: float) -> None:
+        """Устанавливает или переносит дедлайн ключа на delay секунд от текущего момента."""
+        deadline = time.monotonic() + delay
+        self.deadlines[key] = deadline
+        # Будить задачу нужно, только если новый дедлайн раньше ближайшего в куче
+        if not self._heap or deadline < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (deadline, key))
+
+        if len(self._heap) > 2 * len(self.deadlines) + 64:
+            self._heap = [(deadline, key) for key, deadline in self.deadlines.items()]
+            heapq.heapify(self._heap)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self, key: int) -> None:
+        """Снимает дедлайн ключа."""
+        self.deadlines.pop(key, None)
+
+    async def _run(self) -> None:
+        while self.deadlines:
+            now = time.monotonic()
+            while self._heap:
+                deadline, key = self._heap[0]
+                if self.deadlines.get(key) != deadline:
+                    heapq.heappop(self._heap)
+                    continue
+                if deadline > now:
+                    break
+                heapq.heappop(self._heap)
+                del self.deadlines[key]
+                task = asyncio.create_task(self.callback(key))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            if not self._heap:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._heap[0][0] - now)
+            except TimeoutError:
+                pass
+
+        self._heap.clear()
+
+    async def close(self) -> None:
+        """Останавливает фоновую задачу и дожидается запущенных обработчиков."""
+        self.deadlines.clear()
+        self._heap.clear()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
 
 
 @dataclass
@@ -17,7 +149,11 @@ class ChannelState:
     lock: asyncio.Lock = field(default_factory=asyncio.Lock)
     messages: list[dict[str, Any]] = field(default_factory=list)
     last_message_time: datetime = field(default_factory=datetime.now)
-    timer: asyncio.Task | None = None
+    # Промежуточные сводки уже обработанных фрагментов и граница по ID сообщения
+    summaries: list[str] = field(default_factory=list)
+    summarized_until: int = 0
+    pending_tokens: int = 0
+    summary_task: asyncio.Task | None = None
 
 
 class ReportGenerator:
@@ -26,12 +162,22 @@ class ReportGenerator:
     Накапливает сообщения и автоматически отправляет отчёт
     после заданного времени без активности при достижении порогового
     количества сообщений.
+
+    Отчет строится по схеме map-reduce: по мере накопления сообщений
+    фрагменты по REPORT_CHUNK_TOKENS токенов сворачиваются в промежуточные
+    сводки, а итоговый отчет объединяет сводки и хвост несвернутых сообщений.
+
+    Периоды тишины отслеживаются одним DeadlineScheduler на все каналы:
+    новое сообщение лишь переносит дедлайн канала. После перезапуска
+    дедлайны восстанавливаются из channel_messages (см. recover).
     """
 
     def __init__(self, bot: Any) -> None:
         """Инициализирует генератор отчётов."""
         self.bot = bot
         self.channels: dict[int, ChannelState] = {}
+        self.deadlines = DeadlineScheduler(self.on_quiet_period)
+        self._report_slots = asyncio.Semaphore(MAX_CONCURRENT_REPORTS)
 
     def get_state(self, channel_id: int) -> ChannelState:
         """Возвращает (или создает) состояние для указанного канала."""
@@ -63,44 +209,167 @@ class ReportGenerator:
 
             state.last_message_time = datetime.now()
 
-            # Если таймер уже запущен — отменяем, так как активность продолжилась
-            if state.timer and not state.timer.done():
-                try:
-                    state.timer.cancel()
-                except Exception as e:
-                    print(f"Ошибка при отмене таймера для канала {channel_id}: {e}")
+            state.pending_tokens += count_tokens(format_report_line(message_id, author, message))
+            if state.pending_tokens >= REPORT_CHUNK_TOKENS and (
+                state.summary_task is None or state.summary_task.done()
+            ):
+                state.summary_task = asyncio.create_task(self.summarize_pending(channel_id))
 
             try:
-                db_messages = await get_channel_messages(channel_id)
+                db_count = await count_channel_messages(channel_id)
             except Exception as e:
-                print(f"Ошибка при получении сообщений из канала {channel_id}: {e}")
-                db_messages = []
+                print(f"Ошибка при подсчете сообщений канала {channel_id}: {e}")
+                db_count = 0
 
             cache_count = len(state.messages)
-            db_count = len(db_messages)
 
+            # Активность продолжилась — отчет откладывается до нового периода тишины
             if cache_count >= self.bot.report_msg_limit or db_count >= self.bot.report_msg_limit:
-                state.timer = asyncio.create_task(self.start_report_timer(channel_id))
+                self.deadlines.schedule(channel_id, self.bot.report_time_limit * 60)
 
-    async def start_report_timer(self, channel_id: int) -> None:
-        """Запускает таймер ожидания.
+    async def on_quiet_period(self, channel_id: int) -> None:
+        """Вызывается планировщиком по истечении периода тишины в канале.
 
         Если после последнего сообщения прошло достаточно времени,
         генерирует и отправляет аналитический отчёт.
         """
-        await asyncio.sleep(self.bot.report_time_limit * 60)
-
         if channel_id not in self.channels:
             return
 
         state = self.channels[channel_id]
         async with state.lock:
-            if (datetime.now() - state.last_message_time) < timedelta(
-                minutes=self.bot.report_time_limit
-            ):
+            quiet_for = datetime.now() - state.last_message_time
+            remaining = timedelta(minutes=self.bot.report_time_limit) - quiet_for
+            if remaining > timedelta(0):
+                self.deadlines.schedule(channel_id, remaining.total_seconds())
+                return
+
+        async with self._report_slots:
+            await self.generate_and_send_report(channel_id)
+
+    async def recover(self) -> int:
+        """Восстанавливает дедлайны отчетов по сообщениям, сохраненным до перезапуска.
+
+        Количество и время последнего сообщения по каналам читаются одним
+        агрегирующим запросом. Просроченные отчеты запускаются сразу, но не
+        более MAX_CONCURRENT_REPORTS одновременно. Возвращает число
+        восстановленных каналов.
+        """
+        try:
+            stats = await get_channel_message_stats()
+        except Exception as e:
+            print(f"Ошибка при восстановлении состояния отчетов: {e}")
+            return 0
+
+        quiet_period = timedelta(minutes=self.bot.report_time_limit)
+        now = datetime.now()
+        recovered = 0
+        for channel_id, count, last_message_time in stats:
+            if count < self.bot.report_msg_limit or channel_id in self.channels:
+                continue
+
+            state = self.get_state(channel_id)
+            state.last_message_time = last_message_time or now
+            remaining = quiet_period - (now - state.last_message_time)
+            self.deadlines.schedule(channel_id, max(remaining.total_seconds(), 0.0))
+            recovered += 1
+
+        if recovered:
+            print(f"Восстановлены отчеты для {recovered} каналов")
+        return recovered
+
+    async def _complete(self, system_prompt: str, user_content: str) -> str:
+        """Выполняет запрос к мини-модели с детерминированными настройками."""
+        message_payload = [
+            ChatCompletionSystemMessageParam(role="system", content=system_prompt),
+            ChatCompletionUserMessageParam(role="user", content=user_content),
+        ]
+        response = await llm_scheduler.create(
+            Priority.BATCH,
+            model=get_mini_model(),
+            messages=message_payload,
+            temperature=0.0,
+            top_p=0.01,
+        )
+        return response.choices[0].message.content or ""
+
+    async def summarize_chunk(self, lines: list[str]) -> str:
+        """Сворачивает фрагмент переписки или сводок в список тем (шаг map)."""
+        return await self._complete(prompt_registry.prompts().REPORT_CHUNK_PROMPT, "\n".join(lines))
+
+    async def summarize_pending(self, channel_id: int) -> None:
+        """Сворачивает накопленные сообщения канала в промежуточные сводки.
+
+        Запрос к модели выполняется без блокировки канала, чтобы не задерживать
+        прием новых сообщений.
+        """
+        state = self.channels.get(channel_id)
+        if state is None:
+            return
+
+        async with state.lock:
+            pending = [msg for msg in state.messages if msg["id"] > state.summarized_until]
+            lines = [format_report_line(msg["id"], msg["author"], msg["content"]) for msg in pending]
+            chunks = split_by_tokens(lines, REPORT_CHUNK_TOKENS)
+            # Последний неполный фрагмент дожидается новых сообщений
+            if chunks and sum(map(count_tokens, chunks[-1])) < REPORT_CHUNK_TOKENS:
+                chunks.pop()
+            if not chunks:
+                return
+
+        try:
+            summaries = await asyncio.gather(*(self.summarize_chunk(chunk) for chunk in chunks))
+        except Exception as e:
+            print(f"Ошибка промежуточной сводки для канала {channel_id}: {e}")
+            return
+
+        async with state.lock:
+            if self.channels.get(channel_id) is not state:
                 return
+            state.summaries.extend(summaries)
+            state.summarized_until = pending[sum(map(len, chunks)) - 1]["id"]
+            state.pending_tokens = sum(
+                count_tokens(format_report_line(msg["id"], msg["author"], msg["content"]))
+                for msg in state.messages
+                if msg["id"] > state.summarized_until
+            )
+
+    async def merge_summaries(self, summaries: list[str]) -> str:
+        """Объединяет сводки фрагментов в итоговый отчет (шаг reduce).
+
+        Если сводки не помещаются в REPORT_MERGE_TOKENS, они сначала
+        объединяются группами.
+        """
+        while len(summaries) > 1 and sum(map(count_tokens, summaries)) > REPORT_MERGE_TOKENS:
+            groups = split_by_tokens(summaries, REPORT_MERGE_TOKENS)
+            if len(groups) == len(summaries):
+                # Каждая сводка занимает весь бюджет — объединяем попарно
+                groups = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+            summaries = list(await asyncio.gather(*(self.summarize_chunk(g) for g in groups)))
+
+        return await self._complete(
+            prompt_registry.prompts().REPORT_MERGE_PROMPT,
+            "Сводки фрагментов канала:\n" + "\n\n".join(summaries),
+        )
+
+    async def build_report(self, state: ChannelState, messages: list[Any]) -> str:
+        """Строит отчет по сообщениям канала с учетом промежуточных сводок."""
+        lines = [
+            format_report_line(msg.message_id, msg.author, msg.content)
+            for msg in messages
+            if msg.message_id > state.summarized_until
+        ]
+        chunks = split_by_tokens(lines, REPORT_CHUNK_TOKENS)
+
+        if not state.summaries and len(chunks) <= 1:
+            messages_text = "\n".join(lines)
+            return await self._complete(
+                prompt_registry.prompts().UPDATED_REPORT_PROMPT,
+                f"Сообщения из канала:\n{messages_text}",
+            )
 
-        await self.generate_and_send_report(channel_id)
+        tail = await asyncio.gather(*(self.summarize_chunk(chunk) for chunk in chunks))
+        return await self.merge_summaries([*state.summaries, *tail])
 
     async def generate_and_send_report(self, channel_id: int) -> None:
         """Генерирует аналитический отчёт и отправляет его в канал.
@@ -111,9 +380,14 @@ class ReportGenerator:
         if not channel:
             print(f"Канал {channel_id} недоступен, пропускаем генерацию отчёта")
             self.channels.pop(channel_id, None)
+            self.deadlines.cancel(channel_id)
             return
 
         state = self.get_state(channel_id)
+        # Дожидаемся начатой промежуточной сводки, чтобы не сворачивать сообщения дважды
+        if state.summary_task and not state.summary_task.done():
+            await asyncio.gather(state.summary_task, return_exceptions=True)
+
         async with state.lock:
             try:
                 messages = await get_channel_messages(channel_id)
@@ -126,44 +400,21 @@ class ReportGenerator:
             if not messages or len(messages) < self.bot.report_msg_limit:
                 return
 
-            messages_text = "\n".join(
-                f"[ID:{msg.message_id}] {msg.author}: {msg.content}" for msg in messages
-            )
-
-            message_payload = [
-                ChatCompletionSystemMessageParam(
-                    role="system",
-                    content=UPDATED_REPORT_PROMPT,
-                ),
-                ChatCompletionUserMessageParam(
-                    role="user", content=f"Сообщения из канала:\n{messages_text}"
-                ),
-            ]
-
             try:
-                response = await get_client().chat.completions.create(
-                    model=get_mini_model(),
-                    messages=message_payload,
-                    temperature=0.0,
-                    top_p=0.01,
-                )
-                report = response.choices[0].message.content or "Пустой ответ от AI"
+                report = await self.build_report(state, messages) or "Пустой ответ от AI"
             except Exception as e:
                 print(f"Ошибка генерации отчета: {e}")
                 report = "Ошибка генерации отчета"
 
             if "ID:" in report:
                 guild_id = channel.guild.id if channel and hasattr(channel, "guild") else "UNKNOWN"
-
-                for msg in messages:
-                    msg_id = str(msg.message_id)
-                    if f"[ID:{msg_id}]" in report:
-                        link = f"https://discord.com/channels/{guild_id}/{channel_id}/{msg_id}"
-                        report = report.replace(f"[ID:{msg_id}]", f"[ссылка]({link})")
+                base = f"https://discord.com/channels/{guild_id}/{channel_id}"
+                links = {str(msg.message_id): f"{base}/{msg.message_id}" for msg in messages}
+                report = link_message_ids(report, links)
 
             try:
-                if channel:
-                    await channel.send(report)
+                for part in chunk_message(report):
+                    await channel.send(part)
             except Exception as e:
                 print(f"Ошибка отправки отчета в канал {channel_id}: {e}")
 
@@ -174,3 +425,4 @@ class ReportGenerator:
 
             if channel_id in self.channels:
                 del self.channels[channel_id]
+            self.deadlines.cancel(channel_id)
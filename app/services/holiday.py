@@ -2,14 +2,16 @@ from datetime import datetime, timedelta
 
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
-from app.core.ai_config import get_client, get_model
-from app.tools.prompt import USER_DESCRIPTIONS, system_holiday_prompt
-from app.tools.utils import clean_text, replace_emojis, users_context
+from app.core.ai_config import Priority, get_model, llm_scheduler
+from app.tools.postprocess import postprocessor
+from app.tools.prompt_registry import prompt_registry
+from app.tools.utils import users_context
 
 
 async def ai_generate_holiday_congrats(names: list[str], holiday: str) -> str:
     """Генерирует креативное поздравление с праздником для пользователей."""
-    relevant_contexts = users_context(names, USER_DESCRIPTIONS)
+    prompts = prompt_registry.prompts()
+    relevant_contexts = users_context(names, prompts.USER_DESCRIPTIONS)
     current_date = datetime.now()
     date_minus_month = current_date - timedelta(days=30)
     date_plus_month = current_date + timedelta(days=30)
@@ -18,7 +20,7 @@ async def ai_generate_holiday_congrats(names: list[str], holiday: str) -> str:
     if current_date.month == 1 and current_date.day == 1:
         messages = [
             ChatCompletionSystemMessageParam(
-                role="system", content=system_holiday_prompt(holiday).strip()
+                role="system", content=prompts.system_holiday_prompt(holiday).strip()
             ),
             ChatCompletionUserMessageParam(
                 role="user",
@@ -28,7 +30,7 @@ async def ai_generate_holiday_congrats(names: list[str], holiday: str) -> str:
     elif holiday == "Днем Бичей":
         messages = [
             ChatCompletionSystemMessageParam(
-                role="system", content=system_holiday_prompt(holiday).strip()
+                role="system", content=prompts.system_holiday_prompt(holiday).strip()
             ),
             ChatCompletionUserMessageParam(
                 role="user",
@@ -40,14 +42,15 @@ async def ai_generate_holiday_congrats(names: list[str], holiday: str) -> str:
     else:
         messages = [
             ChatCompletionSystemMessageParam(
-                role="system", content=system_holiday_prompt(holiday).strip()
+                role="system", content=prompts.system_holiday_prompt(holiday).strip()
             ),
             ChatCompletionUserMessageParam(
                 role="user", content=f"{relevant_contexts}. Праздник: {holiday}."
             ),
         ]
     try:
-        completion = await get_client().chat.completions.create(
+        completion = await llm_scheduler.create(
+            Priority.BATCH,
             model=get_model(),
             messages=messages,
             temperature=1,  # Оптимальный баланс креативности/когерентности
@@ -57,9 +60,7 @@ async def ai_generate_holiday_congrats(names: list[str], holiday: str) -> str:
             max_tokens=5000,
         )
         text = completion.choices[0].message.content.strip()
-        cleaned_response_text = clean_text(text)
-        emoji_response_text = replace_emojis(cleaned_response_text)
-        return emoji_response_text
+        return postprocessor.render(text)
     except Exception as e:
         print(f"[Ошибка генерации поздравления]: {e}")
         return f"Поздравляем всех пользователей с {holiday}!!!! 🎉"
@@ -1,12 +1,7 @@
 import asyncio
+import threading
 from typing import Any
 
-import chromadb
-from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex
-from llama_index.core.node_parser import SimpleNodeParser
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.vector_stores.chroma import ChromaVectorStore
-
 from app.core.ai_config import get_client, get_provider_config
 
 
@@ -14,24 +9,59 @@ class LlamaIndexManager:
     """Управляет интеграцией с LlamaIndex и ChromaDB.
 
     Строит векторные индексы сообщений Discord-сервера.
+    Тяжелые зависимости (chromadb, llama_index) импортируются и инициализируются
+    при первом обращении или заранее через warm_up() после подключения бота.
     """
 
     def __init__(self) -> None:
-        """Инициализирует менеджер LlamaIndex."""
-        self.custom_client = get_client()
+        """Инициализирует менеджер LlamaIndex без загрузки тяжелых подсистем."""
+        self.custom_client: Any = None
+        self.embed_model: Any = None
+        self.node_parser: Any = None
+        self._db: Any = None
+        self._init_lock = threading.Lock()
+
+    def _ensure_ready(self) -> None:
+        """Создает модель эмбеддингов и клиент ChromaDB при первом вызове."""
+        if self._db is not None:
+            return
+
+        with self._init_lock:
+            if self._db is not None:
+                return
+
+            # ChromaVectorStore загружается заранее, чтобы первый запрос не платил за импорт
+            import chromadb
+            from llama_index.core import Settings
+            from llama_index.core.node_parser import SimpleNodeParser
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            from llama_index.vector_stores.chroma import ChromaVectorStore  # noqa: F401
+
+            self.custom_client = get_client()
+
+            config = get_provider_config()
+            self.embed_model = OpenAIEmbedding(
+                api_key=config["api_key"],
+                api_base=config["base_url"],
+                model="text-embedding-3-large",
+            )
+
+            self.node_parser = SimpleNodeParser.from_defaults(chunk_size=128, chunk_overlap=16)
 
-        config = get_provider_config()
-        self.embed_model = OpenAIEmbedding(
-            api_key=config["api_key"],
-            api_base=config["base_url"],
-            model="text-embedding-3-large",
-        )
+            Settings.embed_model = self.embed_model
+            Settings.node_parser = self.node_parser
+            self._db = chromadb.PersistentClient(path="./chroma_db")
 
-        self.node_parser = SimpleNodeParser.from_defaults(chunk_size=128, chunk_overlap=16)
-        self.db = chromadb.PersistentClient(path="./chroma_db")
+    @property
+    def db(self) -> Any:
+        """Возвращает клиент ChromaDB, инициализируя менеджер при необходимости."""
+        self._ensure_ready()
+        return self._db
 
-        Settings.embed_model = self.embed_model
-        Settings.node_parser = self.node_parser
+    async def warm_up(self) -> None:
+        """Инициализирует подсистемы RAG в фоновом потоке, не блокируя event loop."""
+        if self._db is None:
+            await asyncio.to_thread(self._ensure_ready)
 
     def get_server_collection(self, server_id: int) -> Any:
         """Получить или создать коллекцию для сервера."""
@@ -45,6 +75,10 @@ class LlamaIndexManager:
     async def index_messages(self, server_id: int, messages: list[dict[str, Any]]) -> Any:
         """Индексировать сообщения сервера как диалоговые пары user+assistant."""
         try:
+            await self.warm_up()
+            from llama_index.core import Document, StorageContext, VectorStoreIndex
+            from llama_index.vector_stores.chroma import ChromaVectorStore
+
             pairs = []
             i = 0
             while i < len(messages):
@@ -92,6 +126,10 @@ class LlamaIndexManager:
     async def query_relevant_context(self, server_id: int, query: str, limit: int = 8) -> list[str]:
         """Найти релевантный контекст для запроса на сервере."""
         try:
+            await self.warm_up()
+            from llama_index.core import VectorStoreIndex
+            from llama_index.vector_stores.chroma import ChromaVectorStore
+
             collection = self.get_server_collection(server_id)
             vector_store = ChromaVectorStore(chroma_collection=collection)
             index = await asyncio.to_thread(VectorStoreIndex.from_vector_store, vector_store)
@@ -108,6 +146,10 @@ class LlamaIndexManager:
     async def index_server_users(self, server_id: int, users: list[str]) -> Any:
         """Индексировать список пользователей сервера с использованием метаданных."""
         try:
+            await self.warm_up()
+            from llama_index.core import Document, StorageContext, VectorStoreIndex
+            from llama_index.vector_stores.chroma import ChromaVectorStore
+
             collection = self.get_server_collection(server_id)
             await asyncio.to_thread(collection.delete, where={"document_type": "server_users"})
             users_text = f"Список пользователей сервера: {', '.join(users)}"
@@ -0,0 +1,109 @@
+"""Ограничение частоты и параллельности запросов к AI."""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+# Пользователь: до 2 запросов подряд, затем один запрос в 5 секунд
+USER_BURST = 2
+USER_RATE = 1 / 5
+# Сервер: до 10 запросов подряд, затем один запрос в 2 секунды
+GUILD_BURST = 10
+GUILD_RATE = 1 / 2
+# Сколько вызовов ai_generate может выполняться одновременно
+MAX_CONCURRENT_AI = 4
+# Предел записей в одном хранилище независимо от числа пользователей
+MAX_BUCKETS = 10_000
+
+
+class TokenBucketStore:
+    """Корзины токенов по ключам с ограниченной памятью.
+
+    Записи упорядочены по времени последнего обновления. Корзина, которая
+    успела наполниться до capacity, ничем не отличается от новой, поэтому
+    такие записи лениво удаляются с начала словаря. Если записей все равно
+    больше max_entries, вытесняются самые давние.
+    """
+
+    def __init__(self, capacity: float, rate: float, max_entries: int = MAX_BUCKETS) -> None:
+        """Инициализирует хранилище корзин емкостью capacity с пополнением rate токенов в секунду."""
+        self.capacity = capacity
+        self.rate = rate
+        self.max_entries = max_entries
+        # Время, за которое пустая корзина наполняется полностью
+        self.refill_time = capacity / rate
+        # key -> (токены, момент обновления)
+        self.buckets: OrderedDict[int, tuple[float, float]] = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        while self.buckets:
+            _, updated = next(iter(self.buckets.values()))
+            if now - updated < self.refill_time and len(self.buckets) <= self.max_entries:
+                break
+            self.buckets.popitem(last=False)
+
+    def tokens(self, key: int, now: float) -> float:
+        """Возвращает текущее число токенов в корзине."""
+        entry = self.buckets.get(key)
+        if entry is None:
+            return self.capacity
+        tokens, updated = entry
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key: int, now: float) -> float:
+        """Возвращает, через сколько секунд в корзине появится токен (0 — уже есть)."""
+        tokens = self.tokens(key, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def consume(self, key: int, now: float) -> None:
+        """Забирает токен из корзины."""
+        tokens = self.tokens(key, now) - 1
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        self._evict(now)
+
+
+class AIRateLimiter:
+    """Ограничитель запросов к AI.
+
+    Корзины токенов по пользователю и по серверу плюс общий предел
+    одновременно выполняющихся генераций.
+    """
+
+    def __init__(
+        self,
+        user_burst: float = USER_BURST,
+        user_rate: float = USER_RATE,
+        guild_burst: float = GUILD_BURST,
+        guild_rate: float = GUILD_RATE,
+        max_concurrent: int = MAX_CONCURRENT_AI,
+    ) -> None:
+        """Инициализирует ограничитель."""
+        self.users = TokenBucketStore(user_burst, user_rate)
+        self.guilds = TokenBucketStore(guild_burst, guild_rate)
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    def check(self, user_id: int, guild_id: int | None) -> float:
+        """Разрешает запрос или возвращает, сколько секунд подождать.
+
+        Токены списываются только если запрос разрешен обоими ограничениями.
+        """
+        now = time.monotonic()
+        wait = self.users.retry_after(user_id, now)
+        if guild_id is not None:
+            wait = max(wait, self.guilds.retry_after(guild_id, now))
+        if wait > 0:
+            return wait
+
+        self.users.consume(user_id, now)
+        if guild_id is not None:
+            self.guilds.consume(guild_id, now)
+        return 0.0
+
+    def slot(self) -> asyncio.Semaphore:
+        """Возвращает семафор для `async with`: ждет свободного места для генерации."""
+        return self._slots
+
+
+ai_rate_limiter = AIRateLimiter()
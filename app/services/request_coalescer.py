@@ -0,0 +1,57 @@
+"""Объединение одновременных одинаковых запросов к AI."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class RequestCoalescer:
+    """Single-flight для запросов с одинаковым ключом.
+
+    Одинаковые запросы, пришедшие пока первый еще выполняется, ждут его
+    результата вместо собственного вызова. Запрос выполняется отдельной
+    задачей, поэтому отмена первого вызывающего не прерывает остальных.
+    Ключ освобождается сразу после завершения: результат не кешируется.
+    """
+
+    def __init__(self) -> None:
+        """Инициализирует пустой реестр выполняющихся запросов."""
+        self.in_flight: dict[Hashable, asyncio.Task] = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет factory() или присоединяется к уже выполняющемуся запросу с тем же ключом."""
+        self.requests += 1
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.coalesced += 1
+            print(f"Запрос объединен с выполняющимся, доля объединенных: {self.coalescing_rate:.1%}")
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+
+    @property
+    def coalescing_rate(self) -> float:
+        """Возвращает долю запросов, получивших результат чужого вызова."""
+        return self.coalesced / self.requests if self.requests else 0.0
+
+    def stats(self) -> dict[str, float]:
+        """Возвращает счетчики объединения запросов."""
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "coalescing_rate": round(self.coalescing_rate, 3),
+            "in_flight": len(self.in_flight),
+        }
+
+
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,187 @@
+"""Семантический кеш ответов ai_generate в пределах сервера."""
+
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+
+from app.core.ai_config import get_embedding
+
+RESPONSE_CACHE_TTL = 30 * 60
+# Максимум ответов в кеше одного сервера
+RESPONSE_CACHE_SIZE = 128
+# Минимальное косинусное сходство вопросов, при котором ответ переиспользуется
+SIMILARITY_THRESHOLD = 0.95
+# Доля общего контекста RAG: при меньшем пересечении история сервера
+# по теме вопроса изменилась, и старый ответ может быть неактуален
+MIN_CONTEXT_OVERLAP = 0.6
+EMBEDDING_CACHE_SIZE = 256
+
+
+def normalize_prompt(text: str) -> str:
+    """Приводит вопрос к виду для точного сравнения: регистр, пробелы, знаки в конце."""
+    return " ".join(text.casefold().split()).rstrip("?!. ")
+
+
+def context_fingerprint(contexts: Iterable[str]) -> frozenset[bytes]:
+    """Возвращает отпечаток контекста RAG: множество хешей его строк."""
+    return frozenset(
+        hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest() for line in contexts
+    )
+
+
+def context_overlap(a: frozenset[bytes], b: frozenset[bytes]) -> float:
+    """Возвращает коэффициент Жаккара двух отпечатков контекста."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """Ответ модели в кеше."""
+
+    prompt: str
+    embedding: list[float] | None
+    context: frozenset[bytes]
+    name: str
+    response: str
+    expires: float
+
+
+class ResponseCache:
+    """Кеш ответов ai_generate с точным и семантическим поиском по вопросу.
+
+    Ответы хранятся отдельно для каждого сервера. Ответ переиспользуется,
+    если вопрос совпадает после нормализации или близок по эмбеддингу,
+    а контекст RAG пересекается с контекстом исходного ответа хотя бы
+    на MIN_CONTEXT_OVERLAP. Ответ, в котором бот обращался к автору
+    исходного вопроса по имени, другим пользователям не отдается.
+    Выключен по умолчанию.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Awaitable[list[float]]] = get_embedding,
+        ttl: float = RESPONSE_CACHE_TTL,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+        threshold: float = SIMILARITY_THRESHOLD,
+        enabled: bool = False,
+    ) -> None:
+        """Инициализирует пустой кеш."""
+        self.embed = embed
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.enabled = enabled
+        self.guilds: dict[int | None, OrderedDict[str, CachedResponse]] = {}
+        self._embeddings: OrderedDict[str, list[float] | None] = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    async def _embedding(self, prompt: str) -> list[float] | None:
+        """Возвращает эмбеддинг вопроса, запоминая его для последующего put()."""
+        if prompt in self._embeddings:
+            self._embeddings.move_to_end(prompt)
+            return self._embeddings[prompt]
+
+        try:
+            embedding = await self.embed(prompt)
+        except Exception as e:
+            print(f"Ошибка получения эмбеддинга для кеша ответов: {e}")
+            embedding = None
+
+        self._embeddings[prompt] = embedding
+        if len(self._embeddings) > EMBEDDING_CACHE_SIZE:
+            self._embeddings.popitem(last=False)
+        return embedding
+
+    def _usable(self, entry: CachedResponse, context: frozenset[bytes], name: str) -> bool:
+        if context_overlap(entry.context, context) < MIN_CONTEXT_OVERLAP:
+            return False
+        return entry.name == name or entry.name.casefold() not in entry.response.casefold()
+
+    async def get(
+        self, guild_id: int | None, name: str, text: str, contexts: Iterable[str]
+    ) -> str | None:
+        """Возвращает сохраненный ответ на такой же или похожий вопрос."""
+        prompt = normalize_prompt(text)
+        entries = self.guilds.get(guild_id)
+        if not prompt or not entries:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        for key in [key for key, entry in entries.items() if entry.expires <= now]:
+            del entries[key]
+
+        context = context_fingerprint(contexts)
+        entry = entries.get(prompt)
+        if entry is not None and self._usable(entry, context, name):
+            entries.move_to_end(prompt)
+            self.exact_hits += 1
+            return entry.response
+
+        embedding = await self._embedding(prompt) if entries else None
+        if embedding is not None:
+            best_score = self.threshold
+            best: CachedResponse | None = None
+            for entry in entries.values():
+                if entry.embedding is None or not self._usable(entry, context, name):
+                    continue
+                score = sum(a * b for a, b in zip(embedding, entry.embedding, strict=True))
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best is not None:
+                self.semantic_hits += 1
+                return best.response
+
+        self.misses += 1
+        return None
+
+    async def put(
+        self,
+        guild_id: int | None,
+        name: str,
+        text: str,
+        contexts: Iterable[str],
+        response: str,
+    ) -> None:
+        """Сохраняет ответ модели на вопрос."""
+        prompt = normalize_prompt(text)
+        if not prompt:
+            return
+
+        entries = self.guilds.setdefault(guild_id, OrderedDict())
+        entries[prompt] = CachedResponse(
+            prompt=prompt,
+            embedding=await self._embedding(prompt),
+            context=context_fingerprint(contexts),
+            name=name,
+            response=response,
+            expires=time.monotonic() + self.ttl,
+        )
+        entries.move_to_end(prompt)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def clear(self, guild_id: int | None = None) -> None:
+        """Очищает кеш сервера или весь кеш."""
+        if guild_id is None:
+            self.guilds.clear()
+        else:
+            self.guilds.pop(guild_id, None)
+
+    def stats(self) -> dict[str, int]:
+        """Возвращает счетчики попаданий и промахов."""
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "size": sum(len(entries) for entries in self.guilds.values()),
+        }
+
+
+response_cache = ResponseCache()
@@ -1,41 +1,179 @@
+import asyncio
+import contextlib
 import os
+import time
 
 import aiohttp
 
+# Окно, в течение которого одинаковые уведомления объединяются в одно сообщение
+ALERT_WINDOW = 10.0
+MAX_PENDING_ALERTS = 100
+MESSAGE_LIMIT = 4096
+MAX_RETRIES = 5
+# Telegram допускает около 20 сообщений в минуту в один групповой чат
+MIN_SEND_INTERVAL = 3.0
+REQUEST_TIMEOUT = 10
+# При остановке бота уведомления отправляются одной попыткой с коротким таймаутом
+SHUTDOWN_TIMEOUT = 3
+
 
 class TelegramNotifier:
-    """Класс для отправки уведомлений в Telegram."""
+    """Класс для отправки уведомлений в Telegram.
+
+    send_message отправляет сообщение сразу. alert ставит уведомление в очередь:
+    одинаковые уведомления в пределах окна объединяются, накопленные
+    отправляются одним сообщением в фоне с учетом ограничений Telegram.
+    """
 
     def __init__(self) -> None:
         """Инициализирует клиент Telegram-уведомлений."""
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
         self.enabled = bool(self.bot_token and self.chat_id)
+        self.alert_window = ALERT_WINDOW
+        self.min_send_interval = MIN_SEND_INTERVAL
+        # текст уведомления -> количество повторов за окно
+        self._pending: dict[str, int] = {}
+        self._dropped = 0
+        self._worker: asyncio.Task | None = None
+        self._last_sent = 0.0
 
         if not self.enabled:
             print(
                 "Telegram уведомления отключены: отсутствуют TELEGRAM_BOT_TOKEN или TELEGRAM_CHAT_ID"
             )
 
-    async def send_message(self, message: str) -> bool:
-        """Отправляет сообщение в Telegram."""
-        if not self.enabled:
-            return False
-
+    async def _post(
+        self, message: str, timeout: float = REQUEST_TIMEOUT
+    ) -> tuple[int | None, float | None]:
+        """Отправляет запрос sendMessage; возвращает статус и retry_after при 429."""
         url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
         payload = {"chat_id": self.chat_id, "text": message, "parse_mode": "HTML"}
 
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, timeout=10) as response:
-                    if response.status == 200:
-                        return True
-                    else:
-                        print(f"Ошибка отправки в Telegram: статус {response.status}")
-                        return False
+                async with session.post(url, json=payload, timeout=timeout) as response:
+                    if response.status == 429:
+                        data = await response.json(content_type=None)
+                        return 429, data.get("parameters", {}).get("retry_after")
+                    return response.status, None
         except Exception as e:
             print(f"Ошибка отправки сообщения в Telegram: {e}")
+            return None, None
+
+    async def send_message(self, message: str) -> bool:
+        """Отправляет сообщение в Telegram."""
+        if not self.enabled:
             return False
 
+        status, _ = await self._post(message)
+        if status == 200:
+            return True
+        if status is not None:
+            print(f"Ошибка отправки в Telegram: статус {status}")
+        return False
+
+    def alert(self, message: str) -> None:
+        """Ставит уведомление в очередь и сразу возвращает управление.
+
+        Должен вызываться из работающего event loop.
+        """
+        if not self.enabled:
+            return
+
+        if message in self._pending:
+            self._pending[message] += 1
+        elif len(self._pending) >= MAX_PENDING_ALERTS:
+            self._dropped += 1
+        else:
+            self._pending[message] = 1
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        """Раз в окно отправляет накопленные уведомления, пока очередь не опустеет."""
+        while self._pending or self._dropped:
+            await asyncio.sleep(self.alert_window)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Немедленно отправляет накопленные уведомления."""
+        for text in self._take_batches():
+            await self._deliver(text)
+
+    async def close(self) -> None:
+        """Останавливает фоновую отправку и последний раз отправляет накопленное.
+
+        При остановке нельзя ждать повторов с паузами, пока Telegram
+        недоступен: каждое сообщение отправляется одной попыткой.
+        """
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+        self._worker = None
+
+        for text in self._take_batches():
+            status, _ = await self._post(text, timeout=SHUTDOWN_TIMEOUT)
+            if status != 200:
+                print(f"Telegram: уведомление при остановке не доставлено (статус {status})")
+
+    def _take_batches(self) -> list[str]:
+        """Забирает накопленные уведомления из очереди и склеивает их в сообщения."""
+        if not self._pending and not self._dropped:
+            return []
+
+        pending, dropped = self._pending, self._dropped
+        self._pending, self._dropped = {}, 0
+
+        lines = [
+            message if count == 1 else f"{message}\n<i>Повторилось {count} раз</i>"
+            for message, count in pending.items()
+        ]
+        if dropped:
+            lines.append(f"<i>…и еще {dropped} уведомлений пропущено</i>")
+        return self._batches(lines)
+
+    @staticmethod
+    def _batches(lines: list[str]) -> list[str]:
+        """Склеивает уведомления в сообщения не длиннее лимита Telegram."""
+        batches: list[str] = []
+        current = ""
+        for line in lines:
+            line = line[:MESSAGE_LIMIT]
+            candidate = f"{current}\n\n{line}" if current else line
+            if len(candidate) > MESSAGE_LIMIT:
+                batches.append(current)
+                current = line
+            else:
+                current = candidate
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _deliver(self, message: str) -> bool:
+        """Отправляет сообщение с соблюдением интервала и повторами при 429 и сбоях."""
+        for attempt in range(MAX_RETRIES):
+            wait = self._last_sent + self.min_send_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_sent = time.monotonic()
+
+            status, retry_after = await self._post(message)
+            if status == 200:
+                return True
+            if status == 429:
+                delay = retry_after if retry_after is not None else 2**attempt
+            elif status is None or status >= 500:
+                delay = 2**attempt
+            else:
+                print(f"Ошибка отправки в Telegram: статус {status}")
+                return False
+            await asyncio.sleep(delay)
+
+        print(f"Telegram: уведомление не доставлено после {MAX_RETRIES} попыток")
+        return False
+
 
 telegram_notifier = TelegramNotifier()
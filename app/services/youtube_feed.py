@@ -0,0 +1,110 @@
+"""Легковесный потоковый парсер Atom-лент YouTube."""
+
+import xml.etree.ElementTree as ET
+from collections.abc import Container
+from dataclasses import dataclass
+from datetime import datetime
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+YT_NS = "{http://www.youtube.com/xml/schemas/2015}"
+ENTRY_TAG = f"{ATOM_NS}entry"
+
+
+@dataclass(frozen=True, slots=True)
+class FeedEntry:
+    """Запись ленты YouTube: только поля, нужные для уведомлений."""
+
+    video_id: str
+    title: str
+    link: str
+    author: str | None
+    published: datetime | None
+    channel_id: str | None = None
+
+
+def _parse_entry(element: ET.Element) -> FeedEntry | None:
+    """Извлекает поля записи; возвращает None, если в записи нет yt:videoId."""
+    video_id = element.findtext(f"{YT_NS}videoId")
+    if not video_id:
+        return None
+
+    link = ""
+    for link_element in element.iterfind(f"{ATOM_NS}link"):
+        if link_element.get("rel", "alternate") == "alternate":
+            link = link_element.get("href", "")
+            break
+    if not link:
+        link = f"https://www.youtube.com/watch?v={video_id}"
+
+    published_text = element.findtext(f"{ATOM_NS}published")
+    try:
+        published = datetime.fromisoformat(published_text) if published_text else None
+    except ValueError:
+        published = None
+
+    return FeedEntry(
+        video_id=video_id,
+        title=element.findtext(f"{ATOM_NS}title") or "",
+        link=link,
+        author=element.findtext(f"{ATOM_NS}author/{ATOM_NS}name"),
+        published=published,
+        channel_id=element.findtext(f"{YT_NS}channelId"),
+    )
+
+
+class YouTubeFeedParser:
+    """Инкрементальный парсер ленты на основе XMLPullParser (неблокирующий iterparse).
+
+    Данные подаются частями по мере загрузки. Разбор останавливается на первой
+    записи из stop_at: лента упорядочена от новых видео к старым, поэтому
+    дальше идут только уже известные записи. Граничная запись включается
+    в результат, чтобы по ней можно было оценить частоту загрузок.
+    """
+
+    def __init__(self, stop_at: Container[str] = ()) -> None:
+        """Инициализирует парсер с набором известных идентификаторов видео."""
+        self.stop_at = stop_at
+        self.entries: list[FeedEntry] = []
+        self.done = False
+        self._parser = ET.XMLPullParser(events=("end",))
+
+    def feed(self, data: bytes) -> bool:
+        """Разбирает очередную часть документа; возвращает True, если разбор завершен."""
+        if self.done:
+            return True
+
+        self._parser.feed(data)
+        self._read_events()
+        return self.done
+
+    def close(self) -> list[FeedEntry]:
+        """Завершает разбор и возвращает найденные записи."""
+        if not self.done:
+            self._parser.close()
+            self._read_events()
+            self.done = True
+        return self.entries
+
+    def _read_events(self) -> None:
+        for _, element in self._parser.read_events():
+            if element.tag != ENTRY_TAG:
+                continue
+
+            entry = _parse_entry(element)
+            element.clear()
+            if entry is None:
+                continue
+
+            self.entries.append(entry)
+            if entry.video_id in self.stop_at:
+                self.done = True
+                return
+
+
+def parse_feed(data: bytes, stop_at: Container[str] = (), chunk_size: int = 4096) -> list[FeedEntry]:
+    """Разбирает документ ленты целиком или до первой известной записи."""
+    parser = YouTubeFeedParser(stop_at)
+    for start in range(0, len(data), chunk_size):
+        if parser.feed(data[start : start + chunk_size]):
+            break
+    return parser.close()
@@ -1,89 +1,450 @@
 import asyncio
-from datetime import datetime
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
 from typing import Any
 
-import feedparser
-from sqlalchemy import select
+import aiohttp
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.data.models import YouTubeChannel, YouTubeVideo, async_session
+from app.services.youtube_feed import FeedEntry, YouTubeFeedParser
+from app.services.youtube_websub import YouTubeWebSub
+
+FEED_URL = "https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+MAX_CONCURRENT_POLLS = 10
+FEED_TIMEOUT = 15
+FEED_CHUNK_SIZE = 4096
+# Границы интервала опроса одного канала, секунды
+MIN_POLL_INTERVAL = 5 * 60
+MAX_POLL_INTERVAL = 60 * 60
+# Доля среднего промежутка между загрузками, через которую канал опрашивается снова
+POLL_INTERVAL_FRACTION = 0.05
+# Допуск, чтобы канал с минимальным интервалом не пропускал тик планировщика
+POLL_TOLERANCE = 5
+# Интервал сверочного опроса, когда новые видео приходят push-уведомлениями
+RECONCILE_INTERVAL = 30 * 60
+# Сколько последних видео канала помнится в памяти и загружается из базы при старте
+KNOWN_VIDEOS_LIMIT = 50
+# Сколько последних дат публикации канала учитывается при оценке частоты загрузок
+PUBLISH_HISTORY_LIMIT = 15
+# Push-уведомление о записи старше этого — правка старого видео, а не загрузка
+PUSH_MAX_AGE = timedelta(hours=6)
+
+
+@dataclass(slots=True)
+class FeedState:
+    """Состояние опроса RSS-ленты одного канала между циклами.
+
+    Интервал опроса оценивается по накопленным датам публикации видео
+    канала, а ошибки подряд лишь временно растягивают его и не влияют
+    на саму оценку.
+    """
+
+    etag: str | None = None
+    last_modified: str | None = None
+    interval: float = MIN_POLL_INTERVAL
+    next_poll: float = 0.0
+    failures: int = 0
+    # Даты публикации последних видео канала, по возрастанию
+    published: list[datetime] = field(default_factory=list)
+
+    def headers(self) -> dict[str, str]:
+        """Возвращает заголовки условного запроса."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    @property
+    def latest_published(self) -> datetime | None:
+        """Возвращает дату публикации самого нового известного видео канала."""
+        return self.published[-1] if self.published else None
+
+    def record_published(self, entries: list[FeedEntry]) -> None:
+        """Добавляет даты публикации записей и пересчитывает интервал опроса.
+
+        Разбор известной ленты останавливается на первом обработанном
+        видео, поэтому частота загрузок оценивается по истории дат,
+        а не по одной последней ленте.
+        """
+        dates = {entry.published for entry in entries if entry.published}
+        self.published = sorted(dates.union(self.published))[-PUBLISH_HISTORY_LIMIT:]
+        self.interval = upload_interval(self.published) or self.interval
+
+    def poll_delay(self) -> float:
+        """Возвращает задержку до следующего опроса с учетом ошибок подряд."""
+        return min(self.interval * 2**self.failures, MAX_POLL_INTERVAL)
+
+
+@dataclass(slots=True)
+class PollSummary:
+    """Итоги одного цикла опроса YouTube."""
+
+    total: int = 0
+    polled: int = 0
+    not_modified: int = 0
+    updated: int = 0
+    errors: int = 0
+    duration: float = 0.0
+    durations: dict[str, float] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        """Возвращает краткую сводку цикла."""
+        slowest = max(self.durations.items(), key=lambda item: item[1], default=None)
+        text = (
+            f"YouTube: опрошено {self.polled}/{self.total} каналов за {self.duration:.2f} с "
+            f"(обновлено: {self.updated}, без изменений: {self.not_modified}, "
+            f"ошибок: {self.errors})"
+        )
+        if slowest:
+            text += f", самый долгий: {slowest[0]} ({slowest[1]:.2f} с)"
+        return text
+
+
+def upload_interval(published: list[datetime]) -> float | None:
+    """Вычисляет интервал опроса по средней частоте загрузок канала.
+
+    Возвращает None, если для оценки не хватает дат публикации.
+    """
+    if len(published) < 2:
+        return None
+
+    first, last = min(published), max(published)
+    mean_gap = (last - first).total_seconds() / (len(published) - 1)
+    return min(max(mean_gap * POLL_INTERVAL_FRACTION, MIN_POLL_INTERVAL), MAX_POLL_INTERVAL)
+
+
+def is_live_entry(entry: FeedEntry) -> bool:
+    """Определяет, является ли запись ленты прямым эфиром."""
+    return "Live" in entry.title or "прямая" in entry.title.lower()
+
+
+def format_video_message(entry: FeedEntry, channel_id: str) -> str:
+    """Формирует уведомление о новом видео или прямом эфире."""
+    channel_link = f"[{entry.author}](https://www.youtube.com/channel/{channel_id})"
+    if is_live_entry(entry):
+        return f"🔴 **Прямой эфир на канале {channel_link}!**\n{entry.link}"
+    return f"🎥 **Новое видео на канале {channel_link}!**\n{entry.link}"
 
 
 class YouTubeNotifier:
-    """Класс для отслеживания новых видео на YouTube."""
+    """Класс для отслеживания новых видео на YouTube.
+
+    Подписки группируются по channel_id: каждая лента загружается один раз
+    за цикл, а все новые записи ленты рассылаются во все подписанные гильдии.
+    Ленты опрашиваются конкурентно с ограничением числа одновременных запросов.
+    Для каждой ленты запоминаются ETag/Last-Modified, поэтому неизмененные
+    ленты возвращают 304 без разбора, а интервал опроса подстраивается
+    под частоту загрузок канала.
+    """
 
-    def __init__(self, bot: Any) -> None:
+    def __init__(self, bot: Any, max_concurrency: int = MAX_CONCURRENT_POLLS) -> None:
         """Инициализирует YouTube-нотифайер."""
         self.bot = bot
+        self.feed_url = FEED_URL
+        self.max_concurrency = max_concurrency
+        self.feed_states: dict[str, FeedState] = {}
+        self.last_summary: PollSummary | None = None
+        # channel_id -> идентификаторы видео, уже обработанных для канала,
+        # от старых к новым (словарь как упорядоченное множество)
+        self.known_videos: dict[str, dict[str, None]] = {}
+        self._known_loaded = False
+        self.websub: YouTubeWebSub | None = None
 
-    async def check_new_videos(self) -> None:
-        """Проверяет все отслеживаемые YouTube-каналы на наличие новых видео."""
+    async def check_new_videos(self) -> PollSummary | None:
+        """Проверяет отслеживаемые YouTube-каналы, у которых подошло время опроса."""
         try:
+            if not self._known_loaded:
+                await self.load_known_videos()
+
             async with async_session() as session:
                 query = select(YouTubeChannel).where(YouTubeChannel.is_active.is_(True))
                 result = await session.execute(query)
                 channels = result.scalars().all()
 
-                for channel in channels:
-                    await self._check_channel_videos(channel)
+            if self.websub is not None:
+                await self.websub.sync(channel.channel_id for channel in channels)
+            return await self.poll_channels(channels)
         except Exception as e:
             print(f"Ошибка при проверке YouTube видео: {e}")
+            return None
+
+    async def poll_channels(self, channels: list[Any]) -> PollSummary:
+        """Конкурентно опрашивает ленты, для которых подошло время, и рассылает новые видео."""
+        started = time.perf_counter()
+        now = time.monotonic()
+
+        subscriptions: dict[str, list[Any]] = defaultdict(list)
+        for channel in channels:
+            subscriptions[channel.channel_id].append(channel)
+
+        summary = PollSummary(total=len(subscriptions))
+        due = [
+            channel_id
+            for channel_id in subscriptions
+            if self.feed_states.setdefault(channel_id, FeedState()).next_poll <= now + POLL_TOLERANCE
+        ]
+        feeds: dict[str, list[FeedEntry]] = {}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=FEED_TIMEOUT)
+
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+
+            async def worker(channel_id: str) -> None:
+                async with semaphore:
+                    feed = await self._poll_feed(
+                        http, channel_id, subscriptions[channel_id], summary, now
+                    )
+                if feed:
+                    feeds[channel_id] = feed
+
+            await asyncio.gather(*(worker(channel_id) for channel_id in due))
+
+        if feeds:
+            await self._publish_new_videos(subscriptions, feeds)
+
+        summary.duration = time.perf_counter() - started
+        self.last_summary = summary
+        print(summary)
+        return summary
 
-    async def _check_channel_videos(self, channel: Any) -> None:
+    async def _poll_feed(
+        self,
+        http: aiohttp.ClientSession,
+        channel_id: str,
+        channels: list[Any],
+        summary: PollSummary,
+        cycle_start: float,
+    ) -> list[FeedEntry] | None:
+        """Загружает ленту одного канала и обновляет ее состояние опроса."""
+        state = self.feed_states.setdefault(channel_id, FeedState())
+        name = channels[0].name
+        started = time.perf_counter()
+        summary.polled += 1
         try:
-            url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel.channel_id}"
-            feed = await asyncio.to_thread(feedparser.parse, url)
-
-            if feed.status != 200 or not feed.entries:
-                timestamp = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-                print(
-                    f"[{timestamp}] ❌ Неверный или недоступный канал: "
-                    f"{channel.name} (ID: {channel.channel_id})"
-                )
-                print(f"HTTP статус: {feed.status}")
-                return
+            feed = await self._fetch_feed(http, channel_id, state)
+            state.failures = 0
+            if feed is None:
+                summary.not_modified += 1
+            else:
+                summary.updated += 1
+                if not feed:
+                    print(f"Лента канала {name} (ID: {channel_id}) пуста")
+            return feed
+        except Exception as e:
+            summary.errors += 1
+            # При ошибке опрашиваем канал реже, пока лента не восстановится
+            state.failures += 1
+            timestamp = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+            print(f"[{timestamp}] ❌ Неверный или недоступный канал: {name} (ID: {channel_id}): {e}")
+            return None
+        finally:
+            state.next_poll = cycle_start + state.poll_delay()
+            summary.durations[name] = time.perf_counter() - started
 
-            latest_video = feed.entries[0]
-            video_id = latest_video.get("yt_videoid")
-            author = latest_video.get("author")
-            published_at = datetime.now()
+    async def _fetch_feed(
+        self, http: aiohttp.ClientSession, channel_id: str, state: FeedState
+    ) -> list[FeedEntry] | None:
+        """Загружает ленту условным запросом; возвращает None, если она не изменилась.
+
+        Известный канал разбирается только до первого уже обработанного видео.
+        Пока для канала не накоплено двух дат публикации (например, после
+        перезапуска), лента разбирается целиком, чтобы оценить частоту
+        загрузок, но возвращается так же только до первого известного видео.
+        """
+        url = self.feed_url.format(channel_id=channel_id)
+        known = self.known_videos.get(channel_id, {})
+        parser = YouTubeFeedParser(stop_at=known if len(state.published) >= 2 else ())
+        async with http.get(url, headers=state.headers()) as response:
+            if response.status == 304:
+                return None
+            if response.status != 200:
+                raise RuntimeError(f"HTTP статус: {response.status}")
+
+            # Тело дочитывается и после остановки разбора, чтобы соединение вернулось в пул
+            async for chunk in response.content.iter_chunked(FEED_CHUNK_SIZE):
+                if not parser.done:
+                    parser.feed(chunk)
+            entries = parser.close()
+
+            state.etag = response.headers.get("ETag")
+            state.last_modified = response.headers.get("Last-Modified")
+
+        state.record_published(entries)
+        for i, entry in enumerate(entries):
+            if entry.video_id in known:
+                return entries[: i + 1]
+        return entries
+
+    async def handle_push(self, channel_id: str, entries: list[FeedEntry]) -> None:
+        """Публикует записи из push-уведомления WebSub тем же путем, что и опрос."""
+        try:
+            if not self._known_loaded:
+                await self.load_known_videos()
 
             async with async_session() as session:
-                video_query = select(YouTubeVideo).where(
-                    YouTubeVideo.video_id == video_id, YouTubeVideo.guild_id == channel.guild_id
+                query = select(YouTubeChannel).where(
+                    YouTubeChannel.channel_id == channel_id, YouTubeChannel.is_active.is_(True)
                 )
-                video_result = await session.execute(video_query)
-                existing_video = video_result.scalar_one_or_none()
-
-                if not existing_video:
-                    is_live = "Live" in latest_video.title or "прямая" in latest_video.title.lower()
-                    new_video = YouTubeVideo(
-                        video_id=video_id,
-                        guild_id=channel.guild_id,
-                        channel_id=channel.channel_id,
-                        title=latest_video.title,
-                        published_at=published_at,
-                        is_live=is_live,
+                result = await session.execute(query)
+                channels = result.scalars().all()
+
+            entries = self._recent_push_entries(channel_id, entries)
+            self.feed_states.setdefault(channel_id, FeedState()).record_published(entries)
+            if channels and entries:
+                await self._publish_new_videos({channel_id: list(channels)}, {channel_id: entries})
+        except Exception as e:
+            print(f"Ошибка при обработке push-уведомления YouTube: {e}")
+
+    def _recent_push_entries(self, channel_id: str, entries: list[FeedEntry]) -> list[FeedEntry]:
+        """Отбрасывает записи push-уведомления, которые не являются новыми загрузками.
+
+        Хаб присылает запись и при правке названия или описания уже
+        существующего видео. Такие записи отличаются датой публикации: она
+        старше PUSH_MAX_AGE или самого нового известного видео канала.
+        """
+        threshold = datetime.now(UTC) - PUSH_MAX_AGE
+        state = self.feed_states.get(channel_id)
+        latest = state.latest_published if state else None
+        if latest is not None:
+            threshold = max(threshold, latest)
+        return [entry for entry in entries if entry.published and entry.published >= threshold]
+
+    async def load_known_videos(self) -> None:
+        """Загружает из базы идентификаторы последних опубликованных видео по каналам.
+
+        Для канала берутся KNOWN_VIDEOS_LIMIT последних видео: лента содержит
+        только свежие записи, более старые для разбора не нужны.
+        """
+        videos = (
+            select(
+                YouTubeVideo.channel_id,
+                YouTubeVideo.video_id,
+                func.max(YouTubeVideo.published_at).label("published_at"),
+            )
+            .group_by(YouTubeVideo.channel_id, YouTubeVideo.video_id)
+            .subquery()
+        )
+        ranked = select(
+            videos.c.channel_id,
+            videos.c.video_id,
+            func.row_number()
+            .over(partition_by=videos.c.channel_id, order_by=videos.c.published_at.desc())
+            .label("rank"),
+        ).subquery()
+        query = (
+            select(ranked.c.channel_id, ranked.c.video_id)
+            .where(ranked.c.rank <= KNOWN_VIDEOS_LIMIT)
+            .order_by(ranked.c.channel_id, ranked.c.rank.desc())
+        )
+
+        async with async_session() as session:
+            result = await session.execute(query)
+            known: dict[str, dict[str, None]] = defaultdict(dict)
+            for channel_id, video_id in result.tuples().all():
+                known[channel_id][video_id] = None
+        self.known_videos = dict(known)
+        self._known_loaded = True
+
+    def _new_entries(self, channel_id: str, feed: list[FeedEntry]) -> list[tuple[FeedEntry, bool]]:
+        """Возвращает записи ленты, которых нет среди известных видео канала.
+
+        Каждая запись сопровождается признаком, нужно ли о ней объявлять.
+        Для канала, который встречается впервые, сохраняются все записи
+        ленты, чтобы база покрывала ее целиком, но объявляется только
+        последняя — иначе в чат попала бы вся история канала.
+        """
+        known = self.known_videos.get(channel_id)
+        if known is None:
+            return [(entry, i == 0) for i, entry in enumerate(feed)]
+        return [(entry, True) for entry in feed if entry.video_id not in known]
+
+    def _remember(self, channel_id: str, video_ids: list[str]) -> None:
+        """Добавляет видео ленты к известным, оставляя KNOWN_VIDEOS_LIMIT последних.
+
+        Известные видео не заменяются лентой, а дополняются ей: если
+        граничное видео удалят, разбор остановится на следующем известном.
+        """
+        known = self.known_videos.setdefault(channel_id, {})
+        # Лента идет от новых к старым, а словарь хранит от старых к новым
+        for video_id in reversed(video_ids):
+            known.pop(video_id, None)
+            known[video_id] = None
+        while len(known) > KNOWN_VIDEOS_LIMIT:
+            del known[next(iter(known))]
+
+    async def _publish_new_videos(
+        self,
+        subscriptions: dict[str, list[Any]],
+        feeds: dict[str, list[FeedEntry]],
+    ) -> None:
+        """Сохраняет новые видео и рассылает их во все подписанные каналы Discord.
+
+        Все новые записи лент вставляются одним INSERT ... ON CONFLICT DO NOTHING;
+        публикуются только реально вставленные пары (video_id, guild_id)
+        в порядке публикации видео.
+        """
+        new_entries = [
+            (channel_id, entry, announce)
+            for channel_id, feed in feeds.items()
+            for entry, announce in self._new_entries(channel_id, feed)
+        ]
+        new_entries.sort(key=lambda item: item[1].published.timestamp() if item[1].published else 0)
+
+        if new_entries:
+            published_at = datetime.now()
+            rows = {
+                (entry.video_id, channel.guild_id): {
+                    "video_id": entry.video_id,
+                    "guild_id": channel.guild_id,
+                    "channel_id": channel_id,
+                    "title": entry.title[:255],
+                    "published_at": published_at,
+                    "is_live": is_live_entry(entry),
+                }
+                for channel_id, entry, _ in new_entries
+                for channel in subscriptions[channel_id]
+            }
+            try:
+                async with async_session() as session:
+                    stmt = (
+                        insert(YouTubeVideo)
+                        .values(list(rows.values()))
+                        .on_conflict_do_nothing(constraint="uq_youtube_video_per_guild")
+                        .returning(YouTubeVideo.video_id, YouTubeVideo.guild_id)
                     )
-                    session.add(new_video)
+                    result = await session.execute(stmt)
+                    inserted = set(result.tuples().all())
+                    await session.commit()
+            except Exception as e:
+                print(f"Ошибка при сохранении YouTube видео: {e}")
+                # Сбрасываем валидаторы, чтобы ленты были загружены и обработаны заново
+                for channel_id in feeds:
+                    self.feed_states[channel_id].etag = None
+                    self.feed_states[channel_id].last_modified = None
+                return
 
+            for channel_id, entry, announce in new_entries:
+                if not announce:
+                    continue
+                for channel in subscriptions[channel_id]:
+                    if (entry.video_id, channel.guild_id) not in inserted:
+                        continue
                     discord_channel = self.bot.get_channel(channel.discord_channel_id)
-                    if discord_channel:
-                        if is_live:
-                            message = (
-                                f"🔴 **Прямой эфир на канале [{author}](https://www.youtube.com/channel/{channel.channel_id})!**\n"
-                                f"{latest_video.link}"
-                            )
-                        else:
-                            message = (
-                                f"🎥 **Новое видео на канале [{author}](https://www.youtube.com/channel/{channel.channel_id})!**\n"
-                                f"{latest_video.link}"
-                            )
-                        await discord_channel.send(message)
-
-                await session.commit()
+                    if not discord_channel:
+                        continue
+                    try:
+                        await discord_channel.send(format_video_message(entry, channel_id))
+                    except Exception as e:
+                        print(f"Ошибка при обработке канала {channel.name}: {e}")
 
-        except Exception as e:
-            print(f"Ошибка при обработке канала {channel.name}: {e}")
+        for channel_id, feed in feeds.items():
+            self._remember(channel_id, [entry.video_id for entry in feed])
 
     async def toggle_channel(self, name: str, guild_id: int, active: bool) -> bool | None:
         """Переключает статус отслеживания YouTube-канала."""
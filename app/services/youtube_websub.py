@@ -0,0 +1,204 @@
+"""Push-уведомления о новых видео YouTube по протоколу WebSub (PubSubHubbub)."""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+from app.services.youtube_feed import FeedEntry, parse_feed
+
+HUB_URL = "https://pubsubhubbub.appspot.com/subscribe"
+TOPIC_URL = "https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
+DEFAULT_PORT = 8080
+HUB_TIMEOUT = 15
+LEASE_SECONDS = 5 * 24 * 60 * 60
+# Подписка продлевается заранее, с запасом больше интервала сверки
+RENEW_MARGIN = 2 * 60 * 60
+# Запрос, который хаб так и не подтвердил, повторяется через это время
+PENDING_TIMEOUT = 10 * 60
+
+EntriesHandler = Callable[[str, list[FeedEntry]], Awaitable[None]]
+
+
+class YouTubeWebSub:
+    """Подписчик WebSub: принимает push-уведомления хаба YouTube.
+
+    Поднимает aiohttp-сервер на адресе обратного вызова, подписывается на ленты
+    отслеживаемых каналов, подтверждает запросы хаба, проверяет подпись
+    уведомлений и продлевает подписки до истечения срока аренды.
+    Включается, если задан YOUTUBE_WEBSUB_CALLBACK.
+    """
+
+    def __init__(
+        self,
+        on_entries: EntriesHandler,
+        callback_url: str | None = None,
+        hub_url: str = HUB_URL,
+        port: int | None = None,
+        secret: str | None = None,
+    ) -> None:
+        """Инициализирует подписчика по переменным окружения или явным параметрам."""
+        self.on_entries = on_entries
+        self.callback_url = callback_url or os.getenv("YOUTUBE_WEBSUB_CALLBACK", "")
+        self.hub_url = hub_url
+        self.topic_url = TOPIC_URL
+        self.port = port or int(os.getenv("YOUTUBE_WEBSUB_PORT", DEFAULT_PORT))
+        self.secret = secret or os.getenv("YOUTUBE_WEBSUB_SECRET") or secrets.token_hex(16)
+        self.enabled = bool(self.callback_url)
+        # channel_id -> момент истечения аренды (time.monotonic)
+        self.leases: dict[str, float] = {}
+        # channel_id -> (hub.mode, момент отправки запроса)
+        self.pending: dict[str, tuple[str, float]] = {}
+        self._runner: web.AppRunner | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def topic(self, channel_id: str) -> str:
+        """Возвращает URL темы хаба для канала."""
+        return self.topic_url.format(channel_id=channel_id)
+
+    @staticmethod
+    def _channel_from_topic(topic: str) -> str | None:
+        return URL(topic).query.get("channel_id")
+
+    async def start(self) -> None:
+        """Запускает HTTP-сервер для обратных вызовов хаба."""
+        path = URL(self.callback_url).path or "/"
+        app = web.Application()
+        app.router.add_get(path, self.handle_verification)
+        app.router.add_post(path, self.handle_notification)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, port=self.port).start()
+        print(f"WebSub: прием уведомлений YouTube на {self.callback_url}")
+
+    async def stop(self) -> None:
+        """Останавливает HTTP-сервер."""
+        await self.drain()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def sync(self, channel_ids: Iterable[str]) -> None:
+        """Подписывается на новые каналы, продлевает истекающие и отписывается от лишних."""
+        channel_ids = set(channel_ids)
+        now = time.monotonic()
+        requests = []
+        for channel_id in channel_ids | self.leases.keys():
+            pending = self.pending.get(channel_id)
+            if pending and now - pending[1] < PENDING_TIMEOUT:
+                continue
+            if channel_id not in channel_ids:
+                requests.append((channel_id, "unsubscribe"))
+            elif self.leases.get(channel_id, 0.0) - now < RENEW_MARGIN:
+                requests.append((channel_id, "subscribe"))
+
+        if not requests:
+            return
+
+        timeout = aiohttp.ClientTimeout(total=HUB_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            for channel_id, mode in requests:
+                await self._request(http, channel_id, mode)
+
+    async def _request(self, http: aiohttp.ClientSession, channel_id: str, mode: str) -> bool:
+        """Отправляет хабу запрос на подписку или отписку."""
+        # Хаб может прислать подтверждение раньше, чем вернет ответ на запрос
+        self.pending[channel_id] = (mode, time.monotonic())
+        data = {
+            "hub.callback": self.callback_url,
+            "hub.mode": mode,
+            "hub.topic": self.topic(channel_id),
+            "hub.verify": "async",
+            "hub.lease_seconds": str(LEASE_SECONDS),
+            "hub.secret": self.secret,
+        }
+        try:
+            async with http.post(self.hub_url, data=data) as response:
+                if response.status in (202, 204):
+                    return True
+                print(f"WebSub: хаб отклонил {mode} для {channel_id}: статус {response.status}")
+        except Exception as e:
+            print(f"WebSub: ошибка запроса {mode} для {channel_id}: {e}")
+
+        self.pending.pop(channel_id, None)
+        return False
+
+    async def handle_verification(self, request: web.Request) -> web.Response:
+        """Подтверждает запрос подписки, если он был отправлен этим ботом."""
+        mode = request.query.get("hub.mode", "")
+        channel_id = self._channel_from_topic(request.query.get("hub.topic", ""))
+        challenge = request.query.get("hub.challenge", "")
+
+        pending = self.pending.get(channel_id) if channel_id else None
+        if pending is None or pending[0] != mode or not challenge:
+            return web.Response(status=404)
+
+        del self.pending[channel_id]
+        if mode == "subscribe":
+            try:
+                lease = int(request.query.get("hub.lease_seconds", LEASE_SECONDS))
+            except ValueError:
+                lease = LEASE_SECONDS
+            self.leases[channel_id] = time.monotonic() + lease
+        else:
+            self.leases.pop(channel_id, None)
+
+        return web.Response(text=challenge)
+
+    def _signature_valid(self, body: bytes, header: str | None) -> bool:
+        if not header or "=" not in header:
+            return False
+        method, signature = header.split("=", 1)
+        if method not in ("sha1", "sha256", "sha384", "sha512"):
+            return False
+        expected = hmac.new(self.secret.encode(), body, getattr(hashlib, method)).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    async def handle_notification(self, request: web.Request) -> web.Response:
+        """Принимает уведомление хаба и передает новые записи в общий путь публикации.
+
+        Хаб получает ответ сразу, записи обрабатываются в фоне. По протоколу
+        на уведомление с неверной подписью тоже отвечают 2xx, но игнорируют его.
+        """
+        body = await request.read()
+        if not self._signature_valid(body, request.headers.get("X-Hub-Signature")):
+            print("WebSub: уведомление с неверной подписью проигнорировано")
+            return web.Response(status=202)
+
+        try:
+            entries = parse_feed(body)
+        except Exception as e:
+            print(f"WebSub: ошибка разбора уведомления: {e}")
+            return web.Response(status=202)
+
+        by_channel: dict[str, list[FeedEntry]] = defaultdict(list)
+        for entry in entries:
+            if entry.channel_id in self.leases:
+                by_channel[entry.channel_id].append(entry)
+
+        for channel_id, channel_entries in by_channel.items():
+            task = asyncio.create_task(self._dispatch(channel_id, channel_entries))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return web.Response(status=202)
+
+    async def _dispatch(self, channel_id: str, entries: list[FeedEntry]) -> None:
+        try:
+            await self.on_entries(channel_id, entries)
+        except Exception as e:
+            print(f"WebSub: ошибка обработки уведомления для {channel_id}: {e}")
+
+    async def drain(self) -> None:
+        """Дожидается обработки уже принятых уведомлений."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,110 @@
+import re
+
+from app.tools.prompt import EMOJIS, Emoji
+from app.tools.prompt_registry import prompt_registry
+
+MARKDOWN_PATTERN = re.compile(r"[*#]+")
+
+
+class TextPostprocessor:
+    """Постобработка ответов ИИ: очистка markdown и подстановка эмодзи.
+
+    Все теги эмодзи компилируются в одно регулярное выражение-альтернацию,
+    поэтому замена выполняется за один линейный проход по тексту
+    независимо от количества эмодзи.
+    """
+
+    def __init__(self, emojis: list[Emoji]) -> None:
+        """Компилирует шаблоны для переданного набора эмодзи."""
+        self.compile(emojis)
+
+    def compile(self, emojis: list[Emoji]) -> None:
+        """Пересобирает шаблоны для нового набора эмодзи."""
+        self.mapping: dict[str, str] = {e.tag: e.full_code for e in emojis}
+        # Длинные теги первыми, чтобы альтернация выбирала самое длинное совпадение
+        tags = sorted(self.mapping, key=len, reverse=True)
+
+        self.emoji_pattern: re.Pattern[str] | None = (
+            re.compile("|".join(re.escape(tag) for tag in tags)) if tags else None
+        )
+
+        self.max_tag_len = max((len(tag) for tag in tags), default=0)
+        self.tag_prefixes: frozenset[str] = frozenset(
+            tag[:i] for tag in tags for i in range(1, len(tag))
+        )
+
+    def _replace(self, match: re.Match[str]) -> str:
+        return self.mapping[match.group()]
+
+    def clean(self, text: str) -> str:
+        """Удаляет markdown-стили: **, *, ###, ##, #."""
+        return MARKDOWN_PATTERN.sub("", text)
+
+    def replace_emojis(self, text: str) -> str:
+        """Заменяет текстовые теги эмодзи на Discord-эмодзи."""
+        if self.emoji_pattern is None:
+            return text
+        return self.emoji_pattern.sub(self._replace, text)
+
+    def render(self, text: str) -> str:
+        """Очищает markdown и подставляет эмодзи.
+
+        Оба шага выполняются скомпилированными шаблонами без колбэка
+        на каждое совпадение markdown, что быстрее одного общего прохода.
+        """
+        return self.replace_emojis(self.clean(text))
+
+    def holdback_index(self, text: str) -> int:
+        """Возвращает позицию, с которой хвост очищенного текста может быть началом тега.
+
+        Хвост начинается не раньше конца последнего найденного тега
+        и является собственным префиксом одного из тегов.
+        """
+        if self.emoji_pattern is None:
+            return len(text)
+
+        last_end = 0
+        for match in self.emoji_pattern.finditer(text):
+            last_end = match.end()
+
+        start = max(last_end, len(text) - self.max_tag_len + 1)
+        pos = text.find(":", start)
+        while pos != -1:
+            if text[pos:] in self.tag_prefixes:
+                return pos
+            pos = text.find(":", pos + 1)
+        return len(text)
+
+    def stream(self) -> "StreamPostprocessor":
+        """Создает обработчик для потоковой выдачи ответа по частям."""
+        return StreamPostprocessor(self)
+
+
+class StreamPostprocessor:
+    """Потоковая постобработка ответа, приходящего частями.
+
+    Незавершенный тег эмодзи на границе частей удерживается в буфере
+    до прихода следующей части, поэтому результат совпадает с render()
+    для склеенного текста.
+    """
+
+    def __init__(self, postprocessor: TextPostprocessor) -> None:
+        """Инициализирует пустой буфер."""
+        self.postprocessor = postprocessor
+        self.buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        """Принимает очередную часть текста и возвращает готовую к отправке часть."""
+        self.buffer += self.postprocessor.clean(chunk)
+        cut = self.postprocessor.holdback_index(self.buffer)
+        ready, self.buffer = self.buffer[:cut], self.buffer[cut:]
+        return self.postprocessor.replace_emojis(ready)
+
+    def flush(self) -> str:
+        """Возвращает остаток буфера после завершения потока."""
+        rest, self.buffer = self.buffer, ""
+        return self.postprocessor.replace_emojis(rest)
+
+
+postprocessor = TextPostprocessor(EMOJIS)
+prompt_registry.on_reload(lambda module: postprocessor.compile(module.EMOJIS))
@@ -120,6 +120,16 @@ SYSTEM_PROMPT = f"""
 """
 
 
+# Общий для всех запросов системный промпт: не зависит от пользователя, поэтому
+# его байты совпадают между запросами и провайдер может кешировать этот префикс
+STABLE_SYSTEM_PROMPT = SYSTEM_PROMPT.format(
+    user_info=(
+        "Информация по известным пользователям (имя должно совпадать побуквенно, "
+        "иначе это другой юзер). Но не упоминать об этом постоянно:\n" + USER_DESCRIPTIONS_TEXT
+    )
+).strip()
+
+
 SYSTEM_BIRTHDAY_PROMPT = f"""
 Ты — веселый Discord-бот.
 Придумай уникальное, короткое (3-4 предложения) поздравление с днём рождения
@@ -213,6 +223,33 @@ UPDATED_REPORT_PROMPT = """
 Без дополнительных заголовков, пояснений или комментариев.
 """
 
+REPORT_CHUNK_PROMPT = """
+Вы — аналитик Discord-сервера. На входе фрагмент переписки канала \
+или промежуточные сводки нескольких фрагментов подряд.
+
+Составьте список ВСЕХ тем обсуждения во фрагменте, включая небольшие: \
+окончательный отбор значимых тем будет сделан позже по всем фрагментам.
+- Игнорируйте технические реплики ("ок", "ага", "спс") и сообщения только из ссылок.
+- Объединяйте сообщения об одном ключевом объекте (игре, фильме, событии) в одну тему.
+- Если на входе сводки — объедините одинаковые темы, сложите счетчики \
+и оставьте самый ранний ID.
+- Для каждой темы укажите ID первого сообщения, число участников и число сообщений.
+
+Формат вывода — маркированный список без пояснений:
+- [название темы] [ID:123456789] (участников: 3, сообщений: 7)
+"""
+
+REPORT_MERGE_PROMPT = (
+    """
+На входе — сводки последовательных фрагментов переписки одного канала. \
+Каждая строка: тема, ID первого сообщения, число участников и сообщений во фрагменте. \
+Объедините одинаковые темы из разных фрагментов (сложив счетчики и оставив самый \
+ранний ID) и составьте итоговый отчет по правилам ниже. Числа участников \
+и сообщений используйте для оценки значимости темы, в отчет их не включайте.
+"""
+    + UPDATED_REPORT_PROMPT
+)
+
 
 WEATHER_PROMPT = """Ты полезный ассистент, который помогает пользователям
 узнать погоду в любом городе.
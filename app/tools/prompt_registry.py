@@ -0,0 +1,112 @@
+"""Реестр заранее собранных вариантов промптов."""
+
+import importlib
+import os
+import time
+from collections.abc import Callable
+from types import ModuleType
+
+PROMPT_MODULE = "app.tools.prompt"
+# Как часто (секунды) проверять, не изменился ли файл промптов
+RELOAD_CHECK_INTERVAL = 5.0
+PERSONA_HEADER = "\n\nВАЖНОЕ ДОПОЛНЕНИЕ К РОЛИ:\n"
+
+
+class PromptRegistry:
+    """Все варианты промптов, собранные один раз.
+
+    Общий системный промпт и промпт прожарки для каждой персоны собираются
+    при загрузке, поэтому получение промпта — поиск в словаре. Если файл
+    промптов изменился, модуль перезагружается и варианты собираются заново;
+    при ошибке в файле остаются прежние промпты.
+
+    Перезагрузка видна только тем, кто читает промпты через реестр:
+    остальные промпты берутся из prompts(), а производные данные
+    (например, шаблоны эмодзи) пересобираются подписчиками on_reload.
+    RANK_CONFIG не перезагружается: таблица рангов собирается при импорте.
+    """
+
+    def __init__(
+        self, module_name: str = PROMPT_MODULE, check_interval: float = RELOAD_CHECK_INTERVAL
+    ) -> None:
+        """Загружает модуль промптов и собирает все варианты."""
+        self.module_name = module_name
+        self.check_interval = check_interval
+        self.system_prompt = ""
+        self.roast_prompts: dict[str | None, str] = {}
+        self.module: ModuleType | None = None
+        self._listeners: list[Callable[[ModuleType], None]] = []
+        self._mtime = 0.0
+        self._checked_at = 0.0
+        self.compile(importlib.import_module(module_name))
+
+    def compile(self, module: ModuleType) -> None:
+        """Собирает варианты промптов из модуля."""
+        self.system_prompt = module.STABLE_SYSTEM_PROMPT
+
+        user_info = "\n".join(f"- {k}: {v}" for k, v in module.USER_DESCRIPTIONS.items())
+        roast_prompt = module.ROAST_PROMPT.format(user_info=user_info)
+        self.roast_prompts = {None: roast_prompt}
+        for persona, addition in module.ROAST_PERSONAS.items():
+            self.roast_prompts[persona] = f"{roast_prompt}{PERSONA_HEADER}{addition}"
+
+        self.module = module
+        self._mtime = self._file_mtime(module)
+
+    def on_reload(self, callback: Callable[[ModuleType], None]) -> None:
+        """Регистрирует функцию, вызываемую с новым модулем после перезагрузки."""
+        self._listeners.append(callback)
+
+    @staticmethod
+    def _file_mtime(module: ModuleType) -> float:
+        try:
+            return os.stat(module.__file__).st_mtime
+        except (OSError, TypeError):
+            return 0.0
+
+    def reload_if_changed(self) -> bool:
+        """Перезагружает промпты, если файл изменился; проверяет не чаще check_interval."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+
+        module = importlib.import_module(self.module_name)
+        if self._file_mtime(module) == self._mtime:
+            return False
+
+        try:
+            self.compile(importlib.reload(module))
+            for callback in self._listeners:
+                callback(self.module)
+        except Exception as e:
+            # Сломанный файл не должен ронять бота: остаемся на прежних промптах
+            self._mtime = self._file_mtime(module)
+            print(f"Ошибка перезагрузки промптов: {e}")
+            return False
+
+        print("Промпты перезагружены")
+        return True
+
+    def prompts(self) -> ModuleType:
+        """Возвращает актуальный модуль промптов."""
+        self.reload_if_changed()
+        return self.module
+
+    def stable_system_prompt(self) -> str:
+        """Возвращает общий для всех запросов системный промпт."""
+        self.reload_if_changed()
+        return self.system_prompt
+
+    def roast_prompt(self, persona: str | None = None) -> str | None:
+        """Возвращает промпт прожарки для персоны или None, если такой персоны нет."""
+        self.reload_if_changed()
+        return self.roast_prompts.get(persona)
+
+    @property
+    def roast_personas(self) -> list[str]:
+        """Возвращает имена доступных персон прожарки."""
+        return [persona for persona in self.roast_prompts if persona is not None]
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,154 @@
+import hashlib
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import tiktoken
+
+TOKEN_MODEL = "gpt-4o-mini"
+TOKEN_CACHE_SIZE = 4096
+# Приближенная оценка: в среднем ~4 байта UTF-8 на токен для латиницы и кириллицы
+BYTES_PER_TOKEN = 4
+# Служебные токены формата чата OpenAI: на каждое сообщение и на начало ответа
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+def estimate_tokens(text: str | None) -> int:
+    """Быстро оценивает количество токенов по длине текста в байтах UTF-8.
+
+    Не вызывает токенизатор; подходит для проверок бюджета,
+    где точное значение не требуется.
+    """
+    if not text:
+        return 0
+    return -(-len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+
+class TokenCounter:
+    """Подсчет токенов с LRU-кешем по хешу содержимого.
+
+    Кодировка tiktoken загружается при первом точном подсчете.
+    """
+
+    def __init__(self, model: str = TOKEN_MODEL, maxsize: int = TOKEN_CACHE_SIZE) -> None:
+        """Инициализирует счетчик без загрузки кодировки."""
+        self.model = model
+        self.maxsize = maxsize
+        self._encoding: tiktoken.Encoding | None = None
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def encoding(self) -> "tiktoken.Encoding":
+        """Возвращает кодировку tiktoken, загружая её при первом обращении."""
+        if self._encoding is None:
+            import tiktoken
+
+            self._encoding = tiktoken.encoding_for_model(self.model)
+        return self._encoding
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _remember(self, key: bytes, count: int) -> None:
+        self._cache[key] = count
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def count(self, text: str) -> int:
+        """Возвращает точное количество токенов в тексте."""
+        if not text:
+            return 0
+
+        key = self._key(text)
+        count = self._cache.get(key)
+        if count is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return count
+
+        self.misses += 1
+        count = len(self.encoding.encode_ordinary(text))
+        self._remember(key, count)
+        return count
+
+    def count_many(self, texts: Iterable[str]) -> list[int]:
+        """Считает токены для списка текстов, кодируя промахи кеша одним пакетом."""
+        texts = list(texts)
+        keys = [self._key(text) if text else b"" for text in texts]
+        counts = [0] * len(texts)
+        missing: dict[bytes, list[int]] = {}
+
+        for i, (text, key) in enumerate(zip(texts, keys, strict=True)):
+            if not text:
+                continue
+            count = self._cache.get(key)
+            if count is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                counts[i] = count
+
+        if missing:
+            self.misses += len(missing)
+            batch = [texts[positions[0]] for positions in missing.values()]
+            encoded = self.encoding.encode_ordinary_batch(batch)
+            for (key, positions), tokens in zip(missing.items(), encoded, strict=True):
+                self._remember(key, len(tokens))
+                for i in positions:
+                    counts[i] = len(tokens)
+
+        return counts
+
+    def count_messages(self, messages: Iterable[dict[str, Any]]) -> int:
+        """Считает токены промпта из сообщений формата chat.completions."""
+        messages = list(messages)
+        contents = [str(msg.get("content") or "") for msg in messages]
+        return (
+            sum(self.count_many(contents))
+            + TOKENS_PER_MESSAGE * len(messages)
+            + (TOKENS_PER_REPLY if messages else 0)
+        )
+
+    def clear(self) -> None:
+        """Очищает кеш и статистику."""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+@dataclass
+class PromptCacheStats:
+    """Накопленная статистика кеширования промптов на стороне провайдера."""
+
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+    def record(self, usage: Any) -> tuple[int, int]:
+        """Учитывает поле usage ответа API; возвращает (токены промпта, из них в кеше).
+
+        Провайдеры, не сообщающие prompt_tokens_details, учитываются с нулем в кеше.
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        return prompt_tokens, cached_tokens
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля токенов промпта, взятых из кеша провайдера."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+token_counter = TokenCounter()
+prompt_cache_stats = PromptCacheStats()
@@ -1,30 +1,21 @@
 import re
+from bisect import bisect_right
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime
+from types import MappingProxyType
+from typing import Any
 
 import discord
-import tiktoken
 
-from app.tools.prompt import EMOJI_MAPPING, RANK_CONFIG, SYSTEM_PROMPT, USER_DESCRIPTIONS
+from app.tools.postprocess import postprocessor
+from app.tools.prompt import RANK_CONFIG
+from app.tools.tokens import token_counter
 
-ENCODING = tiktoken.encoding_for_model("gpt-4o-mini")
 
-
-def user_prompt(name: str) -> str:
-    """Формирует системный промпт для пользователя.
-
-    Если имя совпадает с ключами в P.USER_DESCRIPTIONS.
-    """
-    if str(name).strip() in USER_DESCRIPTIONS:
-        user_info = (
-            "Информация по пользователям с name (они должны совпадать побуквенно, "
-            "иначе это другой юзер). Но не упоминать об этом постоянно:"
-        )
-        user_info += f"\n- {name}: {USER_DESCRIPTIONS[name]}"
-        prompt = SYSTEM_PROMPT.format(user_info=user_info).strip()
-        return prompt
-    else:
-        cleaned_prompt = re.sub(r"\n\s*5\..*", "", SYSTEM_PROMPT.strip())
-        return cleaned_prompt
+def current_user_prompt(name: str) -> str:
+    """Формирует переменную часть системного промпта о текущем собеседнике."""
+    return f"Сейчас тебе пишет пользователь {str(name).strip()}."
 
 
 def enrich_users_context(contexts: list[str], user_descriptions: dict) -> list[str]:
@@ -64,10 +55,12 @@ def users_context(contexts: list[str], user_descriptions: dict) -> str:
     return new_context
 
 
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+
+
 def contains_only_urls(text: str) -> bool:
     """Проверяет, содержит ли текст только ссылки (и пробелы между ними)."""
-    url_pattern = re.compile(r"https?://\S+|www\.\S+")
-    text_without_urls = url_pattern.sub("", text)
+    text_without_urls = URL_PATTERN.sub("", text)
     return not text_without_urls.strip()
 
 
@@ -80,23 +73,23 @@ def darken_color(rgb: tuple, factor: float = 0.75) -> tuple:
 
 
 def count_tokens(text: str | None) -> int:
-    """Подсчитывает количество токенов в тексте с использованием кодировки GPT-4o-mini."""
+    """Подсчитывает количество токенов в тексте с использованием кодировки GPT-4o-mini.
+
+    Результаты кешируются по хешу содержимого (см. app.tools.tokens).
+    """
     if not isinstance(text, str):
         text = str(text) if text else ""
-    return len(ENCODING.encode(text))
+    return token_counter.count(text)
 
 
 def clean_text(text: str) -> str:
     """Очищает текст от markdown-стилей: **, *, ###, ##, #."""
-    cleaned_text = re.sub(r"(\*\*|\*|###|##|#)", "", text)
-    return cleaned_text
+    return postprocessor.clean(text)
 
 
 def replace_emojis(text: str) -> str:
     """Заменяет текстовые представления эмодзи на реальные Discord-эмодзи."""
-    for text_emoji, discord_emoji in EMOJI_MAPPING.items():
-        text = text.replace(text_emoji, discord_emoji)
-    return text
+    return postprocessor.replace_emojis(text)
 
 
 COLOR_MAP: dict[str, discord.Color] = {
@@ -109,21 +102,75 @@ COLOR_MAP: dict[str, discord.Color] = {
 }
 
 
-def get_rank_description(message_count: int) -> dict:
-    """Возвращает описание уровня (ранга) пользователя на основе количества сообщений."""
-    selected = RANK_CONFIG[0]
-    for rank_cfg in RANK_CONFIG:
-        if message_count >= rank_cfg["threshold"]:
-            selected = rank_cfg
+@dataclass(frozen=True, slots=True)
+class Rank:
+    """Скомпилированный ранг из RANK_CONFIG.
+
+    Поле info — неизменяемое представление в формате get_rank_description.
+    """
+
+    level: int
+    name: str
+    threshold: int
+    next_threshold: int
+    color: discord.Color
+    text_color: tuple
+    bg_filename: str
+    info: Mapping[str, Any]
+
+
+def _compile_ranks(config: list[dict]) -> tuple[Rank, ...]:
+    """Компилирует RANK_CONFIG в кортеж заранее созданных объектов Rank."""
+    ranks = []
+    for level, rank_cfg in enumerate(config):
+        if level and rank_cfg["threshold"] < config[level - 1]["threshold"]:
+            raise ValueError("RANK_CONFIG должен быть отсортирован по возрастанию threshold.")
+
+        color = COLOR_MAP.get(rank_cfg["color_name"], discord.Color.default())
+        info = MappingProxyType(
+            {
+                "color": color,
+                "next_threshold": rank_cfg["next_threshold"],
+                "rank_level": level,
+                "text_color": rank_cfg["text_color"],
+                "bg_filename": rank_cfg["bg_filename"],
+                "description": rank_cfg["name"],
+            }
+        )
+        ranks.append(
+            Rank(
+                level=level,
+                name=rank_cfg["name"],
+                threshold=rank_cfg["threshold"],
+                next_threshold=rank_cfg["next_threshold"],
+                color=color,
+                text_color=rank_cfg["text_color"],
+                bg_filename=rank_cfg["bg_filename"],
+                info=info,
+            )
+        )
+    return tuple(ranks)
+
+
+RANK_TABLE: tuple[Rank, ...] = _compile_ranks(RANK_CONFIG)
+RANK_THRESHOLDS: tuple[int, ...] = tuple(rank.threshold for rank in RANK_TABLE)
+# Значения счетчика, при достижении которых уровень повышается (порог первого ранга не в счет)
+_RANK_UP_COUNTS: frozenset[int] = frozenset(RANK_THRESHOLDS[1:]) - {RANK_THRESHOLDS[0]}
+
+
+def find_rank(message_count: int) -> Rank:
+    """Возвращает ранг для количества сообщений бинарным поиском по порогам."""
+    return RANK_TABLE[max(bisect_right(RANK_THRESHOLDS, message_count) - 1, 0)]
 
-    return {
-        "color": COLOR_MAP.get(selected["color_name"], discord.Color.default()),
-        "next_threshold": selected["next_threshold"],
-        "rank_level": RANK_CONFIG.index(selected),
-        "text_color": selected["text_color"],
-        "bg_filename": selected["bg_filename"],
-        "description": selected["name"],
-    }
+
+def crosses_rank_threshold(message_count: int) -> bool:
+    """Проверяет, повышается ли ранг при переходе к message_count с message_count - 1."""
+    return message_count in _RANK_UP_COUNTS
+
+
+def get_rank_description(message_count: int) -> Mapping[str, Any]:
+    """Возвращает описание уровня (ранга) пользователя на основе количества сообщений."""
+    return find_rank(message_count).info
 
 
 def convert_mcp_tools_to_openai(mcp_tools: list) -> list:
@@ -144,6 +191,16 @@ def convert_mcp_tools_to_openai(mcp_tools: list) -> list:
     return openai_tools
 
 
+def format_search_context(result: Mapping[str, Any]) -> str:
+    """Форматирует структурированный результат поиска в компактный блок для промпта."""
+    lines = [f"Результаты веб-поиска по запросу «{result.get('query', '')}»:"]
+    if result.get("answer"):
+        lines.append(f"Краткий ответ: {result['answer']}")
+    for i, source in enumerate(result.get("sources") or [], 1):
+        lines.append(f"{i}. {source['title']} ({source['url']}): {source['snippet']}")
+    return "\n".join(lines)
+
+
 def parse_birthday_date(content: str) -> datetime:
     """Парсит дату рождения из текста команды.
 
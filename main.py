@@ -19,6 +19,8 @@ intents.message_content = True
 ENABLE_TELEGRAM_NOTIFIER = False  # Включить/выключить уведомления в Telegram
 ENABLE_WEATHER = False  # Включить/выключить поиск погоды (нужен API ключ)
 ENABLE_SEARCH = False  # Включить/выключить поиск в интернете (нужен API ключ)
+ENABLE_WARM_UP = True  # Прогревать RAG, MCP и шрифты в фоне после подключения к Discord
+ENABLE_RESPONSE_CACHE = False  # Отвечать на повторные похожие вопросы из кеша без вызова модели
 
 # Лимиты
 CONTEXT_LIMIT = 100  # Количество строк контекста для RAG
@@ -37,6 +39,8 @@ def main() -> None:
         context_limit=CONTEXT_LIMIT,
         report_msg_limit=REPORT_MSG_LIMIT,
         report_time_limit=REPORT_TIME_LIMIT,
+        warm_up_enabled=ENABLE_WARM_UP,
+        response_cache_enabled=ENABLE_RESPONSE_CACHE,
         help_command=None,
     )
 
@@ -0,0 +1,58 @@
+"""Микробенчмарк постобработки ответов ИИ.
+
+Сравнивает старую реализацию (re.sub на каждый вызов и str.replace
+на каждый эмодзи) с TextPostprocessor при росте числа эмодзи.
+
+Запуск: python -m tests.bench_postprocess
+"""
+
+import re
+import timeit
+from functools import partial
+
+from app.tools.postprocess import TextPostprocessor
+from app.tools.prompt import Emoji
+
+SIZES = (7, 50, 100, 200, 500)
+REPEATS = 200
+
+
+def legacy_render(text: str, mapping: dict[str, str]) -> str:
+    """Старая реализация clean_text + replace_emojis."""
+    text = re.sub(r"(\*\*|\*|###|##|#)", "", text)
+    for text_emoji, discord_emoji in mapping.items():
+        text = text.replace(text_emoji, discord_emoji)
+    return text
+
+
+def make_emojis(count: int) -> list[Emoji]:
+    """Создает синтетический набор эмодзи."""
+    return [Emoji(f"emoji{i}", str(10**17 + i), "описание") for i in range(count)]
+
+
+def make_reply(emojis: list[Emoji]) -> str:
+    """Создает типичный ответ ИИ (~1500 символов) с markdown и несколькими эмодзи."""
+    sentence = "**Ну** ты и ### выдал, братан, это вообще за гранью понимания. "
+    tags = " ".join(e.tag for e in emojis[:: max(1, len(emojis) // 5)])
+    return (sentence * 20) + tags
+
+
+def main() -> None:
+    """Печатает время на один ответ для каждого размера набора эмодзи."""
+    print(f"{'эмодзи':>8} {'старый, мкс':>12} {'новый, мкс':>12} {'ускорение':>10}")
+    for size in SIZES:
+        emojis = make_emojis(size)
+        mapping = {e.tag: e.full_code for e in emojis}
+        postprocessor = TextPostprocessor(emojis)
+        reply = make_reply(emojis)
+        assert postprocessor.render(reply) == legacy_render(reply, mapping)
+
+        legacy = timeit.timeit(partial(legacy_render, reply, mapping), number=REPEATS)
+        compiled = timeit.timeit(partial(postprocessor.render, reply), number=REPEATS)
+        legacy_us = legacy / REPEATS * 1e6
+        compiled_us = compiled / REPEATS * 1e6
+        print(f"{size:>8} {legacy_us:>12.1f} {compiled_us:>12.1f} {legacy_us / compiled_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Микробенчмарк разбора лент YouTube.
+
+Сравнивает feedparser.parse с YouTubeFeedParser на записанных лентах
+из tests/fixtures: полный разбор и разбор до первого известного видео.
+
+Запуск: python -m tests.bench_youtube_feed
+"""
+
+import timeit
+from functools import partial
+from pathlib import Path
+
+import feedparser
+
+from app.services.youtube_feed import parse_feed
+
+FIXTURES = Path(__file__).parent / "fixtures"
+REPEATS = 200
+
+
+def main() -> None:
+    """Печатает время разбора одной ленты для каждого фикстурного файла."""
+    print(f"{'лента':>20} {'feedparser, мкс':>16} {'полный, мкс':>12} {'до известного, мкс':>19}")
+    for path in sorted(FIXTURES.glob("youtube_*.xml")):
+        data = path.read_bytes()
+        entries = parse_feed(data)
+        reference = feedparser.parse(data).entries
+        assert [e.video_id for e in entries] == [e.yt_videoid for e in reference]
+        # Типичный опрос: с прошлого раза вышло одно новое видео
+        known = {entries[1].video_id}
+
+        legacy = timeit.timeit(partial(feedparser.parse, data), number=REPEATS)
+        full = timeit.timeit(partial(parse_feed, data), number=REPEATS)
+        early = timeit.timeit(partial(parse_feed, data, known), number=REPEATS)
+        print(
+            f"{path.stem:>20} {legacy / REPEATS * 1e6:>16.1f} "
+            f"{full / REPEATS * 1e6:>12.1f} {early / REPEATS * 1e6:>19.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
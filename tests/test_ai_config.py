@@ -1,11 +1,17 @@
 """Unit-тесты для app/core/ai_config.py."""
 
+import asyncio
+from collections import deque
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from openai import AsyncOpenAI
 
 from app.core import ai_config
 from app.core.ai_config import (
     PROVIDERS,
+    LLMScheduler,
+    Priority,
     get_active_provider,
     get_available_providers,
     get_client,
@@ -181,3 +187,87 @@ class TestGetMiniModel:
         """Можно переопределить через переменную окружения."""
         monkeypatch.setenv("AI_MODEL_MINI", "gpt-3.5-turbo")
         assert ai_config.get_mini_model() == "gpt-3.5-turbo"
+
+
+# ── LLMScheduler ────────────────────────────────────────────────
+
+
+class TestLLMScheduler:
+    """Тесты планировщика запросов к модели."""
+
+    async def test_priority_order(self) -> None:
+        """Освободившееся место получает самый приоритетный из ожидающих."""
+        scheduler = LLMScheduler(max_concurrent=1)
+        order: list[Priority] = []
+
+        async def request(priority: Priority) -> None:
+            async with scheduler.slot(priority):
+                order.append(priority)
+                await asyncio.sleep(0)
+
+        async with scheduler.slot(Priority.BATCH):
+            tasks = [
+                asyncio.create_task(request(p))
+                for p in (Priority.BATCH, Priority.TOOL_ROUTING, Priority.INTERACTIVE)
+            ]
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+        assert order == [Priority.INTERACTIVE, Priority.TOOL_ROUTING, Priority.BATCH]
+
+    async def test_class_limit_leaves_room(self) -> None:
+        """Пачка фоновых запросов не занимает места интерактивных."""
+        scheduler = LLMScheduler(
+            max_concurrent=3,
+            limits={Priority.INTERACTIVE: 3, Priority.TOOL_ROUTING: 3, Priority.BATCH: 1},
+        )
+        release = asyncio.Event()
+
+        async def batch() -> None:
+            async with scheduler.slot(Priority.BATCH):
+                await release.wait()
+
+        tasks = [asyncio.create_task(batch()) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert scheduler.active[Priority.BATCH] == 1
+        assert len(scheduler.waiters[Priority.BATCH]) == 4
+
+        async with scheduler.slot(Priority.INTERACTIVE):
+            assert scheduler.running == 2
+
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        stats = scheduler.stats()
+        assert stats["batch"]["requests"] == 5
+        assert stats["batch"]["max_wait"] > 0
+        assert stats["interactive"]["requests"] == 1
+        assert scheduler.running == 0
+
+    async def test_cancelled_waiter_frees_queue(self) -> None:
+        """Отмененный в очереди запрос не держит место и не блокирует остальных."""
+        scheduler = LLMScheduler(max_concurrent=1)
+
+        async with scheduler.slot(Priority.INTERACTIVE):
+            waiting = asyncio.create_task(scheduler.slot(Priority.INTERACTIVE).__aenter__())
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+
+        async with scheduler.slot(Priority.BATCH):
+            assert scheduler.running == 1
+        assert scheduler.waiters[Priority.INTERACTIVE] == deque()
+
+    async def test_create_uses_active_client(self) -> None:
+        """create() передает параметры в chat.completions.create активного клиента."""
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value="ответ")
+        scheduler = LLMScheduler()
+
+        with patch("app.core.ai_config.get_client", return_value=client):
+            result = await scheduler.create(Priority.TOOL_ROUTING, model="m", messages=[])
+
+        assert result == "ответ"
+        client.chat.completions.create.assert_awaited_once_with(model="m", messages=[])
+        assert scheduler.stats()["tool_routing"]["requests"] == 1
@@ -0,0 +1,65 @@
+"""Unit-тесты для app/core/bot.py."""
+
+from unittest.mock import MagicMock
+
+import discord
+
+from app.core.bot import CLASSIFICATION_CACHE_SIZE, DisBot, classify_message
+
+
+def _make_message(message_id: int, content: str) -> MagicMock:
+    """Создает мок сообщения Discord."""
+    message = MagicMock(spec=discord.Message)
+    message.id = message_id
+    message.content = content
+    message.attachments = []
+    return message
+
+
+class TestClassifyMessage:
+    """Тесты для функции classify_message."""
+
+    def test_command(self) -> None:
+        """Сообщение с префиксом — команда, ссылки не проверяются."""
+        info = classify_message("!https://example.com", "!")
+        assert info.is_command is True
+        assert info.only_urls is False
+
+    def test_only_urls(self) -> None:
+        """Сообщение только из ссылок."""
+        info = classify_message("https://a.com www.b.com", "!")
+        assert info.only_urls is True
+        assert info.is_empty is False
+
+    def test_empty(self) -> None:
+        """Сообщение из пробелов — пустое."""
+        info = classify_message("   ", "!", has_attachments=True)
+        assert info.is_empty is True
+        assert info.only_urls is False
+        assert info.has_attachments is True
+
+    def test_too_long(self) -> None:
+        """Длина больше лимита."""
+        info = classify_message("а" * 1001, "!")
+        assert info.too_long is True
+        assert info.length == 1001
+
+
+class TestDisBotClassify:
+    """Тесты для DisBot.classify."""
+
+    def test_cached_per_message_id(self) -> None:
+        """Повторный вызов для того же сообщения не пересчитывает классификацию."""
+        bot = DisBot(command_prefix="!", intents=discord.Intents.default())
+        message = _make_message(1, "привет")
+        info = bot.classify(message)
+        message.content = "!команда"
+        assert bot.classify(message) is info
+
+    def test_cache_is_bounded(self) -> None:
+        """Кеш не растет больше CLASSIFICATION_CACHE_SIZE."""
+        bot = DisBot(command_prefix="!", intents=discord.Intents.default())
+        for i in range(CLASSIFICATION_CACHE_SIZE + 10):
+            bot.classify(_make_message(i, "текст"))
+        assert len(bot._classified) == CLASSIFICATION_CACHE_SIZE
+        assert 0 not in bot._classified
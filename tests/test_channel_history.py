@@ -0,0 +1,167 @@
+"""Тесты для app/services/channel_history.py."""
+
+from collections.abc import AsyncIterator
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.cogs.toxic import Toxic
+from app.core.bot import DisBot
+from app.services.channel_history import CONTENT_LIMIT, ChannelHistory
+
+CHANNEL_ID = 10
+BOT_ID = 999
+
+
+def _message(
+    message_id: int, content: str = "текст", author_id: int = 1, **flags: bool
+) -> SimpleNamespace:
+    """Сообщение Discord с полями, которые читает буфер."""
+    return SimpleNamespace(
+        id=message_id,
+        channel=SimpleNamespace(id=CHANNEL_ID),
+        author=SimpleNamespace(id=author_id, name=f"user{author_id}"),
+        content=content,
+        attachments=[object()] if flags.get("attachment") else [],
+        stickers=[object()] if flags.get("sticker") else [],
+    )
+
+
+class FakeChannel:
+    """Канал с REST-историей и счетчиком запросов к ней."""
+
+    def __init__(self, messages: list[SimpleNamespace]) -> None:
+        """Сохраняет историю канала от старых сообщений к новым."""
+        self.id = CHANNEL_ID
+        self.messages = messages
+        self.history_calls = 0
+
+    async def history(self, limit: int) -> AsyncIterator[SimpleNamespace]:
+        """Отдает сообщения от новых к старым, как channel.history."""
+        self.history_calls += 1
+        for message in list(reversed(self.messages))[:limit]:
+            yield message
+
+
+class TestChannelHistory:
+    """Тесты кольцевого буфера сообщений."""
+
+    async def test_warm_channel_served_from_memory(self) -> None:
+        """Если в буфере достаточно сообщений, REST не вызывается."""
+        history = ChannelHistory()
+        channel = FakeChannel([])
+        for i in range(30):
+            history.add(_message(i))
+
+        recent = await history.recent(channel, 20)
+
+        assert channel.history_calls == 0
+        assert [m.message_id for m in recent] == list(range(29, 9, -1))
+
+    async def test_cold_channel_backfilled_once(self) -> None:
+        """Холодный канал один раз подгружается через REST и объединяется с буфером."""
+        history = ChannelHistory()
+        channel = FakeChannel([_message(i) for i in range(50)])
+        history.add(_message(50))
+
+        first = await history.recent(channel, 40)
+        history.add(_message(51))
+        second = await history.recent(channel, 40)
+
+        assert channel.history_calls == 1
+        assert [m.message_id for m in first] == list(range(50, 10, -1))
+        assert [m.message_id for m in second] == list(range(51, 11, -1))
+
+    async def test_short_channel_not_refetched(self) -> None:
+        """Короткий канал после подгрузки не запрашивается повторно."""
+        history = ChannelHistory()
+        channel = FakeChannel([_message(i) for i in range(5)])
+
+        await history.recent(channel, 20)
+        recent = await history.recent(channel, 20)
+
+        assert channel.history_calls == 1
+        assert len(recent) == 5
+
+    async def test_bounded(self) -> None:
+        """Буфер канала и число каналов ограничены."""
+        history = ChannelHistory(maxlen=10, max_channels=2)
+        for i in range(25):
+            history.add(_message(i))
+        for channel_id in (11, 12):
+            message = _message(100)
+            message.channel = SimpleNamespace(id=channel_id)
+            history.add(message)
+
+        assert list(history.channels) == [11, 12]
+        history.add(_message(26))
+        assert len(history.channels[CHANNEL_ID]) == 1
+
+    def test_edit_and_delete(self) -> None:
+        """Правки и удаления из gateway отражаются в буфере."""
+        history = ChannelHistory()
+        history.add(_message(1))
+        history.add(_message(2))
+
+        history.edit(CHANNEL_ID, 1, "исправлено" * 100)
+        history.remove(CHANNEL_ID, 2)
+
+        [entry] = history.channels[CHANNEL_ID]
+        assert entry.content == ("исправлено" * 100)[:CONTENT_LIMIT]
+
+    async def test_bulk_delete(self) -> None:
+        """Массово удаленные сообщения убираются из буфера и не попадают в !toxic."""
+        history = ChannelHistory()
+        for message_id in range(1, 6):
+            history.add(_message(message_id))
+        bot = SimpleNamespace(channel_history=history)
+        payload = SimpleNamespace(channel_id=CHANNEL_ID, message_ids={2, 3, 5, 42})
+
+        await DisBot.on_raw_bulk_message_delete(bot, payload)
+
+        assert [entry.message_id for entry in history.channels[CHANNEL_ID]] == [1, 4]
+
+    def test_flags(self) -> None:
+        """Флаги вложений и стикеров сохраняются."""
+        history = ChannelHistory()
+        history.add(_message(1, "", attachment=True))
+        history.add(_message(2, "", sticker=True))
+
+        first, second = history.channels[CHANNEL_ID]
+        assert (first.has_attachments, first.has_stickers) == (True, False)
+        assert (second.has_attachments, second.has_stickers) == (False, True)
+
+
+class TestToxicUsesBuffer:
+    """Тесты !toxic поверх буфера сообщений."""
+
+    async def test_roast_without_rest(self) -> None:
+        """Прожарка берет сообщения из буфера и отфильтровывает команды и бота."""
+        bot = MagicMock()
+        bot.user.id = BOT_ID
+        bot.command_prefix = "!"
+        bot.channel_history = ChannelHistory()
+        channel = FakeChannel([])
+        for i in range(40):
+            bot.channel_history.add(_message(i, f"сообщение {i}"))
+        bot.channel_history.add(_message(40, "ответ бота", author_id=BOT_ID))
+        bot.channel_history.add(_message(41, "", attachment=True))
+        bot.channel_history.add(_message(42, "!toxic 5"))
+
+        ctx = MagicMock(channel=channel, prefix="!")
+        ctx.send = AsyncMock()
+        completion = MagicMock()
+        completion.choices = [MagicMock()]
+        completion.choices[0].message.content = "прожарка"
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=completion)
+
+        with patch("app.core.ai_config.get_client", return_value=client):
+            await Toxic.roast_command.callback(Toxic(bot), ctx, "5")
+
+        assert channel.history_calls == 0
+        user_content = client.chat.completions.create.await_args.kwargs["messages"][1]["content"]
+        assert "[user1]: [Пользователь скинул картинку/файл]" in user_content
+        assert "[user1]: сообщение 39" in user_content
+        assert "[user1]: сообщение 35" not in user_content
+        assert "ответ бота" not in user_content
+        assert "!toxic" not in user_content
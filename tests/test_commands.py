@@ -270,6 +270,24 @@ async def test_ai_provider_invalid(
     assert "не найден" in mock_ctx.send.call_args[0][0]
 
 
+# ── ai_stats_command ────────────────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_ai_stats(admin_cog: Admin, mock_ctx: AsyncMock) -> None:
+    """!ai_stats показывает счетчики объединения запросов, кеша и очереди."""
+    with patch(
+        "app.cogs.admin.request_coalescer.stats",
+        return_value={"requests": 5, "coalesced": 4, "coalescing_rate": 0.8, "in_flight": 0},
+    ):
+        await admin_cog.ai_stats_command.callback(admin_cog, mock_ctx)
+
+    text = mock_ctx.send.call_args[0][0]
+    assert "**Объединение запросов**: requests=5, coalesced=4, coalescing_rate=0.8" in text
+    assert "**Кеш ответов**: exact_hits=" in text
+    assert "**Очередь (interactive)**: requests=" in text
+
+
 # ── youtube_commands ────────────────────────────────────────────
 
 
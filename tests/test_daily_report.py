@@ -1,11 +1,22 @@
 """Unit-тесты для app/services/daily_report.py."""
 
 import asyncio
+import time
+from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.services.daily_report import ChannelState, ReportGenerator
+from app.services.daily_report import (
+    MAX_CONCURRENT_REPORTS,
+    ChannelState,
+    DeadlineScheduler,
+    ReportGenerator,
+    link_message_ids,
+    split_by_tokens,
+)
+from app.tools.prompt import REPORT_CHUNK_PROMPT, REPORT_MERGE_PROMPT, UPDATED_REPORT_PROMPT
+from app.tools.utils import count_tokens
 
 
 class TestReportGeneratorGetState:
@@ -52,10 +63,12 @@ class TestReportGeneratorAddMessage:
     """Тесты метода add_message."""
 
     @pytest.mark.asyncio
-    @patch("app.services.daily_report.get_channel_messages", new_callable=AsyncMock, return_value=[])
+    @patch(
+        "app.services.daily_report.count_channel_messages", new_callable=AsyncMock, return_value=0
+    )
     @patch("app.services.daily_report.save_channel_message", new_callable=AsyncMock)
     async def test_initializes_channel_state(
-        self, mock_save: AsyncMock, mock_get: AsyncMock
+        self, mock_save: AsyncMock, mock_count: AsyncMock
     ) -> None:
         """Первое сообщение инициализирует состояние канала."""
         bot = MagicMock()
@@ -70,9 +83,11 @@ class TestReportGeneratorAddMessage:
         assert state.messages[0]["author"] == "user1"
 
     @pytest.mark.asyncio
-    @patch("app.services.daily_report.get_channel_messages", new_callable=AsyncMock, return_value=[])
+    @patch(
+        "app.services.daily_report.count_channel_messages", new_callable=AsyncMock, return_value=0
+    )
     @patch("app.services.daily_report.save_channel_message", new_callable=AsyncMock)
-    async def test_accumulates_messages(self, mock_save: AsyncMock, mock_get: AsyncMock) -> None:
+    async def test_accumulates_messages(self, mock_save: AsyncMock, mock_count: AsyncMock) -> None:
         """Несколько сообщений накапливаются."""
         bot = MagicMock()
         bot.report_msg_limit = 15
@@ -83,10 +98,12 @@ class TestReportGeneratorAddMessage:
         assert len(rg.channels[100].messages) == 2
 
     @pytest.mark.asyncio
-    @patch("app.services.daily_report.get_channel_messages", new_callable=AsyncMock, return_value=[])
+    @patch(
+        "app.services.daily_report.count_channel_messages", new_callable=AsyncMock, return_value=0
+    )
     @patch("app.services.daily_report.save_channel_message", new_callable=AsyncMock)
     async def test_calls_save_channel_message(
-        self, mock_save: AsyncMock, mock_get: AsyncMock
+        self, mock_save: AsyncMock, mock_count: AsyncMock
     ) -> None:
         """Вызывает save_channel_message для сохранения в БД."""
         bot = MagicMock()
@@ -95,3 +112,362 @@ class TestReportGeneratorAddMessage:
         await rg.add_message(100, "привет", "user1", 42)
 
         mock_save.assert_called_once_with(100, 42, "user1", "привет")
+
+
+def _db_message(message_id: int, author: str = "user", content: str = "сообщение") -> MagicMock:
+    """Создает запись ChannelMessage."""
+    return MagicMock(message_id=message_id, author=author, content=content)
+
+
+class TestSplitByTokens:
+    """Тесты разбиения строк на фрагменты по токенам."""
+
+    @patch("app.services.daily_report.count_tokens", side_effect=len)
+    def test_respects_budget(self, _: MagicMock) -> None:
+        """Фрагменты не превышают бюджет и сохраняют порядок строк."""
+        lines = ["aaaa", "bbbb", "cc", "dddddd", "e"]
+        chunks = split_by_tokens(lines, 8)
+        assert chunks == [["aaaa", "bbbb"], ["cc", "dddddd"], ["e"]]
+
+    @patch("app.services.daily_report.count_tokens", side_effect=len)
+    def test_oversized_line_alone(self, _: MagicMock) -> None:
+        """Строка длиннее бюджета образует отдельный фрагмент."""
+        assert split_by_tokens(["a", "x" * 20, "b"], 8) == [["a"], ["x" * 20], ["b"]]
+
+
+class TestReportSummaries:
+    """Тесты map-reduce сводок для отчета."""
+
+    @pytest.mark.asyncio
+    async def test_small_channel_single_prompt(self) -> None:
+        """Небольшой канал обрабатывается одним запросом с исходным промптом."""
+        rg = ReportGenerator(bot=MagicMock())
+        messages = [_db_message(i) for i in range(1, 6)]
+
+        with patch.object(rg, "_complete", new=AsyncMock(return_value="- тема [ID:1]")) as complete:
+            report = await rg.build_report(ChannelState(), messages)
+
+        assert report == "- тема [ID:1]"
+        complete.assert_awaited_once()
+        system_prompt, user_content = complete.await_args.args
+        assert system_prompt == UPDATED_REPORT_PROMPT
+        assert "[ID:5] user: сообщение" in user_content
+
+    @pytest.mark.asyncio
+    @patch("app.services.daily_report.REPORT_CHUNK_TOKENS", 30)
+    async def test_large_channel_map_reduce(self) -> None:
+        """Большой канал сворачивается по фрагментам, затем сводки объединяются."""
+        rg = ReportGenerator(bot=MagicMock())
+        messages = [_db_message(i, content="длинное сообщение " * 3) for i in range(1, 21)]
+
+        async def fake_complete(system_prompt: str, user_content: str) -> str:
+            return "итог" if system_prompt == REPORT_MERGE_PROMPT else "- тема [ID:1]"
+
+        with patch.object(rg, "_complete", side_effect=fake_complete) as complete:
+            report = await rg.build_report(ChannelState(), messages)
+
+        assert report == "итог"
+        prompts = [call.args[0] for call in complete.await_args_list]
+        assert prompts.count(REPORT_MERGE_PROMPT) == 1
+        assert prompts.count(REPORT_CHUNK_PROMPT) > 1
+        for call in complete.await_args_list:
+            if call.args[0] == REPORT_CHUNK_PROMPT:
+                assert count_tokens(call.args[1]) <= 30 + 5
+
+    @pytest.mark.asyncio
+    async def test_report_uses_rolling_summaries(self) -> None:
+        """Уже свернутые сообщения не отправляются повторно, используются их сводки."""
+        rg = ReportGenerator(bot=MagicMock())
+        state = ChannelState(summaries=["- игры [ID:1]"], summarized_until=10)
+        messages = [_db_message(i) for i in range(1, 13)]
+
+        with patch.object(rg, "_complete", new=AsyncMock(return_value="ok")) as complete:
+            await rg.build_report(state, messages)
+
+        chunk_call, merge_call = complete.await_args_list
+        assert chunk_call.args[0] == REPORT_CHUNK_PROMPT
+        assert "[ID:10]" not in chunk_call.args[1]
+        assert "[ID:11]" in chunk_call.args[1]
+        assert merge_call.args[0] == REPORT_MERGE_PROMPT
+        assert "- игры [ID:1]" in merge_call.args[1]
+
+    @pytest.mark.asyncio
+    @patch("app.services.daily_report.REPORT_CHUNK_TOKENS", 40)
+    @patch("app.services.daily_report.count_tokens", return_value=10)
+    @patch(
+        "app.services.daily_report.count_channel_messages", new_callable=AsyncMock, return_value=0
+    )
+    @patch("app.services.daily_report.save_channel_message", new_callable=AsyncMock)
+    async def test_add_message_summarizes_full_chunks(
+        self, mock_save: AsyncMock, mock_count: AsyncMock, _: MagicMock
+    ) -> None:
+        """При накоплении бюджета сообщений строится промежуточная сводка."""
+        bot = MagicMock()
+        bot.report_msg_limit = 1000
+        rg = ReportGenerator(bot=bot)
+
+        with patch.object(rg, "summarize_chunk", new=AsyncMock(return_value="- тема")) as summ:
+            for i in range(1, 16):
+                await rg.add_message(100, "обсуждаем новую игру", "user", i)
+            await rg.channels[100].summary_task
+
+        # По 10 токенов на строку: три полных фрагмента по 4 сообщения, хвост из 3 ждет
+        state = rg.channels[100]
+        assert summ.await_count == 3
+        assert state.summaries == ["- тема"] * 3
+        assert state.summarized_until == 12
+        assert state.pending_tokens == 30
+
+
+class TestDeadlineScheduler:
+    """Тесты планировщика дедлайнов."""
+
+    @pytest.mark.asyncio
+    async def test_fires_once_after_bumps(self) -> None:
+        """Перенос дедлайна откладывает срабатывание, обработчик вызывается один раз."""
+        callback = AsyncMock()
+        scheduler = DeadlineScheduler(callback)
+
+        for _ in range(100):
+            scheduler.schedule(1, 0.1)
+        await asyncio.sleep(0.05)
+        scheduler.schedule(1, 0.1)
+        await asyncio.sleep(0.07)
+        callback.assert_not_awaited()
+
+        await asyncio.sleep(0.1)
+        callback.assert_awaited_once_with(1)
+        assert scheduler.deadlines == {}
+        await scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_earlier_deadline_wakes_scheduler(self) -> None:
+        """Более ранний дедлайн срабатывает раньше уже запланированных."""
+        fired: list[int] = []
+
+        async def callback(key: int) -> None:
+            fired.append(key)
+
+        scheduler = DeadlineScheduler(callback)
+        scheduler.schedule(1, 10)
+        scheduler.schedule(2, 0.01)
+        await asyncio.sleep(0.05)
+
+        assert fired == [2]
+        assert list(scheduler.deadlines) == [1]
+        await scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_many_channels_single_task(self) -> None:
+        """Тысячи каналов обслуживаются одной задачей, куча не растет без предела."""
+        callback = AsyncMock()
+        scheduler = DeadlineScheduler(callback)
+        tasks_before = len(asyncio.all_tasks())
+
+        for _ in range(5):
+            for key in range(2000):
+                scheduler.schedule(key, 0.05)
+
+        assert len(asyncio.all_tasks()) == tasks_before + 1
+        assert len(scheduler._heap) <= 2 * len(scheduler.deadlines) + 64
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if callback.await_count == 2000:
+                break
+        assert callback.await_count == 2000
+        await scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_cancel(self) -> None:
+        """Снятый дедлайн не срабатывает."""
+        callback = AsyncMock()
+        scheduler = DeadlineScheduler(callback)
+        scheduler.schedule(1, 0.01)
+        scheduler.cancel(1)
+        await asyncio.sleep(0.03)
+        callback.assert_not_awaited()
+        await scheduler.close()
+
+
+class TestQuietPeriod:
+    """Тесты обработки периода тишины."""
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.daily_report.count_channel_messages", new_callable=AsyncMock, return_value=0
+    )
+    @patch("app.services.daily_report.save_channel_message", new_callable=AsyncMock)
+    async def test_threshold_schedules_deadline(
+        self, mock_save: AsyncMock, mock_count: AsyncMock
+    ) -> None:
+        """После достижения порога каждое сообщение переносит дедлайн канала."""
+        bot = MagicMock()
+        bot.report_msg_limit = 2
+        bot.report_time_limit = 60
+        rg = ReportGenerator(bot=bot)
+
+        await rg.add_message(100, "a", "user", 1)
+        assert 100 not in rg.deadlines.deadlines
+        await rg.add_message(100, "b", "user", 2)
+        first = rg.deadlines.deadlines[100]
+        await rg.add_message(100, "c", "user", 3)
+
+        assert rg.deadlines.deadlines[100] >= first
+        await rg.deadlines.close()
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.daily_report.count_channel_messages", new_callable=AsyncMock, return_value=5
+    )
+    @patch("app.services.daily_report.save_channel_message", new_callable=AsyncMock)
+    async def test_db_count_schedules_deadline(
+        self, mock_save: AsyncMock, mock_count: AsyncMock
+    ) -> None:
+        """Порог учитывает сообщения в базе, сохраненные до перезапуска."""
+        bot = MagicMock()
+        bot.report_msg_limit = 5
+        bot.report_time_limit = 60
+        rg = ReportGenerator(bot=bot)
+
+        await rg.add_message(100, "a", "user", 1)
+
+        mock_count.assert_awaited_once_with(100)
+        assert 100 in rg.deadlines.deadlines
+        await rg.deadlines.close()
+
+    @pytest.mark.asyncio
+    async def test_not_quiet_yet_reschedules(self) -> None:
+        """Если тишина еще не наступила, дедлайн переносится на остаток периода."""
+        bot = MagicMock()
+        bot.report_time_limit = 60
+        rg = ReportGenerator(bot=bot)
+        rg.get_state(100)
+
+        with patch.object(rg, "generate_and_send_report", new=AsyncMock()) as generate:
+            await rg.on_quiet_period(100)
+
+        generate.assert_not_awaited()
+        assert 100 in rg.deadlines.deadlines
+        await rg.deadlines.close()
+
+
+class TestRecover:
+    """Тесты восстановления состояния отчетов после перезапуска."""
+
+    @staticmethod
+    def _bot() -> MagicMock:
+        bot = MagicMock()
+        bot.report_msg_limit = 15
+        bot.report_time_limit = 60
+        return bot
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_deadlines(self) -> None:
+        """Просроченные каналы получают немедленный дедлайн, остальные — остаток тишины."""
+        now = datetime.now()
+        stats = [
+            (1, 20, now - timedelta(hours=2)),
+            (2, 20, now - timedelta(minutes=10)),
+            (3, 5, now - timedelta(hours=2)),
+        ]
+        rg = ReportGenerator(bot=self._bot())
+
+        with (
+            patch(
+                "app.services.daily_report.get_channel_message_stats",
+                new=AsyncMock(return_value=stats),
+            ),
+            patch.object(rg, "generate_and_send_report", new=AsyncMock()) as generate,
+        ):
+            assert await rg.recover() == 2
+            remaining = rg.deadlines.deadlines[2] - time.monotonic()
+            await asyncio.sleep(0.02)
+
+        generate.assert_awaited_once_with(1)
+        assert 49 * 60 < remaining <= 50 * 60
+        assert 3 not in rg.channels
+        await rg.deadlines.close()
+
+    @pytest.mark.asyncio
+    async def test_overdue_reports_bounded(self) -> None:
+        """Просроченные отчеты генерируются не более MAX_CONCURRENT_REPORTS одновременно."""
+        overdue = datetime.now() - timedelta(hours=3)
+        stats = [(channel_id, 30, overdue) for channel_id in range(20)]
+        rg = ReportGenerator(bot=self._bot())
+        running = 0
+        peak = 0
+
+        async def slow_report(channel_id: int) -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        with (
+            patch(
+                "app.services.daily_report.get_channel_message_stats",
+                new=AsyncMock(return_value=stats),
+            ),
+            patch.object(rg, "generate_and_send_report", side_effect=slow_report) as generate,
+        ):
+            await rg.recover()
+            await asyncio.sleep(0.01)
+            await rg.deadlines.close()
+
+        assert generate.await_count == 20
+        assert peak == MAX_CONCURRENT_REPORTS
+
+    @pytest.mark.asyncio
+    async def test_db_error(self) -> None:
+        """Ошибка базы не прерывает запуск бота."""
+        rg = ReportGenerator(bot=self._bot())
+        with patch(
+            "app.services.daily_report.get_channel_message_stats",
+            new=AsyncMock(side_effect=Exception("db down")),
+        ):
+            assert await rg.recover() == 0
+
+
+class TestReportLinks:
+    """Тесты подстановки ссылок и отправки отчета."""
+
+    def test_link_message_ids(self) -> None:
+        """Известные метки заменяются ссылками, неизвестные остаются как есть."""
+        report = "- тема [ID:1], [ID:2]\n- другое [ID:99]"
+        links = {"1": "https://l/1", "2": "https://l/2"}
+
+        assert link_message_ids(report, links) == (
+            "- тема [ссылка](https://l/1), [ссылка](https://l/2)\n- другое [ID:99]"
+        )
+
+    @pytest.mark.asyncio
+    async def test_large_report_linked_and_chunked(self) -> None:
+        """Отчет по 5000 сообщениям получает все ссылки и отправляется частями."""
+        messages = [_db_message(1_000_000 + i) for i in range(5000)]
+        report = "\n".join(f"- тема {i} [ID:{1_000_000 + i * 10}]" for i in range(500))
+        channel = MagicMock()
+        channel.guild.id = 7
+        channel.send = AsyncMock()
+        bot = MagicMock()
+        bot.report_msg_limit = 15
+        bot.get_channel.return_value = channel
+        rg = ReportGenerator(bot=bot)
+
+        with (
+            patch(
+                "app.services.daily_report.get_channel_messages",
+                new=AsyncMock(return_value=messages),
+            ),
+            patch("app.services.daily_report.delete_channel_messages", new=AsyncMock()),
+            patch.object(rg, "build_report", new=AsyncMock(return_value=report)),
+        ):
+            await rg.generate_and_send_report(42)
+
+        parts = [call.args[0] for call in channel.send.await_args_list]
+        sent = "\n".join(parts)
+        assert len(parts) > 1
+        assert all(len(part) <= 2000 for part in parts)
+        assert "[ID:" not in sent
+        assert sent.count("https://discord.com/channels/7/42/") == 500
+        assert "https://discord.com/channels/7/42/1004990)" in sent
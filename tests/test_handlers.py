@@ -1,10 +1,22 @@
 """Unit-тесты для app/core/handlers.py."""
 
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import anyio
 import pytest
 
-from app.core.handlers import ai_generate_birthday_congrats, clear_server_history
+from app.core.handlers import (
+    MCPServer,
+    ai_generate,
+    ai_generate_birthday_congrats,
+    build_chat_messages,
+    check_tool_intent,
+    clear_server_history,
+)
+from app.services.response_cache import ResponseCache
+from app.tools.prompt import STABLE_SYSTEM_PROMPT
+from app.tools.tokens import PromptCacheStats
 
 # ── ai_generate_birthday_congrats ───────────────────────────────
 
@@ -13,7 +25,7 @@ class TestAiGenerateBirthdayCongrats:
     """Тесты для функции ai_generate_birthday_congrats."""
 
     @pytest.mark.asyncio
-    @patch("app.core.handlers.get_client")
+    @patch("app.core.ai_config.get_client")
     async def test_returns_generated_text(self, mock_get_client: MagicMock) -> None:
         """Возвращает сгенерированный текст при успешном вызове API."""
         mock_client = MagicMock()
@@ -28,7 +40,7 @@ class TestAiGenerateBirthdayCongrats:
         assert "Арби" in result
 
     @pytest.mark.asyncio
-    @patch("app.core.handlers.get_client")
+    @patch("app.core.ai_config.get_client")
     async def test_fallback_on_error(self, mock_get_client: MagicMock) -> None:
         """При ошибке API возвращает fallback-поздравление."""
         mock_client = MagicMock()
@@ -100,3 +112,228 @@ class TestClearServerHistory:
 
         result = await clear_server_history(12345)
         assert "ошибка" in result.lower()
+
+
+# ── MCPServer ───────────────────────────────────────────────────
+
+
+class TestMCPServer:
+    """Тесты долгоживущего подключения к MCP-серверу."""
+
+    @pytest.mark.asyncio
+    async def test_session_reused_between_calls(self) -> None:
+        """Процесс сервера запускается один раз, и его кеш переживает вызовы."""
+        server = MCPServer("app.mcp.server_weather")
+        try:
+            session = await server.connect()
+            assert await server.connect() is session
+            # Служебный инструмент вызывается через сессию, но модели не передается
+            tool_names = {tool["function"]["name"] for tool in server.tools}
+            assert "get_current_weather" in tool_names
+            assert "get_weather_cache_stats" not in tool_names
+
+            result = await session.call_tool("get_weather_cache_stats", {})
+            assert "misses=0" in result.content[0].text
+        finally:
+            await server.close()
+
+        assert server.session is None
+
+    @pytest.mark.asyncio
+    async def test_reconnects_after_close(self) -> None:
+        """После остановки следующий запрос запускает сервер заново."""
+        server = MCPServer("app.mcp.server_weather")
+        try:
+            first = await server.connect()
+            await server.close()
+            assert await server.connect() is not first
+        finally:
+            await server.close()
+
+
+class TestCheckToolIntent:
+    """Тесты перезапуска MCP-сервера при ошибках проверки намерения."""
+
+    @staticmethod
+    def _server() -> MagicMock:
+        server = MagicMock(spec=MCPServer)
+        server.connect = AsyncMock()
+        server.close = AsyncMock()
+        server.tools = []
+        server.running = True
+        return server
+
+    @pytest.mark.asyncio
+    async def test_llm_error_keeps_session(self) -> None:
+        """Ошибка модели пробрасывается, а процесс сервера не останавливается."""
+        server = self._server()
+        error = RuntimeError("429 Too Many Requests")
+
+        with (
+            patch("app.core.handlers.process_mcp_conversation", side_effect=error),
+            pytest.raises(RuntimeError),
+        ):
+            await check_tool_intent("погода", server, "prompt")
+
+        server.close.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_transport_error_restarts_server(self) -> None:
+        """Обрыв подключения останавливает сервер, чтобы следующий запрос запустил его."""
+        server = self._server()
+
+        with (
+            patch(
+                "app.core.handlers.process_mcp_conversation",
+                side_effect=anyio.ClosedResourceError(),
+            ),
+            pytest.raises(anyio.ClosedResourceError),
+        ):
+            await check_tool_intent("погода", server, "prompt")
+
+        server.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_finished_task_restarts_server(self) -> None:
+        """Если процесс сервера уже завершился, подключение закрывается при любой ошибке."""
+        server = self._server()
+        server.running = False
+
+        with (
+            patch("app.core.handlers.process_mcp_conversation", side_effect=RuntimeError()),
+            pytest.raises(RuntimeError),
+        ):
+            await check_tool_intent("погода", server, "prompt")
+
+        server.close.assert_awaited_once()
+
+
+# ── ai_generate: кеш ответов ───────────────────────────────────
+
+
+async def _embed(text: str) -> list[float]:
+    return [1.0, 0.0]
+
+
+class TestAiGenerateResponseCache:
+    """Тесты кеша ответов перед вызовом модели в ai_generate."""
+
+    @staticmethod
+    def _client() -> MagicMock:
+        completion = MagicMock()
+        completion.choices = [MagicMock()]
+        completion.choices[0].message.content = "Ответ модели"
+        completion.usage = SimpleNamespace(
+            prompt_tokens=1200, prompt_tokens_details=SimpleNamespace(cached_tokens=1024)
+        )
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=completion)
+        return client
+
+    @pytest.mark.asyncio
+    async def test_repeated_question_skips_completion(self) -> None:
+        """Повторный вопрос возвращается из кеша без вызова модели."""
+        client = self._client()
+        with (
+            patch("app.core.ai_config.get_client", return_value=client),
+            patch("app.core.handlers.llama_manager") as llama,
+            patch("app.core.handlers.response_cache", ResponseCache(_embed, enabled=True)),
+        ):
+            llama.query_relevant_context = AsyncMock(return_value=["контекст"])
+            llama.index_messages = AsyncMock()
+
+            first = await ai_generate("Как дела?", 1, "user", None, None)
+            second = await ai_generate("как дела", 1, "user", None, None)
+
+        assert first == second
+        client.chat.completions.create.assert_awaited_once()
+        llama.index_messages.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_tool_answers_bypass_cache(self) -> None:
+        """Ответы с данными инструментов не кешируются."""
+        client = self._client()
+        with (
+            patch("app.core.ai_config.get_client", return_value=client),
+            patch("app.core.handlers.llama_manager") as llama,
+            patch("app.core.handlers.response_cache", ResponseCache(_embed, enabled=True)),
+        ):
+            llama.query_relevant_context = AsyncMock(return_value=[])
+            llama.index_messages = AsyncMock()
+
+            await ai_generate("Погода в Москве", 1, "user", "+5°C", None)
+            await ai_generate("Погода в Москве", 1, "user", "+5°C", None)
+
+        assert client.chat.completions.create.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self) -> None:
+        """Выключенный кеш не используется."""
+        client = self._client()
+        with (
+            patch("app.core.ai_config.get_client", return_value=client),
+            patch("app.core.handlers.llama_manager") as llama,
+            patch("app.core.handlers.response_cache", ResponseCache(_embed)),
+        ):
+            llama.query_relevant_context = AsyncMock(return_value=[])
+            llama.index_messages = AsyncMock()
+
+            await ai_generate("Как дела?", 1, "user", None, None)
+            await ai_generate("Как дела?", 1, "user", None, None)
+
+        assert client.chat.completions.create.await_count == 2
+
+
+# ── build_chat_messages ─────────────────────────────────────────
+
+
+class TestBuildChatMessages:
+    """Тесты сборки сообщений со стабильным префиксом."""
+
+    def test_prefix_identical_for_all_users(self) -> None:
+        """Первое системное сообщение не зависит от пользователя, контекста и инструментов."""
+        first = build_chat_messages("atagaev", "привет", ["контекст"], "+5°C", None)
+        second = build_chat_messages("random_user", "как дела", [], None, "поиск")
+
+        assert first[0] == second[0] == {"role": "system", "content": STABLE_SYSTEM_PROMPT}
+        assert "Арби" in STABLE_SYSTEM_PROMPT
+        assert "{user_info}" not in STABLE_SYSTEM_PROMPT
+
+    def test_variable_parts_after_prefix(self) -> None:
+        """Собеседник, контекст и данные инструментов идут после префикса."""
+        messages = build_chat_messages("user", "привет", ["строка"], "+5°C", "найдено")
+
+        assert [m["role"] for m in messages] == ["system", "system", "user"]
+        variable = messages[1]["content"]
+        assert "user" in variable
+        assert "Релевантный контекст из истории сервера:\nстрока" in variable
+        assert "+5°C" in variable
+        assert "найдено" in variable
+        assert messages[2]["content"] == "[Пользователь: user] привет"
+
+    def test_user_neutral(self) -> None:
+        """Без имени сообщения не содержат сведений об авторе."""
+        bare = build_chat_messages(None, "привет", [], None, None)
+        with_context = build_chat_messages(None, "привет", ["строка"], None, None)
+
+        assert [m["role"] for m in bare] == ["system", "user"]
+        assert bare[1]["content"] == "привет"
+        assert "пользователь" not in with_context[1]["content"].casefold()
+        assert with_context[2]["content"] == "привет"
+
+    @pytest.mark.asyncio
+    async def test_cached_tokens_recorded(self) -> None:
+        """Количество токенов из кеша провайдера берется из поля usage."""
+        client = TestAiGenerateResponseCache._client()
+        stats = PromptCacheStats()
+        with (
+            patch("app.core.ai_config.get_client", return_value=client),
+            patch("app.core.handlers.llama_manager") as llama,
+            patch("app.core.handlers.prompt_cache_stats", stats),
+        ):
+            llama.query_relevant_context = AsyncMock(return_value=[])
+            llama.index_messages = AsyncMock()
+
+            await ai_generate("Как дела?", 1, "user", None, None)
+
+        assert (stats.requests, stats.prompt_tokens, stats.cached_tokens) == (1, 1200, 1024)
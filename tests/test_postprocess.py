@@ -0,0 +1,64 @@
+"""Unit-тесты для app/tools/postprocess.py."""
+
+from app.tools.postprocess import TextPostprocessor, postprocessor
+from app.tools.prompt import EMOJIS, Emoji
+
+
+def _legacy_render(text: str, emojis: list[Emoji]) -> str:
+    """Старая реализация: очистка markdown, затем str.replace по каждому эмодзи."""
+    for ch in "*#":
+        text = text.replace(ch, "")
+    for emoji in emojis:
+        text = text.replace(emoji.tag, emoji.full_code)
+    return text
+
+
+class TestTextPostprocessor:
+    """Тесты для TextPostprocessor."""
+
+    def test_render_cleans_and_replaces(self) -> None:
+        """Один проход удаляет markdown и подставляет эмодзи."""
+        result = postprocessor.render("### **Жирный** :yoba: и :Harold:")
+        assert result == " Жирный <:yoba:1101900451852599427> и <:Harold:1101900626268532860>"
+
+    def test_render_matches_legacy(self) -> None:
+        """Результат совпадает с последовательной очисткой и заменой."""
+        text = "**Привет** :F_: :Gay::yoba: :unknown: # конец :Gachi1"
+        assert postprocessor.render(text) == _legacy_render(text, EMOJIS)
+
+    def test_longest_tag_wins(self) -> None:
+        """При пересечении тегов выбирается самый длинный."""
+        pp = TextPostprocessor([Emoji("a", "1", ""), Emoji("a:b", "2", "")])
+        assert pp.render(":a:b:") == "<:a:b:2>"
+
+    def test_empty_emoji_set(self) -> None:
+        """Без эмодзи выполняется только очистка markdown."""
+        pp = TextPostprocessor([])
+        assert pp.render("**:yoba:**") == ":yoba:"
+        assert pp.replace_emojis(":yoba:") == ":yoba:"
+
+
+class TestStreamPostprocessor:
+    """Тесты для потоковой постобработки."""
+
+    def test_tag_split_between_chunks(self) -> None:
+        """Тег, разрезанный между частями, заменяется целиком."""
+        stream = postprocessor.stream()
+        parts = [stream.feed("Привет :yo"), stream.feed("ba: **мир**"), stream.flush()]
+        assert parts[0] == "Привет "
+        assert "".join(parts) == postprocessor.render("Привет :yoba: **мир**")
+
+    def test_every_split_matches_render(self) -> None:
+        """Любое разбиение на две части дает тот же результат, что и render."""
+        text = "**a** :yoba::Gachi1: b :Harold :F_: ## :Coolstorybob:"
+        expected = postprocessor.render(text)
+        for i in range(len(text) + 1):
+            stream = postprocessor.stream()
+            result = stream.feed(text[:i]) + stream.feed(text[i:]) + stream.flush()
+            assert result == expected
+
+    def test_flush_releases_incomplete_tag(self) -> None:
+        """Незавершенный тег отдается как есть при завершении потока."""
+        stream = postprocessor.stream()
+        assert stream.feed("конец :yob") == "конец "
+        assert stream.flush() == ":yob"
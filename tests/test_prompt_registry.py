@@ -0,0 +1,133 @@
+"""Тесты для app/tools/prompt_registry.py."""
+
+import os
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.tools import prompt
+from app.tools.prompt_registry import PromptRegistry, prompt_registry
+
+PROMPTS = """
+USER_DESCRIPTIONS = {{"alice": "Алиса"}}
+STABLE_SYSTEM_PROMPT = "стабильный {label}"
+ROAST_PROMPT = "прожарка {label}: {{user_info}}"
+ROAST_PERSONAS = {{"babka": "бабка"}}
+WEATHER_PROMPT = "погода {label}"
+EMOJIS = ["{label}"]
+"""
+
+
+@pytest.fixture
+def prompt_file(tmp_path: Path) -> Iterator[Path]:
+    """Временный модуль промптов, доступный для импорта."""
+    path = tmp_path / "temp_prompts.py"
+    path.write_text(PROMPTS.format(label="v1"), encoding="utf-8")
+    sys.path.insert(0, str(tmp_path))
+    yield path
+    sys.path.remove(str(tmp_path))
+    sys.modules.pop("temp_prompts", None)
+
+
+def _touch(path: Path, text: str) -> None:
+    """Перезаписывает файл и сдвигает время изменения вперед."""
+    path.write_text(text, encoding="utf-8")
+    mtime = path.stat().st_mtime + 10
+    os.utime(path, (mtime, mtime))
+
+
+class TestPromptRegistry:
+    """Тесты сборки и перезагрузки промптов."""
+
+    def test_compiled_variants(self, prompt_file: Path) -> None:
+        """Все варианты собираются при загрузке."""
+        registry = PromptRegistry("temp_prompts")
+
+        assert registry.stable_system_prompt() == "стабильный v1"
+        assert registry.roast_prompt() == "прожарка v1: - alice: Алиса"
+        assert registry.roast_prompt("babka").endswith("ВАЖНОЕ ДОПОЛНЕНИЕ К РОЛИ:\nбабка")
+        assert registry.roast_prompt("nobody") is None
+        assert registry.roast_personas == ["babka"]
+
+    def test_hot_reload(self, prompt_file: Path) -> None:
+        """После изменения файла промпты собираются заново."""
+        registry = PromptRegistry("temp_prompts", check_interval=0)
+
+        _touch(prompt_file, PROMPTS.format(label="v2"))
+
+        assert registry.stable_system_prompt() == "стабильный v2"
+
+    def test_reload_checks_are_throttled(self, prompt_file: Path) -> None:
+        """Файл проверяется не чаще check_interval."""
+        registry = PromptRegistry("temp_prompts", check_interval=3600)
+        registry.reload_if_changed()
+
+        _touch(prompt_file, PROMPTS.format(label="v2"))
+
+        assert registry.stable_system_prompt() == "стабильный v1"
+
+    def test_broken_file_keeps_previous(self, prompt_file: Path) -> None:
+        """Ошибка в файле промптов не ломает уже собранные варианты."""
+        registry = PromptRegistry("temp_prompts", check_interval=0)
+
+        _touch(prompt_file, "SYSTEM_PROMPT = (")
+
+        assert registry.reload_if_changed() is False
+        assert registry.stable_system_prompt() == "стабильный v1"
+
+    def test_reload_reaches_module_consumers(self, prompt_file: Path) -> None:
+        """Промпты из prompts() и подписчики on_reload получают новую версию файла."""
+        registry = PromptRegistry("temp_prompts", check_interval=0)
+        received: list[list[str]] = []
+        registry.on_reload(lambda module: received.append(module.EMOJIS))
+
+        assert registry.prompts().WEATHER_PROMPT == "погода v1"
+        _touch(prompt_file, PROMPTS.format(label="v2"))
+
+        assert registry.prompts().WEATHER_PROMPT == "погода v2"
+        assert received == [["v2"]]
+
+    def test_broken_file_skips_listeners(self, prompt_file: Path) -> None:
+        """При ошибке в файле подписчики не вызываются, модуль остается прежним."""
+        registry = PromptRegistry("temp_prompts", check_interval=0)
+        received: list[object] = []
+        registry.on_reload(received.append)
+
+        _touch(prompt_file, "SYSTEM_PROMPT = (")
+
+        assert registry.prompts().WEATHER_PROMPT == "погода v1"
+        assert received == []
+
+
+class TestDefaultRegistry:
+    """Тесты реестра, собранного из app/tools/prompt.py."""
+
+    def test_matches_prompt_module(self) -> None:
+        """Варианты реестра совпадают с промптами модуля."""
+        assert prompt_registry.stable_system_prompt() == prompt.STABLE_SYSTEM_PROMPT
+        assert prompt_registry.roast_personas == list(prompt.ROAST_PERSONAS)
+
+    def test_prompt_consumers_use_registry(self) -> None:
+        """Модули, использующие промпты, не держат собственных копий констант."""
+        from app.core import handlers
+        from app.services import daily_report, holiday
+        from app.tools import postprocess
+
+        assert prompt_registry.prompts() is prompt
+        for module in (handlers, daily_report, holiday):
+            assert not hasattr(module, "WEATHER_PROMPT")
+            assert not hasattr(module, "USER_DESCRIPTIONS")
+            assert not hasattr(module, "REPORT_CHUNK_PROMPT")
+
+        # Шаблоны эмодзи пересобираются подписчиком перезагрузки
+        try:
+            for callback in prompt_registry._listeners:
+                callback(SimpleNamespace(EMOJIS=[]))
+            assert postprocess.postprocessor.mapping == {}
+        finally:
+            for callback in prompt_registry._listeners:
+                callback(prompt)
+        assert len(postprocess.postprocessor.mapping) == len(prompt.EMOJIS)
@@ -0,0 +1,90 @@
+"""Тесты для app/services/rate_limiter.py."""
+
+import asyncio
+from unittest.mock import patch
+
+from app.services.rate_limiter import AIRateLimiter, TokenBucketStore
+
+
+class TestTokenBucketStore:
+    """Тесты хранилища корзин токенов."""
+
+    def test_burst_then_deny(self) -> None:
+        """После burst запросов следующий ждет пополнения одного токена."""
+        store = TokenBucketStore(capacity=2, rate=0.5)
+
+        for _ in range(2):
+            assert store.retry_after(1, 0.0) == 0
+            store.consume(1, 0.0)
+
+        assert store.retry_after(1, 0.0) == 2.0
+
+    def test_refill(self) -> None:
+        """Токены пополняются со временем, но не выше capacity."""
+        store = TokenBucketStore(capacity=2, rate=0.5)
+        store.consume(1, 0.0)
+        store.consume(1, 0.0)
+
+        assert store.tokens(1, 1.0) == 0.5
+        assert store.retry_after(1, 2.0) == 0
+        assert store.tokens(1, 100.0) == 2
+
+    def test_full_buckets_evicted(self) -> None:
+        """Наполнившиеся корзины удаляются, память не растет с числом пользователей."""
+        store = TokenBucketStore(capacity=2, rate=0.5)
+        for key in range(1000):
+            store.consume(key, float(key))
+
+        # refill_time = 4 c: живы только корзины, обновленные за последние 4 секунды
+        assert len(store.buckets) == 4
+        assert list(store.buckets) == [996, 997, 998, 999]
+
+    def test_max_entries(self) -> None:
+        """При большом числе активных ключей вытесняются самые давние."""
+        store = TokenBucketStore(capacity=2, rate=0.5, max_entries=100)
+        for key in range(1000):
+            store.consume(key, 0.0)
+
+        assert len(store.buckets) == 100
+        assert 999 in store.buckets
+        assert 0 not in store.buckets
+
+
+class TestAIRateLimiter:
+    """Тесты ограничителя запросов к AI."""
+
+    def test_user_limit(self) -> None:
+        """Пользователь ограничен своей корзиной, другие пользователи — нет."""
+        limiter = AIRateLimiter(user_burst=2, user_rate=0.2)
+        with patch("app.services.rate_limiter.time.monotonic", return_value=10.0):
+            assert limiter.check(1, 100) == 0
+            assert limiter.check(1, 100) == 0
+            assert limiter.check(1, 100) == 5.0
+            assert limiter.check(2, 100) == 0
+
+    def test_guild_limit_keeps_user_tokens(self) -> None:
+        """Отказ по лимиту сервера не списывает токен пользователя."""
+        limiter = AIRateLimiter(guild_burst=1, guild_rate=0.5)
+        with patch("app.services.rate_limiter.time.monotonic", return_value=10.0):
+            assert limiter.check(1, 100) == 0
+            assert limiter.check(2, 100) == 2.0
+            assert limiter.users.tokens(2, 10.0) == limiter.users.capacity
+            # В личных сообщениях лимит сервера не применяется
+            assert limiter.check(2, None) == 0
+
+    async def test_concurrency_cap(self) -> None:
+        """Одновременно выполняется не больше max_concurrent генераций."""
+        limiter = AIRateLimiter(max_concurrent=2)
+        running = peak = 0
+
+        async def generate() -> None:
+            nonlocal running, peak
+            async with limiter.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(generate() for _ in range(6)))
+
+        assert peak == 2
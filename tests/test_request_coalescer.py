@@ -0,0 +1,139 @@
+"""Тесты для app/services/request_coalescer.py."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+import pytest
+from discord.ext import commands
+
+from app.cogs.error_handler import ErrorHandler
+from app.services.request_coalescer import RequestCoalescer
+
+
+class TestRequestCoalescer:
+    """Тесты объединения одинаковых запросов."""
+
+    async def test_concurrent_identical_share_call(self) -> None:
+        """Одновременные запросы с одним ключом выполняются одним вызовом."""
+        coalescer = RequestCoalescer()
+        release = asyncio.Event()
+        calls = 0
+
+        async def generate() -> str:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "ответ"
+
+        tasks = [asyncio.create_task(coalescer.run("ключ", generate)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*tasks) == ["ответ"] * 5
+        assert calls == 1
+        assert coalescer.stats() == {
+            "requests": 5,
+            "coalesced": 4,
+            "coalescing_rate": 0.8,
+            "in_flight": 0,
+        }
+
+    async def test_different_keys_and_sequential(self) -> None:
+        """Разные ключи и последовательные запросы не объединяются."""
+        coalescer = RequestCoalescer()
+        factory = AsyncMock(side_effect=["a", "b", "c"])
+
+        results = await asyncio.gather(coalescer.run(1, factory), coalescer.run(2, factory))
+
+        assert results == ["a", "b"]
+        assert await coalescer.run(1, factory) == "c"
+        assert coalescer.coalesced == 0
+
+    async def test_error_shared_and_released(self) -> None:
+        """Ошибка доходит до всех ожидающих, ключ освобождается."""
+        coalescer = RequestCoalescer()
+
+        async def fail() -> str:
+            await asyncio.sleep(0)
+            raise RuntimeError("сбой")
+
+        results = await asyncio.gather(
+            coalescer.run("ключ", fail), coalescer.run("ключ", fail), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert coalescer.in_flight == {}
+
+    async def test_leader_cancel_keeps_followers(self) -> None:
+        """Отмена первого вызывающего не прерывает остальных."""
+        coalescer = RequestCoalescer()
+        release = asyncio.Event()
+
+        async def generate() -> str:
+            await release.wait()
+            return "ответ"
+
+        leader = asyncio.create_task(coalescer.run("ключ", generate))
+        follower = asyncio.create_task(coalescer.run("ключ", generate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+
+        assert await follower == "ответ"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+
+class TestErrorHandlerCoalescing:
+    """Тесты объединения запросов в обработчике неизвестных команд."""
+
+    @staticmethod
+    def make_ctx(user_id: int, content: str) -> AsyncMock:
+        """Создает контекст сообщения пользователя."""
+        ctx = AsyncMock(spec=commands.Context)
+        ctx.author = MagicMock(spec=discord.Member)
+        ctx.author.id = user_id
+        ctx.author.mention = f"<@{user_id}>"
+        ctx.guild = MagicMock(spec=discord.Guild)
+        ctx.guild.id = 555
+        ctx.message = MagicMock(spec=discord.Message)
+        ctx.message.content = content
+        return ctx
+
+    async def test_identical_messages_share_completion(self) -> None:
+        """Одинаковые вопросы получают одну генерацию без автора, каждому — свое упоминание."""
+        bot = MagicMock()
+        bot.weather_enabled = True
+        bot.search_enabled = True
+        bot.context_limit = 15
+        cog = ErrorHandler(bot)
+        release = asyncio.Event()
+
+        async def check_weather(_text: str) -> str:
+            await release.wait()
+            return "+5°C"
+
+        contexts = [
+            self.make_ctx(9000 + i, text) for i, text in enumerate(["Погода?", "погода", "ПОГОДА!"])
+        ]
+        with (
+            patch(
+                "app.core.handlers.check_weather_intent", new=AsyncMock(side_effect=check_weather)
+            ) as w,
+            patch("app.core.handlers.check_search_intent", new=AsyncMock(return_value=None)) as s,
+            patch("app.core.handlers.ai_generate", new=AsyncMock(return_value="ответ")) as ai,
+        ):
+            tasks = [
+                asyncio.create_task(cog.on_command_error(ctx, commands.CommandNotFound()))
+                for ctx in contexts
+            ]
+            await asyncio.sleep(0.01)
+            release.set()
+            await asyncio.gather(*tasks)
+
+        w.assert_called_once()
+        s.assert_called_once()
+        ai.assert_awaited_once_with("Погода?", 555, None, "+5°C", None, limit=15)
+        for ctx in contexts:
+            ctx.send.assert_called_once_with(f"{ctx.author.mention} ответ")
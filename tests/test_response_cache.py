@@ -0,0 +1,107 @@
+"""Тесты для app/services/response_cache.py."""
+
+import time
+from unittest.mock import AsyncMock
+
+from app.services.response_cache import ResponseCache, context_fingerprint, context_overlap
+
+CONTEXT = [f"строка контекста {i}" for i in range(10)]
+
+VECTORS = {
+    "как установить python": [1.0, 0.0],
+    "как поставить python": [0.99, 0.141],
+    "как удалить python": [0.0, 1.0],
+}
+
+
+async def fake_embed(text: str) -> list[float]:
+    """Детерминированные единичные эмбеддинги для тестовых вопросов."""
+    return VECTORS.get(text, [0.7071, 0.7071])
+
+
+class TestContextFingerprint:
+    """Тесты отпечатка контекста RAG."""
+
+    def test_overlap(self) -> None:
+        """Пересечение считается по строкам контекста без учета порядка."""
+        a = context_fingerprint(CONTEXT)
+        b = context_fingerprint([*reversed(CONTEXT[1:]), "новая строка"])
+
+        assert context_overlap(a, a) == 1.0
+        assert context_overlap(a, b) == 9 / 11
+        assert context_overlap(frozenset(), frozenset()) == 1.0
+
+
+class TestResponseCache:
+    """Тесты кеша ответов."""
+
+    async def test_exact_hit(self) -> None:
+        """Тот же вопрос с другим регистром и знаками отдается из кеша."""
+        cache = ResponseCache(embed=fake_embed, enabled=True)
+        await cache.put(1, "user", "Как установить Python?", CONTEXT, "ответ")
+
+        assert await cache.get(1, "user", "как  установить python", CONTEXT) == "ответ"
+        assert cache.exact_hits == 1
+
+    async def test_semantic_hit(self) -> None:
+        """Перефразированный вопрос находится по сходству эмбеддингов."""
+        cache = ResponseCache(embed=fake_embed, enabled=True)
+        await cache.put(1, "user", "Как установить Python", CONTEXT, "ответ")
+
+        assert await cache.get(1, "user", "Как поставить Python", CONTEXT) == "ответ"
+        assert await cache.get(1, "user", "Как удалить Python", CONTEXT) is None
+        assert (cache.semantic_hits, cache.misses) == (1, 1)
+
+    async def test_scoped_per_guild(self) -> None:
+        """Ответы одного сервера не видны на другом."""
+        cache = ResponseCache(embed=fake_embed, enabled=True)
+        await cache.put(1, "user", "Как установить Python", CONTEXT, "ответ")
+
+        assert await cache.get(2, "user", "Как установить Python", CONTEXT) is None
+
+    async def test_changed_context_misses(self) -> None:
+        """Если контекст RAG сильно изменился, старый ответ не используется."""
+        cache = ResponseCache(embed=fake_embed, enabled=True)
+        await cache.put(1, "user", "Как установить Python", CONTEXT, "ответ")
+        changed = CONTEXT[:3] + [f"другое {i}" for i in range(7)]
+
+        assert await cache.get(1, "user", "Как установить Python", changed) is None
+
+    async def test_expired(self) -> None:
+        """Ответ с истекшим TTL удаляется."""
+        cache = ResponseCache(embed=fake_embed, enabled=True)
+        await cache.put(1, "user", "Как установить Python", CONTEXT, "ответ")
+        cache.guilds[1]["как установить python"].expires = time.monotonic() - 1
+
+        assert await cache.get(1, "user", "Как установить Python", CONTEXT) is None
+        assert cache.guilds[1] == {}
+
+    async def test_personal_answer_not_shared(self) -> None:
+        """Ответ с обращением к автору вопроса по имени не отдается другим."""
+        cache = ResponseCache(embed=fake_embed, enabled=True)
+        await cache.put(1, "Alice", "Как установить Python", CONTEXT, "Alice, держи ответ")
+
+        assert await cache.get(1, "Bob", "Как установить Python", CONTEXT) is None
+        assert await cache.get(1, "Alice", "Как установить Python", CONTEXT) is not None
+
+    async def test_embedding_reused_and_failure_tolerated(self) -> None:
+        """Эмбеддинг вопроса считается один раз; ошибка эмбеддинга не ломает кеш."""
+        embed = AsyncMock(side_effect=Exception("down"))
+        cache = ResponseCache(embed=embed, enabled=True)
+        await cache.put(1, "user", "Вопрос один", CONTEXT, "ответ")
+
+        assert await cache.get(1, "user", "Вопрос два", CONTEXT) is None
+        await cache.put(1, "user", "Вопрос два", CONTEXT, "ответ 2")
+
+        assert embed.await_count == 2
+        assert await cache.get(1, "user", "вопрос два", CONTEXT) == "ответ 2"
+
+    async def test_clear_guild(self) -> None:
+        """Очистка сервера удаляет только его ответы."""
+        cache = ResponseCache(embed=fake_embed, enabled=True)
+        await cache.put(1, "user", "Как установить Python", CONTEXT, "ответ")
+        await cache.put(2, "user", "Как установить Python", CONTEXT, "ответ")
+
+        cache.clear(1)
+
+        assert list(cache.guilds) == [2]
@@ -0,0 +1,228 @@
+"""Тесты кеша и профилей поиска в app/mcp/server_search.py."""
+
+import time
+from dataclasses import asdict
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.mcp import server_search
+from app.mcp.server_search import (
+    SEARCH_TOKEN_BUDGET,
+    SearchCache,
+    choose_profile,
+    condense_results,
+    make_search_request,
+    normalize_query,
+)
+from app.tools.tokens import estimate_tokens
+from app.tools.utils import format_search_context
+
+DATA = {"answer": "ответ"}
+
+VECTORS = {
+    "кто такой илон маск": [1.0, 0.0, 0.0],
+    "илон маск кто это": [0.99, 0.141, 0.0],
+    "что такое rust": [0.0, 1.0, 0.0],
+    "новости rust": [0.0, 0.99, 0.141],
+}
+
+
+async def fake_embed(query: str) -> list[float] | None:
+    """Детерминированные единичные эмбеддинги для тестовых запросов."""
+    return VECTORS.get(normalize_query(query))
+
+
+class TestProfiles:
+    """Тесты выбора профиля глубины поиска."""
+
+    @pytest.mark.parametrize(
+        ("query", "profile"),
+        [
+            ("Курс доллара сегодня", "news"),
+            ("Новости Apple", "news"),
+            ("Кто такой Илон Маск?", "fast"),
+            ("Почему небо голубое", "advanced"),
+            ("Сравни iPhone 16 и Pixel 9", "advanced"),
+        ],
+    )
+    def test_auto(self, query: str, profile: str) -> None:
+        """Профиль выбирается по типу запроса."""
+        assert choose_profile(query) == profile
+
+    def test_forced_profile(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """SEARCH_DEPTH принудительно задает профиль."""
+        monkeypatch.setattr(server_search, "SEARCH_DEPTH", "advanced")
+        assert choose_profile("Кто такой Илон Маск?") == "advanced"
+
+    async def test_request_uses_profile_options(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Параметры Tavily берутся из профиля, TTL в запрос не передается."""
+        client = MagicMock()
+        client.search = AsyncMock(return_value=DATA)
+        monkeypatch.setattr(server_search, "SEARCH_API", "key")
+        monkeypatch.setattr(server_search, "client", client)
+
+        assert await make_search_request("новости", "news") == DATA
+
+        kwargs = client.search.await_args.kwargs
+        assert kwargs["search_depth"] == "basic"
+        assert kwargs["topic"] == "news"
+        assert kwargs["include_raw_content"] is False
+        assert "ttl" not in kwargs
+
+
+class TestSearchCache:
+    """Тесты кеша результатов поиска."""
+
+    async def test_exact_hit(self) -> None:
+        """Тот же запрос с другим регистром и знаками отдается из кеша."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = SearchCache(fetch, embed=fake_embed)
+
+        assert await cache.get("Кто такой Илон Маск?") == DATA
+        assert await cache.get("кто такой  илон маск") == DATA
+
+        fetch.assert_awaited_once_with("Кто такой Илон Маск?", "fast")
+        assert cache.exact_hits == 1
+
+    async def test_semantic_hit(self) -> None:
+        """Перефразированный вопрос находится по сходству эмбеддингов."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = SearchCache(fetch, embed=fake_embed)
+
+        await cache.get("Кто такой Илон Маск?")
+        assert await cache.get("Илон Маск кто это") == DATA
+
+        fetch.assert_awaited_once()
+        assert cache.semantic_hits == 1
+
+    async def test_dissimilar_query_fetched(self) -> None:
+        """Непохожий запрос выполняется заново."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = SearchCache(fetch, embed=fake_embed)
+
+        await cache.get("Кто такой Илон Маск?")
+        await cache.get("Что такое Rust")
+
+        assert fetch.await_count == 2
+
+    async def test_semantic_hit_requires_same_profile(self) -> None:
+        """Похожий запрос другого профиля (новости) не берется из кеша."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = SearchCache(fetch, embed=fake_embed)
+
+        await cache.get("Что такое Rust")
+        await cache.get("Новости Rust")
+
+        assert fetch.await_count == 2
+
+    async def test_expired_entry_fetched(self) -> None:
+        """Запись с истекшим TTL удаляется и запрашивается заново."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = SearchCache(fetch, embed=fake_embed)
+
+        await cache.get("Кто такой Илон Маск?")
+        cache.entries["кто такой илон маск"].expires = time.monotonic() - 1
+        await cache.get("Илон Маск кто это")
+
+        assert fetch.await_count == 2
+
+    async def test_embedding_failure_falls_back_to_exact(self) -> None:
+        """Без эмбеддинга кеш работает только по точному совпадению."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = SearchCache(fetch, embed=AsyncMock(return_value=None))
+
+        await cache.get("Кто такой Илон Маск?")
+        await cache.get("Кто такой Илон Маск?")
+        await cache.get("Илон Маск кто это")
+
+        assert fetch.await_count == 2
+
+    async def test_failed_search_not_cached(self) -> None:
+        """Неудачный поиск не кешируется."""
+        fetch = AsyncMock(side_effect=[None, DATA])
+        cache = SearchCache(fetch, embed=fake_embed)
+
+        assert await cache.get("Что такое Rust") is None
+        assert await cache.get("Что такое Rust") == DATA
+
+
+@pytest.mark.asyncio
+async def test_get_current_search_uses_cache() -> None:
+    """Инструмент поиска обращается к API только один раз для повторного вопроса."""
+    fetch = AsyncMock(return_value=DATA)
+    with patch.object(server_search, "search_cache", SearchCache(fetch, embed=fake_embed)):
+        assert (await server_search.get_current_search("Что такое Rust")).answer == "ответ"
+        assert (await server_search.get_current_search("что такое rust?")).answer == "ответ"
+
+    fetch.assert_awaited_once()
+
+
+def _result(i: int, score: float, content: str = "Короткий сниппет.") -> dict:
+    return {
+        "title": f"Источник {i}",
+        "url": f"https://e.com/{i}",
+        "content": content,
+        "score": score,
+    }
+
+
+class TestCondenseResults:
+    """Тесты сжатия ответа Tavily перед передачей модели."""
+
+    def test_top_k_by_score(self) -> None:
+        """Остаются top_k источников с наибольшим score, дубликаты URL отбрасываются."""
+        data = {
+            "answer": "ответ",
+            "results": [_result(1, 0.2), _result(2, 0.9), _result(2, 0.8), _result(3, 0.5)],
+        }
+
+        result = condense_results("запрос", data, top_k=2)
+
+        assert result.answer == "ответ"
+        assert [source.url for source in result.sources] == [
+            "https://e.com/2",
+            "https://e.com/3",
+        ]
+
+    def test_token_budget(self) -> None:
+        """Ответ и сниппеты вместе укладываются в бюджет токенов."""
+        long_text = "Очень длинное предложение о предмете поиска. " * 200
+        data = {
+            "answer": long_text,
+            "results": [_result(i, 1 - i / 10, long_text) for i in range(5)],
+        }
+
+        result = condense_results("запрос", data, top_k=5, budget=SEARCH_TOKEN_BUDGET)
+
+        total = estimate_tokens(result.answer) + sum(
+            estimate_tokens(s.title + s.url + s.snippet) for s in result.sources
+        )
+        assert total <= SEARCH_TOKEN_BUDGET
+        assert result.answer.endswith("…")
+
+    def test_lean_payload_without_answer(self) -> None:
+        """Без ответа Tavily результат строится из сниппетов."""
+        result = condense_results("запрос", {"results": [_result(1, 0.5)]})
+
+        assert result.answer == ""
+        assert result.sources[0].snippet == "Короткий сниппет."
+
+    def test_format_for_prompt(self) -> None:
+        """Структурированный результат превращается в компактный блок промпта."""
+        text = format_search_context(
+            asdict(condense_results("rust", {"answer": "язык", "results": [_result(1, 1)]}))
+        )
+
+        assert "«rust»" in text
+        assert "Краткий ответ: язык" in text
+        assert "1. Источник 1 (https://e.com/1): Короткий сниппет." in text
+
+    async def test_tool_returns_structured_content(self) -> None:
+        """MCP-инструмент возвращает структурированный результат."""
+        fetch = AsyncMock(return_value={"answer": "язык", "results": [_result(1, 1)]})
+        with patch.object(server_search, "search_cache", SearchCache(fetch, embed=fake_embed)):
+            _, structured = await server_search.mcp.call_tool("get_current_search", {"text": "rust"})
+
+        assert structured["answer"] == "язык"
+        assert structured["sources"][0]["url"] == "https://e.com/1"
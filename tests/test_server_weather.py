@@ -0,0 +1,126 @@
+"""Тесты кеша ответов в app/mcp/server_weather.py."""
+
+import asyncio
+import time
+from typing import Any
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.mcp.server_weather import (
+    CURRENT_TTL,
+    CityNotFoundError,
+    WeatherCache,
+    get_weather_cache_stats,
+)
+
+DATA = {"name": "Moscow", "cod": 200}
+
+
+class TestWeatherCache:
+    """Тесты TTL-кеша погоды."""
+
+    async def test_fresh_hit_with_normalized_key(self) -> None:
+        """Повторный запрос того же города отдается из кеша без обращения к API."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = WeatherCache(fetch)
+
+        assert await cache.get("weather", "Москва", "metric", CURRENT_TTL) == DATA
+        assert await cache.get("weather", "  москва ", "Metric", CURRENT_TTL) == DATA
+
+        fetch.assert_awaited_once_with("weather", {"q": "москва", "units": "metric"})
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    async def test_key_includes_endpoint_and_units(self) -> None:
+        """Текущая погода, прогноз и разные единицы кешируются раздельно."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = WeatherCache(fetch)
+
+        await cache.get("weather", "Москва", "metric", CURRENT_TTL)
+        await cache.get("weather", "Москва", "imperial", CURRENT_TTL)
+        await cache.get("forecast", "Москва", "metric", CURRENT_TTL, cnt=40)
+
+        assert fetch.await_count == 3
+        assert fetch.await_args.args == ("forecast", {"q": "москва", "units": "metric", "cnt": 40})
+
+    async def test_stale_served_while_revalidating(self) -> None:
+        """Устаревший ответ отдается сразу, а обновление идет в фоне."""
+        fresh = {"name": "Moscow", "cod": 200, "fresh": True}
+        fetch = AsyncMock(side_effect=[DATA, fresh])
+        cache = WeatherCache(fetch)
+        await cache.get("weather", "Москва", "metric", CURRENT_TTL)
+        cache.entries[cache.key("weather", "Москва", "metric")].expires = time.monotonic() - 1
+
+        assert await cache.get("weather", "Москва", "metric", CURRENT_TTL) == DATA
+        await asyncio.gather(*cache._inflight.values())
+
+        assert await cache.get("weather", "Москва", "metric", CURRENT_TTL) == fresh
+        assert (cache.stale_hits, cache.refreshes, cache.hits) == (1, 1, 1)
+
+    async def test_expired_beyond_stale_window_refetched(self) -> None:
+        """Запись старше окна stale-while-revalidate запрашивается заново."""
+        fetch = AsyncMock(return_value=DATA)
+        cache = WeatherCache(fetch)
+        await cache.get("weather", "Москва", "metric", CURRENT_TTL)
+        entry = cache.entries[cache.key("weather", "Москва", "metric")]
+        entry.expires = entry.stale_until = time.monotonic() - 1
+
+        await cache.get("weather", "Москва", "metric", CURRENT_TTL)
+
+        assert fetch.await_count == 2
+        assert cache.misses == 2
+
+    async def test_unknown_city_cached_negatively(self) -> None:
+        """Неизвестный город не запрашивается повторно до истечения отрицательного TTL."""
+        fetch = AsyncMock(side_effect=CityNotFoundError("Нигде"))
+        cache = WeatherCache(fetch)
+
+        assert await cache.get("weather", "Нигде", "metric", CURRENT_TTL) is None
+        assert await cache.get("weather", "Нигде", "metric", CURRENT_TTL) is None
+
+        fetch.assert_awaited_once()
+        assert cache.negative_hits == 1
+
+    async def test_transient_error_not_cached(self) -> None:
+        """Временная ошибка API не кешируется."""
+        fetch = AsyncMock(side_effect=[None, DATA])
+        cache = WeatherCache(fetch)
+
+        assert await cache.get("weather", "Москва", "metric", CURRENT_TTL) is None
+        assert await cache.get("weather", "Москва", "metric", CURRENT_TTL) == DATA
+        assert cache.errors == 1
+
+    async def test_concurrent_misses_coalesced(self) -> None:
+        """Одновременные промахи по одному ключу выполняют один запрос к API."""
+
+        async def slow_fetch(endpoint: str, params: dict[str, Any]) -> dict[str, Any]:
+            await asyncio.sleep(0.01)
+            return DATA
+
+        fetch = AsyncMock(side_effect=slow_fetch)
+        cache = WeatherCache(fetch)
+
+        results = await asyncio.gather(
+            *(cache.get("weather", "Москва", "metric", CURRENT_TTL) for _ in range(10))
+        )
+
+        assert results == [DATA] * 10
+        fetch.assert_awaited_once()
+
+    async def test_lru_eviction(self) -> None:
+        """При превышении размера вытесняется давно не использованная запись."""
+        cache = WeatherCache(AsyncMock(return_value=DATA), maxsize=2)
+
+        for city in ("a", "b", "a", "c"):
+            await cache.get("weather", city, "metric", CURRENT_TTL)
+
+        assert [key[1] for key in cache.entries] == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_stats_tool() -> None:
+    """Статистика кеша доступна как MCP-инструмент."""
+    stats = await get_weather_cache_stats()
+    assert "hits=" in stats
+    assert "misses=" in stats
+    assert "size=" in stats
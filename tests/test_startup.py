@@ -0,0 +1,73 @@
+"""Отчет о времени холодного старта бота (импорт main.py и setup_hook).
+
+Подробный отчет -X importtime выводится при запуске с pytest -s.
+"""
+
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("chromadb", "llama_index.core", "mcp", "tiktoken")
+
+STARTUP_SCRIPT = f"""
+import asyncio
+import json
+import sys
+import time
+
+started = time.perf_counter()
+import main
+from app.core.bot import DisBot
+imported = time.perf_counter()
+
+
+async def run() -> None:
+    bot = DisBot(command_prefix="!", intents=main.intents, help_command=None)
+    await bot.setup_hook()
+    await bot.close()
+
+
+asyncio.run(run())
+finished = time.perf_counter()
+print(
+    json.dumps(
+        {{
+            "import_seconds": imported - started,
+            "setup_hook_seconds": finished - imported,
+            "heavy_loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+        }}
+    )
+)
+"""
+
+
+def _top_imports(stderr: str, max_depth: int = 2, limit: int = 15) -> list[tuple[int, str]]:
+    """Возвращает самые долгие импорты из вывода -X importtime до заданной вложенности."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= max_depth:
+            imports.append((int(cumulative), "  " * depth + name.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def test_cold_start_report() -> None:
+    """Старт до setup_hook не загружает RAG, MCP и tiktoken."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        capture_output=True,
+        text=True,
+        timeout=120,
+        check=True,
+    )
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f"\nИмпорт main.py: {stats['import_seconds']:.2f} с")
+    print(f"setup_hook: {stats['setup_hook_seconds']:.2f} с")
+    for cumulative, name in _top_imports(result.stderr):
+        print(f"{cumulative / 1e6:8.3f} с  {name}")
+
+    assert stats["heavy_loaded"] == []
@@ -4,7 +4,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.services.telegram_notifier import TelegramNotifier
+from app.services.telegram_notifier import SHUTDOWN_TIMEOUT, TelegramNotifier
 
 _PATCH_SESSION = "app.services.telegram_notifier.aiohttp.ClientSession"
 
@@ -100,3 +100,111 @@ class TestTelegramNotifierSendMessage:
         with patch(_PATCH_SESSION, return_value=mock_session):
             result = await notifier.send_message("тест")
             assert result is False
+
+
+def _queue_notifier(*results: tuple[int | None, float | None]) -> TelegramNotifier:
+    """Создает включенный notifier с мгновенным окном и подмененной отправкой."""
+    notifier = TelegramNotifier()
+    notifier.enabled = True
+    notifier.alert_window = 0.01
+    notifier.min_send_interval = 0.0
+    notifier._post = AsyncMock(side_effect=list(results) or None, return_value=(200, None))
+    return notifier
+
+
+class TestTelegramAlertQueue:
+    """Тесты очереди уведомлений alert."""
+
+    @pytest.mark.asyncio
+    async def test_alert_does_not_block(self) -> None:
+        """Alert возвращает управление до отправки."""
+        notifier = _queue_notifier()
+        notifier.alert("сбой")
+        notifier._post.assert_not_awaited()
+        await notifier._worker
+        notifier._post.assert_awaited_once_with("сбой")
+
+    @pytest.mark.asyncio
+    async def test_duplicates_coalesced_into_one_message(self) -> None:
+        """Одинаковые уведомления объединяются, разные — отправляются одним сообщением."""
+        notifier = _queue_notifier()
+        for _ in range(5):
+            notifier.alert("отключился")
+        notifier.alert("восстановил")
+        await notifier._worker
+
+        notifier._post.assert_awaited_once()
+        text = notifier._post.await_args.args[0]
+        assert text == "отключился\n<i>Повторилось 5 раз</i>\n\nвосстановил"
+
+    @pytest.mark.asyncio
+    async def test_retry_after_rate_limit(self) -> None:
+        """При 429 отправка повторяется через retry_after."""
+        notifier = _queue_notifier((429, 0), (None, None), (200, None))
+
+        with patch("app.services.telegram_notifier.asyncio.sleep", new=AsyncMock()) as sleep:
+            notifier.alert("сбой")
+            await notifier.flush()
+
+        assert notifier._post.await_count == 3
+        delays = [call.args[0] for call in sleep.await_args_list]
+        assert delays == [0, 2]
+
+    @pytest.mark.asyncio
+    async def test_client_error_not_retried(self) -> None:
+        """Ошибка 400 не повторяется."""
+        notifier = _queue_notifier((400, None))
+        notifier.alert("сбой")
+        await notifier.flush()
+        notifier._post.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_long_batch_split_by_limit(self) -> None:
+        """Накопленные уведомления делятся на сообщения не длиннее лимита Telegram."""
+        notifier = _queue_notifier()
+        for i in range(3):
+            notifier.alert(f"{i}" * 3000)
+        await notifier.flush()
+
+        texts = [call.args[0] for call in notifier._post.await_args_list]
+        assert len(texts) == 3
+        assert all(len(text) <= 4096 for text in texts)
+
+    @pytest.mark.asyncio
+    async def test_overflow_counted(self) -> None:
+        """Уведомления сверх лимита очереди не теряются бесследно."""
+        notifier = _queue_notifier()
+        with patch("app.services.telegram_notifier.MAX_PENDING_ALERTS", 2):
+            for i in range(5):
+                notifier.alert(f"ошибка {i}")
+        await notifier.flush()
+
+        text = notifier._post.await_args.args[0]
+        assert "ошибка 2" not in text
+        assert "еще 3 уведомлений пропущено" in text
+
+    @pytest.mark.asyncio
+    async def test_disabled_alert_is_noop(self) -> None:
+        """Выключенный notifier не создает фоновую задачу."""
+        notifier = _queue_notifier()
+        notifier.enabled = False
+        notifier.alert("сбой")
+        assert notifier._worker is None
+        assert notifier._pending == {}
+
+    @pytest.mark.asyncio
+    async def test_close_single_attempt_and_cancels_worker(self) -> None:
+        """При остановке недоступный Telegram не задерживает выход повторами."""
+        notifier = _queue_notifier((None, None), (200, None))
+        notifier.alert_window = 60
+        notifier.alert("сбой")
+        worker = notifier._worker
+
+        with patch("app.services.telegram_notifier.asyncio.sleep", new=AsyncMock()) as sleep:
+            await notifier.close()
+
+        assert worker.cancelled()
+        assert notifier._worker is None
+        notifier._post.assert_awaited_once_with("сбой", timeout=SHUTDOWN_TIMEOUT)
+        sleep.assert_not_awaited()
+        assert notifier._pending == {}
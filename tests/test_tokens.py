@@ -0,0 +1,94 @@
+"""Unit-тесты для app/tools/tokens.py."""
+
+from types import SimpleNamespace
+
+from app.tools.tokens import (
+    TOKENS_PER_MESSAGE,
+    TOKENS_PER_REPLY,
+    PromptCacheStats,
+    TokenCounter,
+    estimate_tokens,
+)
+
+
+class TestEstimateTokens:
+    """Тесты для функции estimate_tokens."""
+
+    def test_empty(self) -> None:
+        """Пустой текст и None — 0."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens(None) == 0
+
+    def test_close_to_exact_count(self) -> None:
+        """Оценка того же порядка, что и точное значение, для латиницы и кириллицы."""
+        counter = TokenCounter()
+        for text in ("Hello, world! How are you?", "Привет, как дела на сервере бичей?"):
+            exact = counter.count(text)
+            assert exact / 2 <= estimate_tokens(text) <= exact * 2
+
+
+class TestTokenCounter:
+    """Тесты для TokenCounter."""
+
+    def test_cache_hit(self) -> None:
+        """Повторный подсчет того же текста берется из кеша."""
+        counter = TokenCounter()
+        first = counter.count("повторяющийся текст")
+        assert counter.count("повторяющийся текст") == first
+        assert counter.hits == 1
+        assert counter.misses == 1
+
+    def test_cache_is_bounded(self) -> None:
+        """Размер кеша не превышает maxsize."""
+        counter = TokenCounter(maxsize=3)
+        for i in range(10):
+            counter.count(f"текст {i}")
+        assert len(counter._cache) == 3
+
+    def test_count_many_matches_count(self) -> None:
+        """Пакетный подсчет совпадает с поштучным, дубликаты кодируются один раз."""
+        counter = TokenCounter()
+        texts = ["один", "два три", "", "один"]
+        result = counter.count_many(texts)
+        assert result == [TokenCounter().count(text) for text in texts]
+        assert counter.misses == 2
+
+    def test_count_messages(self) -> None:
+        """Учитывает служебные токены на каждое сообщение и на ответ."""
+        counter = TokenCounter()
+        messages = [
+            {"role": "system", "content": "Ты бот"},
+            {"role": "user", "content": "Привет"},
+        ]
+        expected = (
+            counter.count("Ты бот")
+            + counter.count("Привет")
+            + 2 * TOKENS_PER_MESSAGE
+            + TOKENS_PER_REPLY
+        )
+        assert counter.count_messages(messages) == expected
+        assert counter.count_messages([]) == 0
+
+
+class TestPromptCacheStats:
+    """Тесты учета токенов из кеша провайдера."""
+
+    def test_record(self) -> None:
+        """Токены промпта и кеша накапливаются по запросам."""
+        stats = PromptCacheStats()
+        usage = SimpleNamespace(
+            prompt_tokens=2000, prompt_tokens_details=SimpleNamespace(cached_tokens=1536)
+        )
+
+        assert stats.record(usage) == (2000, 1536)
+        stats.record(SimpleNamespace(prompt_tokens=2000, prompt_tokens_details=None))
+
+        assert (stats.requests, stats.prompt_tokens, stats.cached_tokens) == (2, 4000, 1536)
+        assert stats.hit_ratio == 1536 / 4000
+
+    def test_missing_usage(self) -> None:
+        """Ответ без usage учитывается с нулями."""
+        stats = PromptCacheStats()
+
+        assert stats.record(None) == (0, 0)
+        assert stats.hit_ratio == 0.0
@@ -2,17 +2,21 @@
 
 from types import SimpleNamespace
 
+import pytest
+
 from app.tools.prompt import RANK_NAMES
 from app.tools.utils import (
+    RANK_TABLE,
     clean_text,
     contains_only_urls,
     convert_mcp_tools_to_openai,
     count_tokens,
+    crosses_rank_threshold,
     darken_color,
     enrich_users_context,
+    find_rank,
     get_rank_description,
     replace_emojis,
-    user_prompt,
     users_context,
 )
 
@@ -170,28 +174,46 @@ class TestGetRankDescription:
             assert "bg_filename" in rank
             assert "description" in rank
 
+    def test_returns_preallocated_mapping(self) -> None:
+        """Повторные вызовы возвращают один и тот же неизменяемый объект."""
+        rank = get_rank_description(75)
+        assert rank is get_rank_description(99)
+        with pytest.raises(TypeError):
+            rank["rank_level"] = 0  # type: ignore[index]
+
+
+# ── find_rank / crosses_rank_threshold ──────────────────────────
+
+
+class TestFindRank:
+    """Тесты для функции find_rank."""
+
+    def test_matches_thresholds(self) -> None:
+        """На каждом пороге возвращается соответствующий ранг."""
+        for rank in RANK_TABLE:
+            assert find_rank(rank.threshold) is rank
 
-# ── user_prompt ─────────────────────────────────────────────────
+    def test_below_first_threshold(self) -> None:
+        """Отрицательное значение — первый ранг."""
+        assert find_rank(-5) is RANK_TABLE[0]
 
+    def test_between_thresholds(self) -> None:
+        """Между порогами — нижний ранг."""
+        assert find_rank(199).level == 3
 
-class TestUserPrompt:
-    """Тесты для функции user_prompt."""
 
-    def test_known_user(self) -> None:
-        """Известный пользователь — промпт содержит описание."""
-        result = user_prompt("atagaev")
-        assert "atagaev" in result
-        assert "Арби" in result
+class TestCrossesRankThreshold:
+    """Тесты для функции crosses_rank_threshold."""
 
-    def test_unknown_user(self) -> None:
-        """Неизвестный пользователь — промпт без user_info."""
-        result = user_prompt("random_user_12345")
-        assert "random_user_12345" not in result
+    def test_matches_level_change(self) -> None:
+        """Совпадает с изменением уровня между n - 1 и n."""
+        for count in range(1, 600):
+            expected = find_rank(count).level > find_rank(count - 1).level
+            assert crosses_rank_threshold(count) is expected
 
-    def test_returns_string(self) -> None:
-        """Всегда возвращает строку."""
-        assert isinstance(user_prompt("atagaev"), str)
-        assert isinstance(user_prompt("unknown"), str)
+    def test_first_threshold_not_counted(self) -> None:
+        """Порог первого ранга не считается повышением."""
+        assert crosses_rank_threshold(RANK_TABLE[0].threshold) is False
 
 
 # ── enrich_users_context ────────────────────────────────────────
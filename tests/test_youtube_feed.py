@@ -0,0 +1,71 @@
+"""Unit-тесты для app/services/youtube_feed.py."""
+
+import xml.etree.ElementTree as ET
+from datetime import UTC, datetime
+from pathlib import Path
+
+import feedparser
+import pytest
+
+from app.services.youtube_feed import YouTubeFeedParser, parse_feed
+
+FIXTURE = Path(__file__).parent / "fixtures" / "youtube_feed.xml"
+
+
+@pytest.fixture(scope="module")
+def feed_bytes() -> bytes:
+    """Записанная лента YouTube."""
+    return FIXTURE.read_bytes()
+
+
+class TestParseFeed:
+    """Тесты разбора ленты."""
+
+    def test_matches_feedparser(self, feed_bytes: bytes) -> None:
+        """Поля записей совпадают с результатом feedparser."""
+        entries = parse_feed(feed_bytes)
+        reference = feedparser.parse(feed_bytes).entries
+
+        assert len(entries) == len(reference) == 15
+        for entry, ref in zip(entries, reference, strict=True):
+            assert entry.video_id == ref.yt_videoid
+            assert entry.title == ref.title
+            assert entry.link == ref.link
+            assert entry.author == ref.author
+
+    def test_entry_fields(self, feed_bytes: bytes) -> None:
+        """Первая запись разобрана полностью, дата публикации с часовым поясом."""
+        entry = parse_feed(feed_bytes)[0]
+        assert entry.video_id == "vid15abcDE"
+        assert entry.title == "Обзор новой видеокарты"
+        assert entry.link == "https://www.youtube.com/watch?v=vid15abcDE"
+        assert entry.author == "Железный канал"
+        assert entry.published == datetime(2025, 6, 1, 15, 0, tzinfo=UTC)
+
+    def test_stops_at_first_known_video(self, feed_bytes: bytes) -> None:
+        """Разбор останавливается на первом известном видео, включая его."""
+        entries = parse_feed(feed_bytes, stop_at={"vid13abcDE", "vid01abcDE"})
+        assert [e.video_id for e in entries] == ["vid15abcDE", "vid14abcDE", "vid13abcDE"]
+
+    def test_incremental_feed(self, feed_bytes: bytes) -> None:
+        """Побайтовая подача дает тот же результат, что и разбор целиком."""
+        parser = YouTubeFeedParser()
+        for i in range(len(feed_bytes)):
+            parser.feed(feed_bytes[i : i + 1])
+        assert parser.close() == parse_feed(feed_bytes)
+
+    def test_incomplete_document_stopped_early(self, feed_bytes: bytes) -> None:
+        """После остановки обрезанный хвост документа не вызывает ошибку."""
+        parser = YouTubeFeedParser(stop_at={"vid15abcDE"})
+        assert parser.feed(feed_bytes[: len(feed_bytes) // 2]) is True
+        assert [e.video_id for e in parser.close()] == ["vid15abcDE"]
+
+    def test_entry_without_video_id_skipped(self) -> None:
+        """Записи без yt:videoId пропускаются."""
+        data = b'<feed xmlns="http://www.w3.org/2005/Atom"><entry><title>x</title></entry></feed>'
+        assert parse_feed(data) == []
+
+    def test_malformed_document(self) -> None:
+        """Некорректный XML приводит к ошибке разбора."""
+        with pytest.raises(ET.ParseError):
+            parse_feed(b"<feed><entry>")
@@ -0,0 +1,535 @@
+"""Unit-тесты для app/services/youtube_notifier.py."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from sqlalchemy.dialects import postgresql
+
+from app.services.youtube_feed import FeedEntry
+from app.services.youtube_notifier import (
+    KNOWN_VIDEOS_LIMIT,
+    MAX_POLL_INTERVAL,
+    MIN_POLL_INTERVAL,
+    PUBLISH_HISTORY_LIMIT,
+    FeedState,
+    YouTubeNotifier,
+    upload_interval,
+)
+
+FEED_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <title>Test</title>
+  <entry>
+    <yt:videoId>vid2</yt:videoId>
+    <title>Second</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v=vid2"/>
+    <author><name>Author</name></author>
+    <published>2025-01-01T12:00:00+00:00</published>
+  </entry>
+  <entry>
+    <yt:videoId>vid1</yt:videoId>
+    <title>First</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v=vid1"/>
+    <author><name>Author</name></author>
+    <published>2025-01-01T11:00:00+00:00</published>
+  </entry>
+</feed>
+"""
+ETAG = '"feed-v1"'
+
+
+def _channel(
+    row_id: int, channel_id: str = "UC1", guild_id: int = 1, discord_channel_id: int = 10
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=row_id,
+        channel_id=channel_id,
+        name=f"chan{row_id}",
+        guild_id=guild_id,
+        discord_channel_id=discord_channel_id,
+    )
+
+
+def _known(*video_ids: str) -> dict[str, None]:
+    return dict.fromkeys(video_ids)
+
+
+def _dates(*hours: int) -> list[datetime]:
+    return [datetime.fromtimestamp(h * 3600, UTC) for h in hours]
+
+
+def _entries(*hours: int) -> list[FeedEntry]:
+    return [
+        FeedEntry(f"v{h}", "title", "link", "author", date)
+        for h, date in zip(hours, _dates(*hours), strict=True)
+    ]
+
+
+def _mock_session(inserted: list[tuple]) -> tuple[MagicMock, MagicMock]:
+    """Создает фабрику сессий, запросы которой возвращают переданные строки."""
+    session = MagicMock()
+    result = MagicMock()
+    result.tuples.return_value.all.return_value = inserted
+    session.execute = AsyncMock(return_value=result)
+    session.commit = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    return factory, session
+
+
+class FeedServer:
+    """Локальный сервер лент с поддержкой If-None-Match."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        """Инициализирует счетчики запросов."""
+        self.delay = delay
+        self.requests: list[dict[str, str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Отдает ленту или 304, если ETag совпадает."""
+        self.requests.append(dict(request.headers))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if request.query.get("channel_id") == "broken":
+                return web.Response(status=500)
+            if request.headers.get("If-None-Match") == ETAG:
+                return web.Response(status=304)
+            return web.Response(body=FEED_XML, headers={"ETag": ETAG})
+        finally:
+            self.in_flight -= 1
+
+
+async def _start(feeds: FeedServer) -> TestServer:
+    app = web.Application()
+    app.router.add_get("/feeds", feeds.handle)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.fixture
+async def feed_server() -> AsyncIterator[tuple[FeedServer, TestServer]]:
+    """Локальный сервер RSS-лент."""
+    feeds = FeedServer()
+    server = await _start(feeds)
+    yield feeds, server
+    await server.close()
+
+
+def _notifier(server: TestServer, **kwargs: int) -> YouTubeNotifier:
+    notifier = YouTubeNotifier(MagicMock(), **kwargs)
+    notifier.feed_url = str(server.make_url("/feeds")) + "?channel_id={channel_id}"
+    return notifier
+
+
+class TestUploadInterval:
+    """Тесты адаптивного интервала опроса."""
+
+    def test_rare_uploads_use_max_interval(self) -> None:
+        """Канал с загрузками раз в неделю опрашивается с максимальным интервалом."""
+        assert upload_interval(_dates(0, 168, 336)) == MAX_POLL_INTERVAL
+
+    def test_frequent_uploads_use_min_interval(self) -> None:
+        """Канал с загрузками каждый час опрашивается с минимальным интервалом."""
+        assert upload_interval(_dates(0, 1, 2, 3)) == MIN_POLL_INTERVAL
+
+    def test_intermediate_frequency(self) -> None:
+        """Промежуточная частота дает интервал между границами."""
+        interval = upload_interval(_dates(0, 10, 20))
+        assert MIN_POLL_INTERVAL < interval < MAX_POLL_INTERVAL
+
+    def test_single_entry(self) -> None:
+        """По одной дате частоту не определить."""
+        assert upload_interval(_dates(0)) is None
+
+
+class TestFeedState:
+    """Тесты заголовков условного запроса."""
+
+    def test_headers(self) -> None:
+        """ETag и Last-Modified попадают в условные заголовки."""
+        state = FeedState(etag=ETAG, last_modified="Wed, 01 Jan 2025 12:00:00 GMT")
+        assert state.headers() == {
+            "If-None-Match": ETAG,
+            "If-Modified-Since": "Wed, 01 Jan 2025 12:00:00 GMT",
+        }
+        assert FeedState().headers() == {}
+
+    def test_interval_from_history(self) -> None:
+        """Интервал оценивается по накопленным датам, а не по одной ленте."""
+        state = FeedState()
+        # Как при остановке разбора: каждая лента — новое видео и граничное известное
+        state.record_published(_entries(0))
+        state.record_published(_entries(10, 0))
+        state.record_published(_entries(20, 10))
+
+        assert state.published == _dates(0, 10, 20)
+        assert state.interval == upload_interval(_dates(0, 10, 20))
+        assert state.latest_published == _dates(20)[0]
+
+    def test_history_bounded(self) -> None:
+        """Хранится не больше PUBLISH_HISTORY_LIMIT последних дат."""
+        state = FeedState()
+        state.record_published(_entries(*range(PUBLISH_HISTORY_LIMIT + 5)))
+
+        assert state.published == _dates(*range(5, PUBLISH_HISTORY_LIMIT + 5))
+
+    def test_failures_stretch_delay_only(self) -> None:
+        """Ошибки подряд увеличивают задержку, не меняя оценку интервала."""
+        state = FeedState(interval=MIN_POLL_INTERVAL, failures=2)
+
+        assert state.poll_delay() == 4 * MIN_POLL_INTERVAL
+        assert state.interval == MIN_POLL_INTERVAL
+        state.failures = 10
+        assert state.poll_delay() == MAX_POLL_INTERVAL
+
+
+class TestPollChannels:
+    """Тесты конкурентного опроса лент."""
+
+    async def test_conditional_get_skips_unchanged_feed(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Повторный опрос отправляет If-None-Match, и 304 не доходит до разбора."""
+        feeds, server = feed_server
+        notifier = _notifier(server)
+        channel = _channel(1)
+
+        with patch.object(notifier, "_publish_new_videos", new=AsyncMock()) as publish:
+            first = await notifier.poll_channels([channel])
+            notifier.feed_states[channel.channel_id].next_poll = 0
+            second = await notifier.poll_channels([channel])
+
+        assert first.updated == 1
+        assert second.not_modified == 1
+        assert publish.await_count == 1
+        feed = publish.await_args.args[1]["UC1"]
+        assert [entry.video_id for entry in feed] == ["vid2", "vid1"]
+        assert feeds.requests[1]["If-None-Match"] == ETAG
+
+    async def test_channel_not_due_is_skipped(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Канал, чей интервал не истек, не опрашивается."""
+        feeds, server = feed_server
+        notifier = _notifier(server)
+        channel = _channel(1)
+
+        with patch.object(notifier, "_publish_new_videos", new=AsyncMock()):
+            await notifier.poll_channels([channel])
+            summary = await notifier.poll_channels([channel])
+
+        assert summary.total == 1
+        assert summary.polled == 0
+        assert len(feeds.requests) == 1
+
+    async def test_concurrency_is_bounded(self) -> None:
+        """Одновременно выполняется не больше max_concurrency запросов."""
+        feeds = FeedServer(delay=0.05)
+        server = await _start(feeds)
+        try:
+            notifier = _notifier(server, max_concurrency=3)
+            channels = [_channel(i, f"UC{i}") for i in range(10)]
+            with patch.object(notifier, "_publish_new_videos", new=AsyncMock()):
+                summary = await notifier.poll_channels(channels)
+        finally:
+            await server.close()
+
+        assert summary.polled == 10
+        assert feeds.max_in_flight == 3
+        assert len(summary.durations) == 10
+
+    async def test_error_backs_off(self, feed_server: tuple[FeedServer, TestServer]) -> None:
+        """Ошибка ленты учитывается в сводке и увеличивает интервал опроса."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        channel = _channel(1, "broken")
+
+        summary = await notifier.poll_channels([channel])
+
+        state = notifier.feed_states[channel.channel_id]
+        assert summary.errors == 1
+        assert state.failures == 1
+        assert state.interval == MIN_POLL_INTERVAL
+        assert state.poll_delay() == 2 * MIN_POLL_INTERVAL
+        assert "ошибок: 1" in str(summary)
+
+    @pytest.mark.parametrize("etag", [None, ETAG])
+    async def test_success_resets_backoff(
+        self, feed_server: tuple[FeedServer, TestServer], etag: str | None
+    ) -> None:
+        """Ответы 200 и 304 сбрасывают счетчик ошибок."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        state = notifier.feed_states["UC1"] = FeedState(etag=etag, failures=3)
+
+        with patch.object(notifier, "_publish_new_videos", new=AsyncMock()):
+            await notifier.poll_channels([_channel(1)])
+
+        assert state.failures == 0
+        assert state.poll_delay() == state.interval
+
+    async def test_history_seeded_by_full_parse(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Без истории дат лента разбирается целиком, но отдается до известного видео."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        notifier.known_videos = {"UC1": _known("vid2")}
+
+        with patch.object(notifier, "_publish_new_videos", new=AsyncMock()) as publish:
+            await notifier.poll_channels([_channel(1)])
+
+        feed = publish.await_args.args[1]["UC1"]
+        assert [entry.video_id for entry in feed] == ["vid2"]
+        assert len(notifier.feed_states["UC1"].published) == 2
+
+    async def test_feed_fetched_once_for_all_guilds(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Канал, отслеживаемый несколькими гильдиями, загружается один раз за цикл."""
+        feeds, server = feed_server
+        notifier = _notifier(server)
+        channels = [_channel(i, "UC1", guild_id=i) for i in range(1, 4)]
+
+        with patch.object(notifier, "_publish_new_videos", new=AsyncMock()) as publish:
+            summary = await notifier.poll_channels(channels)
+
+        assert len(feeds.requests) == 1
+        assert summary.total == summary.polled == 1
+        subscriptions = publish.await_args.args[0]
+        assert subscriptions["UC1"] == channels
+
+
+class TestPublishNewVideos:
+    """Тесты сохранения и рассылки новых видео."""
+
+    @staticmethod
+    def _sent_videos(discord_channel: AsyncMock) -> list[str]:
+        return [call.args[0].rsplit("v=", 1)[1] for call in discord_channel.send.await_args_list]
+
+    async def test_fan_out_posts_only_inserted_pairs(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Видео публикуется только в гильдиях, для которых вставка прошла."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        notifier.known_videos = {"UC1": _known("vid1")}
+        discord_channels = {10: AsyncMock(), 20: AsyncMock(), 21: AsyncMock(), 30: AsyncMock()}
+        notifier.bot.get_channel.side_effect = discord_channels.get
+        channels = [
+            _channel(1, guild_id=1, discord_channel_id=10),
+            _channel(2, guild_id=2, discord_channel_id=20),
+            _channel(3, guild_id=2, discord_channel_id=21),
+            _channel(4, guild_id=3, discord_channel_id=30),
+        ]
+        factory, session = _mock_session(inserted=[("vid2", 2), ("vid2", 3)])
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.poll_channels(channels)
+
+        session.execute.assert_awaited_once()
+        stmt = session.execute.await_args.args[0]
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        assert sorted(v for k, v in params.items() if k.startswith("guild_id")) == [1, 2, 3]
+        assert "ON CONFLICT ON CONSTRAINT uq_youtube_video_per_guild DO NOTHING" in str(
+            stmt.compile(dialect=postgresql.dialect())
+        )
+        assert self._sent_videos(discord_channels[10]) == []
+        for channel_id in (20, 21, 30):
+            assert self._sent_videos(discord_channels[channel_id]) == ["vid2"]
+        assert list(notifier.known_videos["UC1"]) == ["vid1", "vid2"]
+
+    async def test_all_new_entries_posted_in_publish_order(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Все новые записи ленты публикуются от старой к новой."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        notifier.known_videos = {"UC1": {}}
+        discord_channel = AsyncMock()
+        notifier.bot.get_channel.return_value = discord_channel
+        factory, _ = _mock_session(inserted=[("vid1", 1), ("vid2", 1)])
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.poll_channels([_channel(1)])
+
+        assert self._sent_videos(discord_channel) == ["vid1", "vid2"]
+
+    async def test_unknown_channel_posts_latest_only(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Для нового канала сохраняется вся лента, а публикуется только последнее видео."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        discord_channel = AsyncMock()
+        notifier.bot.get_channel.return_value = discord_channel
+        factory, session = _mock_session(inserted=[("vid1", 1), ("vid2", 1)])
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.poll_channels([_channel(1)])
+
+        params = session.execute.await_args.args[0].compile(dialect=postgresql.dialect()).params
+        assert sorted(v for k, v in params.items() if k.startswith("video_id")) == ["vid1", "vid2"]
+        assert self._sent_videos(discord_channel) == ["vid2"]
+        assert list(notifier.known_videos["UC1"]) == ["vid1", "vid2"]
+
+    async def test_nothing_new_skips_database(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Если все записи ленты известны, запрос к базе не выполняется."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        notifier.known_videos = {"UC1": _known("vid1", "vid2")}
+        factory, session = _mock_session(inserted=[])
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.poll_channels([_channel(1)])
+
+        session.execute.assert_not_awaited()
+
+    async def test_db_error_resets_validators(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """При ошибке базы ETag сбрасывается, а видео не считаются известными."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        factory, session = _mock_session(inserted=[])
+        session.commit.side_effect = RuntimeError("db down")
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.poll_channels([_channel(1)])
+
+        assert notifier.feed_states["UC1"].etag is None
+        assert "UC1" not in notifier.known_videos
+        notifier.bot.get_channel.assert_not_called()
+
+    async def test_load_known_videos(self) -> None:
+        """Известные видео загружаются из базы с группировкой по каналу."""
+        notifier = YouTubeNotifier(MagicMock())
+        factory, session = _mock_session(inserted=[("UC1", "a"), ("UC1", "b"), ("UC2", "c")])
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.load_known_videos()
+
+        assert notifier.known_videos == {"UC1": _known("a", "b"), "UC2": _known("c")}
+        compiled = session.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        assert "row_number() OVER (PARTITION BY" in str(compiled)
+        assert KNOWN_VIDEOS_LIMIT in compiled.params.values()
+
+    async def test_known_videos_merged_and_bounded(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Лента дополняет известные видео, старейшие вытесняются сверх лимита."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        old = [f"old{i}" for i in range(KNOWN_VIDEOS_LIMIT - 1)]
+        notifier.known_videos = {"UC1": _known(*old, "vid1")}
+        factory, _ = _mock_session(inserted=[("vid2", 1)])
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.poll_channels([_channel(1)])
+
+        known = list(notifier.known_videos["UC1"])
+        assert len(known) == KNOWN_VIDEOS_LIMIT
+        assert known[-2:] == ["vid1", "vid2"]
+        assert "old0" not in known and "old1" in known
+
+    async def test_deleted_boundary_does_not_repost_catalog(
+        self, feed_server: tuple[FeedServer, TestServer]
+    ) -> None:
+        """Если граничное видео удалено, разбор останавливается на следующем известном."""
+        _, server = feed_server
+        notifier = _notifier(server)
+        # vid2 было последним известным и исчезло из ленты; vid1 помнится с прошлых опросов
+        notifier.known_videos = {"UC1": _known("vid1", "vid2-deleted")}
+        factory, session = _mock_session(inserted=[("vid2", 1)])
+        discord_channel = AsyncMock()
+        notifier.bot.get_channel.return_value = discord_channel
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.poll_channels([_channel(1)])
+
+        assert self._sent_videos(discord_channel) == ["vid2"]
+        params = session.execute.await_args.args[0].compile(dialect=postgresql.dialect()).params
+        assert [v for k, v in params.items() if k.startswith("video_id")] == ["vid2"]
+
+
+class TestHandlePush:
+    """Тесты обработки push-уведомлений WebSub."""
+
+    async def test_push_uses_publish_path(self) -> None:
+        """Записи из уведомления публикуются подписчикам канала через общий путь."""
+        notifier = YouTubeNotifier(MagicMock())
+        notifier._known_loaded = True
+        notifier.known_videos = {"UC1": _known("vid1")}
+        channels = [_channel(1, guild_id=1), _channel(2, guild_id=2)]
+        factory, session = _mock_session(inserted=[])
+        session.execute.return_value.scalars.return_value.all.return_value = channels
+        entry = FeedEntry("vid9", "Pushed", "link", "Author", datetime.now(UTC), "UC1")
+
+        with (
+            patch("app.services.youtube_notifier.async_session", factory),
+            patch.object(notifier, "_publish_new_videos", new=AsyncMock()) as publish,
+        ):
+            await notifier.handle_push("UC1", [entry])
+
+        publish.assert_awaited_once_with({"UC1": channels}, {"UC1": [entry]})
+
+    @pytest.mark.parametrize("known", [None, {"vid1"}])
+    async def test_edit_of_old_video_not_posted(self, known: set[str] | None) -> None:
+        """Правка давно опубликованного видео не публикуется как новая загрузка."""
+        notifier = YouTubeNotifier(MagicMock())
+        notifier._known_loaded = True
+        if known is not None:
+            notifier.known_videos = {"UC1": _known(*known)}
+        discord_channel = AsyncMock()
+        notifier.bot.get_channel.return_value = discord_channel
+        factory, session = _mock_session(inserted=[("old", 1)])
+        session.execute.return_value.scalars.return_value.all.return_value = [_channel(1)]
+        published = datetime.now(UTC) - timedelta(days=30)
+        entry = FeedEntry("old", "Новое название", "link", "Author", published, "UC1")
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.handle_push("UC1", [entry])
+
+        discord_channel.send.assert_not_awaited()
+        assert session.execute.await_count == 1
+
+    def test_push_older_than_latest_known_skipped(self) -> None:
+        """Запись старше самого нового известного видео канала не публикуется."""
+        notifier = YouTubeNotifier(MagicMock())
+        now = datetime.now(UTC)
+        notifier.feed_states["UC1"] = FeedState(published=[now - timedelta(minutes=5)])
+        recent = FeedEntry("new", "title", "link", "Author", now, "UC1")
+        edited = FeedEntry("old", "title", "link", "Author", now - timedelta(hours=1), "UC1")
+
+        assert notifier._recent_push_entries("UC1", [recent, edited]) == [recent]
+
+    async def test_push_adds_to_known_videos(self) -> None:
+        """Видео из push-уведомления добавляется к известным, а не заменяет их."""
+        notifier = YouTubeNotifier(MagicMock())
+        notifier._known_loaded = True
+        notifier.known_videos = {"UC1": _known("vid1", "vid2")}
+        notifier.bot.get_channel.return_value = AsyncMock()
+        factory, session = _mock_session(inserted=[("vid3", 1)])
+        session.execute.return_value.scalars.return_value.all.return_value = [_channel(1)]
+        published = datetime.now(UTC)
+        entry = FeedEntry("vid3", "title", "link", "Author", published, "UC1")
+
+        with patch("app.services.youtube_notifier.async_session", factory):
+            await notifier.handle_push("UC1", [entry])
+
+        assert list(notifier.known_videos["UC1"]) == ["vid1", "vid2", "vid3"]
+        assert notifier.feed_states["UC1"].latest_published == published
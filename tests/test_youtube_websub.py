@@ -0,0 +1,240 @@
+"""Тесты для app/services/youtube_websub.py с локальным фейковым хабом."""
+
+import hashlib
+import hmac
+import time
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer, unused_port
+
+from app.services.youtube_websub import LEASE_SECONDS, RENEW_MARGIN, YouTubeWebSub
+
+SECRET = "test-secret"
+CHANNEL_ID = "UC1"
+
+NOTIFICATION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <link rel="self" href="https://www.youtube.com/xml/feeds/videos.xml?channel_id=UC1"/>
+  <entry>
+    <yt:videoId>vid9</yt:videoId>
+    <yt:channelId>UC1</yt:channelId>
+    <title>Pushed</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v=vid9"/>
+    <author><name>Author</name></author>
+    <published>2025-01-01T12:00:00+00:00</published>
+  </entry>
+</feed>
+"""
+
+
+class FakeHub:
+    """Фейковый хаб WebSub: принимает запросы и подтверждает их у подписчика."""
+
+    def __init__(self, lease_seconds: int = LEASE_SECONDS) -> None:
+        """Инициализирует журнал запросов."""
+        self.lease_seconds = lease_seconds
+        self.requests: list[dict[str, str]] = []
+        self.verifications: list[tuple[int, str]] = []
+        self.secrets: dict[str, str] = {}
+
+    async def handle_subscribe(self, request: web.Request) -> web.Response:
+        """Принимает запрос и сразу проверяет намерение подписчика."""
+        form = dict(await request.post())
+        self.requests.append(form)
+        await self.verify(form, challenge=f"challenge-{len(self.requests)}")
+        if form["hub.mode"] == "subscribe":
+            self.secrets[form["hub.topic"]] = form["hub.secret"]
+        return web.Response(status=202)
+
+    async def verify(self, form: dict[str, str], challenge: str) -> None:
+        """Отправляет подписчику GET-запрос проверки намерения."""
+        params = {
+            "hub.mode": form["hub.mode"],
+            "hub.topic": form["hub.topic"],
+            "hub.challenge": challenge,
+            "hub.lease_seconds": str(self.lease_seconds),
+        }
+        async with aiohttp.ClientSession() as http:
+            async with http.get(form["hub.callback"], params=params) as response:
+                self.verifications.append((response.status, await response.text()))
+
+    async def publish(self, callback: str, topic: str, body: bytes, secret: str) -> int:
+        """Доставляет уведомление подписчику с подписью HMAC-SHA1."""
+        signature = hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+        headers = {"Content-Type": "application/atom+xml", "X-Hub-Signature": f"sha1={signature}"}
+        async with aiohttp.ClientSession() as http:
+            async with http.post(callback, data=body, headers=headers) as response:
+                return response.status
+
+
+@pytest.fixture
+async def hub() -> AsyncIterator[tuple[FakeHub, TestServer]]:
+    """Запущенный фейковый хаб."""
+    fake = FakeHub()
+    app = web.Application()
+    app.router.add_post("/subscribe", fake.handle_subscribe)
+    server = TestServer(app)
+    await server.start_server()
+    yield fake, server
+    await server.close()
+
+
+@pytest.fixture
+async def subscriber(hub: tuple[FakeHub, TestServer]) -> AsyncIterator[YouTubeWebSub]:
+    """Запущенный подписчик WebSub, направленный на фейковый хаб."""
+    _, server = hub
+    port = unused_port()
+    websub = YouTubeWebSub(
+        AsyncMock(),
+        callback_url=f"http://127.0.0.1:{port}/websub",
+        hub_url=str(server.make_url("/subscribe")),
+        port=port,
+        secret=SECRET,
+    )
+    await websub.start()
+    yield websub
+    await websub.stop()
+
+
+class TestSubscription:
+    """Тесты подписки и продления аренды."""
+
+    async def test_subscribe_verified_by_hub(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Хаб получает запрос, подписчик возвращает challenge и запоминает аренду."""
+        fake, _ = hub
+
+        await subscriber.sync([CHANNEL_ID])
+
+        assert fake.requests[0]["hub.mode"] == "subscribe"
+        assert fake.requests[0]["hub.topic"] == subscriber.topic(CHANNEL_ID)
+        assert fake.requests[0]["hub.secret"] == SECRET
+        assert fake.verifications == [(200, "challenge-1")]
+        assert subscriber.leases[CHANNEL_ID] > time.monotonic() + LEASE_SECONDS - 60
+        assert subscriber.pending == {}
+
+    async def test_active_lease_not_renewed(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Действующая подписка не запрашивается повторно."""
+        fake, _ = hub
+
+        await subscriber.sync([CHANNEL_ID])
+        await subscriber.sync([CHANNEL_ID])
+
+        assert len(fake.requests) == 1
+
+    async def test_expiring_lease_renewed(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Подписка, срок которой истекает в пределах RENEW_MARGIN, продлевается."""
+        fake, _ = hub
+        subscriber.leases[CHANNEL_ID] = time.monotonic() + RENEW_MARGIN / 2
+
+        await subscriber.sync([CHANNEL_ID])
+
+        assert [form["hub.mode"] for form in fake.requests] == ["subscribe"]
+        assert subscriber.leases[CHANNEL_ID] > time.monotonic() + RENEW_MARGIN
+
+    async def test_removed_channel_unsubscribed(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Канал, который больше не отслеживается, отписывается."""
+        fake, _ = hub
+
+        await subscriber.sync([CHANNEL_ID])
+        await subscriber.sync([])
+
+        assert [form["hub.mode"] for form in fake.requests] == ["subscribe", "unsubscribe"]
+        assert CHANNEL_ID not in subscriber.leases
+
+    async def test_unrequested_verification_rejected(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Проверка намерения, которого подписчик не отправлял, отклоняется."""
+        fake, _ = hub
+        form = {
+            "hub.mode": "subscribe",
+            "hub.topic": subscriber.topic("UC_unknown"),
+            "hub.callback": subscriber.callback_url,
+        }
+
+        await fake.verify(form, challenge="x")
+
+        assert fake.verifications == [(404, "")]
+        assert subscriber.leases == {}
+
+
+class TestNotifications:
+    """Тесты приема уведомлений хаба."""
+
+    async def test_signed_notification_dispatched(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Подписанное уведомление передается в обработчик записей."""
+        fake, _ = hub
+        await subscriber.sync([CHANNEL_ID])
+        topic = subscriber.topic(CHANNEL_ID)
+
+        status = await fake.publish(
+            subscriber.callback_url, topic, NOTIFICATION, fake.secrets[topic]
+        )
+        await subscriber.drain()
+
+        assert status == 202
+        subscriber.on_entries.assert_awaited_once()
+        channel_id, entries = subscriber.on_entries.await_args.args
+        assert channel_id == CHANNEL_ID
+        assert [entry.video_id for entry in entries] == ["vid9"]
+
+    async def test_bad_signature_ignored(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Уведомление с неверной подписью подтверждается, но не обрабатывается."""
+        fake, _ = hub
+        await subscriber.sync([CHANNEL_ID])
+
+        status = await fake.publish(
+            subscriber.callback_url, subscriber.topic(CHANNEL_ID), NOTIFICATION, "wrong"
+        )
+        await subscriber.drain()
+
+        assert status == 202
+        subscriber.on_entries.assert_not_awaited()
+
+    async def test_unsubscribed_channel_ignored(
+        self, hub: tuple[FakeHub, TestServer], subscriber: YouTubeWebSub
+    ) -> None:
+        """Уведомления по каналам без подписки игнорируются."""
+        fake, _ = hub
+
+        status = await fake.publish(
+            subscriber.callback_url, subscriber.topic(CHANNEL_ID), NOTIFICATION, SECRET
+        )
+        await subscriber.drain()
+
+        assert status == 202
+        subscriber.on_entries.assert_not_awaited()
+
+
+class TestConfig:
+    """Тесты настройки из окружения."""
+
+    def test_disabled_without_callback(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Без YOUTUBE_WEBSUB_CALLBACK push-режим выключен."""
+        monkeypatch.delenv("YOUTUBE_WEBSUB_CALLBACK", raising=False)
+        assert YouTubeWebSub(AsyncMock()).enabled is False
+
+    def test_enabled_from_env(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Адрес, порт и секрет берутся из окружения."""
+        monkeypatch.setenv("YOUTUBE_WEBSUB_CALLBACK", "https://bot.example.com/websub")
+        monkeypatch.setenv("YOUTUBE_WEBSUB_PORT", "9000")
+        monkeypatch.setenv("YOUTUBE_WEBSUB_SECRET", "s")
+        websub = YouTubeWebSub(AsyncMock())
+        assert websub.enabled is True
+        assert (websub.port, websub.secret) == (9000, "s")